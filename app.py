@@ -1,16 +1,51 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
+from contextlib import ExitStack
+import json
 import os
-from downloader import YouTubeDownloader
-from utils import validate_url, create_output_dir
+import re
+from bandwidth import get_default_governor
+from connections import get_default_pool, install_pytube
+from jobqueue import open_queue
+from jobs import JobManager, JobQueueFull, QueuedJobManager
+from metadata import get_default_cache
+from metrics import registry
+from store import ArtifactStore
+from utils import validate_url, create_output_dir, parse_rate, parse_timestamp, sanitize_filename
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
-CORS(app)
+CORS(app, expose_headers=['Content-Disposition', 'Content-Range', 'Accept-Ranges', 'ETag'])
+
+# Let a front-end server (nginx X-Accel, Apache mod_xsendfile) send file bodies
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
 
 # Create downloads directory
-DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
+DOWNLOAD_DIR = os.environ.get('DOWNLOAD_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
 create_output_dir(DOWNLOAD_DIR)
 
+# Background download jobs
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', 4))
+# Optional byte quota for stored downloads, evicting least recently used files
+DOWNLOAD_QUOTA_MB = os.environ.get('DOWNLOAD_QUOTA_MB')
+artifact_store = ArtifactStore(
+    os.path.join(DOWNLOAD_DIR, '.store'),
+    quota_bytes=int(DOWNLOAD_QUOTA_MB) * 1024 * 1024 if DOWNLOAD_QUOTA_MB else None,
+    policy=os.environ.get('DOWNLOAD_EVICTION_POLICY', 'lru')
+)
+# Optional cap on the total download rate, e.g. '20M'; adjustable at PUT /bandwidth
+bandwidth = get_default_governor()
+bandwidth.set_rate(parse_rate(os.environ.get('BANDWIDTH_LIMIT')))
+# With a shared queue (e.g. JOB_QUEUE=downloads/.queue.db) jobs only get enqueued
+# here and `python -m worker` processes run them; otherwise they run in this process
+JOB_QUEUE = os.environ.get('JOB_QUEUE')
+if JOB_QUEUE:
+    job_manager = QueuedJobManager(open_queue(JOB_QUEUE))
+else:
+    job_manager = JobManager(DOWNLOAD_DIR, max_workers=MAX_CONCURRENT_DOWNLOADS, store=artifact_store, bandwidth=bandwidth)
+registry.add_cache('metadata', get_default_cache().stats)
+registry.add_cache('http_pool', get_default_pool().stats)
+install_pytube()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,22 +61,136 @@ def download():
         if not url or not validate_url(url):
             return jsonify({'error': 'Invalid YouTube URL'}), 400
 
-        downloader = YouTubeDownloader(
-            url=url,
-            format_type=format_type,
-            output_dir=DOWNLOAD_DIR,
-            quality=quality
-        )
+        # Optional clip window: seconds or [hh:]mm:ss
+        try:
+            start = parse_timestamp(data.get('start'))
+            end = parse_timestamp(data.get('end'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if start is not None and end is not None and end <= start:
+            return jsonify({'error': 'Clip end must be after its start'}), 400
+
+        # Optional cap on this download: bytes per second or e.g. '2M'
+        try:
+            rate_limit = parse_rate(data.get('rate_limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        job = job_manager.submit(url, format_type, quality, start, end, rate_limit)
 
-        success = downloader.download()
-        
-        if success:
-            return jsonify({'message': 'Download completed successfully'})
-        else:
-            return jsonify({'error': 'Download failed'}), 500
+        return jsonify({
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events'
+        }), 202
 
+    except JobQueueFull as e:
+        return jsonify({'error': f'Server busy: {str(e)}'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Long-poll: ?since=<version> waits until the job moves past that version
+    since = request.args.get('since', type=int)
+    if since is not None and not job.finished:
+        snapshot = job_manager.wait_for_update(job, since, timeout=25.0)
+    else:
+        snapshot = job.to_dict()
+    return jsonify(snapshot)
+
+@app.route('/jobs/<job_id>/bandwidth', methods=['PUT'])
+def job_bandwidth(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        rate_limit = parse_rate((request.json or {}).get('rate_limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    job_manager.set_rate_limit(job, rate_limit)
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream():
+        version = -1
+        while True:
+            snapshot = job_manager.wait_for_update(job, version, timeout=15.0)
+            if snapshot['version'] == version:
+                # Keep idle connections alive through proxies
+                yield ': keep-alive\n\n'
+                continue
+            version = snapshot['version']
+            yield f'data: {json.dumps(snapshot)}\n\n'
+            if snapshot['state'] in ('done', 'failed'):
+                break
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/files/<file_id>')
+def serve_file(file_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', file_id):
+        return jsonify({'error': 'File not found'}), 404
+
+    path, metadata = artifact_store.lookup(file_id)
+    if not path:
+        return jsonify({'error': 'File not found'}), 404
+
+    # Keep the file from being evicted until the response is fully sent
+    pin = ExitStack()
+    pin.enter_context(artifact_store.pinned(file_id))
+    try:
+        artifact_store.storage.touch(file_id)
+        response = send_file(
+            path,
+            as_attachment=True,
+            download_name=f"{sanitize_filename(metadata.get('title') or file_id)}.{metadata['ext']}",
+            conditional=True,
+            etag=file_id,
+            max_age=86400
+        )
+    except BaseException:
+        pin.close()
+        raise
+    response.call_on_close(pin.close)
+    return response
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'metadata_cache': get_default_cache().stats(),
+        'http_pool': get_default_pool().stats(),
+        'storage': {
+            'used_bytes': artifact_store.storage.used_bytes(),
+            'quota_bytes': artifact_store.storage.quota_bytes
+        }
+    })
+
+@app.route('/bandwidth', methods=['GET', 'PUT'])
+def bandwidth_settings():
+    if request.method == 'PUT':
+        try:
+            bandwidth.set_rate(parse_rate((request.json or {}).get('rate')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(bandwidth.stats())
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)
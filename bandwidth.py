@@ -0,0 +1,305 @@
+"""
+Bandwidth scheduling for the YouTube Downloader.
+A token-bucket governor shares a global transfer rate between downloads by priority class, within per-download caps.
+"""
+
+import threading
+import time
+from metrics import THROTTLED_SECONDS
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Share of the global rate each active priority class gets relative to the others
+PRIORITY_WEIGHTS = {INTERACTIVE: 4, BATCH: 1}
+
+# How often allocations follow changes in demand, in seconds
+REALLOCATE_INTERVAL = 0.5
+# A share that has not read anything for this long gives up its allocation
+IDLE_AFTER = 1.0
+# Seconds of its rate a share may send at once after a pause
+BURST_SECONDS = 0.25
+# A share that did not use its allocation is offered this multiple of what it used
+DEMAND_HEADROOM = 2.0
+
+class BandwidthShare:
+    """
+    One download's claim on a BandwidthGovernor.
+
+    ``consume(n)`` is called after every chunk read and sleeps off whatever
+    the share has read beyond its rate, which holds back the connection
+    reading into it. Safe to use from several threads, e.g. the ranges of a
+    segmented download.
+    """
+
+    def __init__(self, governor, job, priority, rate_limit):
+        self.governor = governor
+        self.job = job
+        self.priority = priority
+        self.rate_limit = rate_limit
+        # Bytes per second currently allocated, None for unlimited
+        self.rate = rate_limit
+        self.tokens = 0.0
+        self.active = False
+        self.bytes = 0
+        self.throttled_seconds = 0.0
+        self._stamp = time.monotonic()
+        self._last_read = None
+        self._window_start = None
+        self._window_bytes = 0
+        self._window_throttled = False
+
+    def consume(self, amount):
+        """Account for ``amount`` bytes just read, waiting until the share's rate allows them."""
+        self.governor._consume(self, amount)
+
+    def set_rate_limit(self, rate):
+        """Change this download's cap in bytes per second, None to lift it."""
+        self.governor._set_rate_limit([self], rate)
+
+    def close(self):
+        """Give the share's bandwidth back to the other downloads."""
+        self.governor._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def to_dict(self):
+        return {
+            "job": self.job,
+            "priority": self.priority,
+            "rate_limit": self.rate_limit,
+            "rate": self.rate,
+            "active": self.active,
+            "bytes": self.bytes,
+            "throttled_seconds": round(self.throttled_seconds, 3)
+        }
+
+class BandwidthGovernor:
+    """
+    Shares a global transfer rate between downloads.
+
+    Every download registers a BandwidthShare with a priority class and an
+    optional cap of its own. The global rate is split between the classes
+    that are reading by PRIORITY_WEIGHTS, so interactive downloads keep most
+    of the link however many batch downloads run, and each class's part is
+    split evenly between its downloads. Bandwidth a download cannot use,
+    because it is capped, paused, or reads slower than its allocation, goes
+    to the others; allocations are recomputed every REALLOCATE_INTERVAL and
+    whenever a download starts, stops or has its cap changed. Without a
+    global rate only the per-download caps apply.
+    """
+
+    def __init__(self, rate=None):
+        """
+        Initialize the governor.
+
+        Args:
+            rate (float): Global rate in bytes per second, None for unlimited
+        """
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._shares = []
+        self._last_allocation = 0.0
+
+    def register(self, job, priority=INTERACTIVE, rate_limit=None):
+        """
+        Add a download to the schedule.
+
+        Args:
+            job (str): Name of the download, used to adjust it later
+            priority (str): INTERACTIVE or BATCH
+            rate_limit (float): Cap in bytes per second, None for none
+
+        Returns:
+            BandwidthShare: Share to consume() from; close() it when done
+
+        Raises:
+            ValueError: If the priority is unknown
+        """
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority: {priority}")
+        share = BandwidthShare(self, job, priority, rate_limit)
+        with self._lock:
+            self._shares.append(share)
+        return share
+
+    def set_rate(self, rate):
+        """Change the global rate in bytes per second, None for unlimited; applies to running downloads."""
+        with self._lock:
+            self.rate = rate
+            self._reallocate(time.monotonic())
+
+    def set_job_rate(self, job, rate):
+        """
+        Change the cap of the running downloads named ``job``.
+
+        Returns:
+            bool: False if no such download is running
+        """
+        with self._lock:
+            shares = [share for share in self._shares if share.job == job]
+        if shares:
+            self._set_rate_limit(shares, rate)
+        return bool(shares)
+
+    def stats(self):
+        """Return the global rate and the state of every registered download."""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "allocated": sum(share.rate or 0 for share in self._shares if share.active),
+                "downloads": [share.to_dict() for share in self._shares]
+            }
+
+    def _set_rate_limit(self, shares, rate):
+        with self._lock:
+            for share in shares:
+                share.rate_limit = rate
+            self._reallocate(time.monotonic())
+
+    def _release(self, share):
+        with self._lock:
+            if share in self._shares:
+                self._shares.remove(share)
+                self._reallocate(time.monotonic())
+
+    def _consume(self, share, amount):
+        now = time.monotonic()
+        with self._changed:
+            # A share back from a pause starts afresh, so its demand is not measured over the pause
+            resumed = share.active and now - share._last_read > IDLE_AFTER
+            share.bytes += amount
+            share._window_bytes += amount
+            share._last_read = now
+            if not share.active or resumed:
+                share.active = True
+                share._window_start = now
+                self._reallocate(now)
+            elif now - self._last_allocation >= REALLOCATE_INTERVAL:
+                self._reallocate(now)
+            if not share.rate:
+                return
+            self._refill(share, now)
+            share.tokens -= amount
+            if share.tokens >= 0:
+                return
+
+            # Wait in short steps so a new allocation takes effect mid-wait
+            waited_from = now
+            while share.tokens < 0 and share.rate and share in self._shares:
+                share._window_throttled = True
+                self._changed.wait(min(-share.tokens / share.rate, REALLOCATE_INTERVAL))
+                now = time.monotonic()
+                share._last_read = now
+                if now - self._last_allocation >= REALLOCATE_INTERVAL:
+                    self._reallocate(now)
+                self._refill(share, now)
+            share.throttled_seconds += now - waited_from
+        THROTTLED_SECONDS.inc(now - waited_from)
+
+    def _refill(self, share, now):
+        if not share.rate:
+            share.tokens = 0.0
+        else:
+            share.tokens = min(share.rate * BURST_SECONDS, share.tokens + (now - share._stamp) * share.rate)
+        share._stamp = now
+
+    def _reallocate(self, now):
+        """Recompute every share's rate; called with the lock held."""
+        active = []
+        for share in self._shares:
+            # Settle what each share earned at its old rate first
+            self._refill(share, now)
+            if share.active and now - share._last_read > IDLE_AFTER:
+                share.active = False
+            if share.active:
+                active.append(share)
+
+        if self.rate is None:
+            for share in active:
+                share.rate = share.rate_limit
+        else:
+            caps = {share: self._demand(share, now) for share in active}
+            classes = {}
+            for share in active:
+                classes.setdefault(share.priority, []).append(share)
+            class_caps = {}
+            for priority, members in classes.items():
+                if all(caps[share] is not None for share in members):
+                    class_caps[priority] = sum(caps[share] for share in members)
+                else:
+                    class_caps[priority] = None
+            class_rates = _fair_shares(self.rate, class_caps, PRIORITY_WEIGHTS)
+            for priority, members in classes.items():
+                rates = _fair_shares(class_rates[priority], {share: caps[share] for share in members})
+                for share, rate in rates.items():
+                    share.rate = rate
+
+        for share in active:
+            share._window_start = now
+            share._window_bytes = 0
+            share._window_throttled = False
+        self._last_allocation = now
+        self._changed.notify_all()
+
+    def _demand(self, share, now):
+        """Most a share should get: its cap, lowered to what it can use if it left its allocation unused."""
+        cap = share.rate_limit
+        elapsed = now - share._window_start
+        if share._window_throttled or share.rate is None or elapsed < REALLOCATE_INTERVAL / 2:
+            return cap
+        # Never held back, so it can be offered a little more than it used;
+        # if that turns out too little it is held back and gets its cap again
+        used = share._window_bytes / elapsed * DEMAND_HEADROOM
+        return used if cap is None else min(cap, used)
+
+def _fair_shares(total, caps, weights=None):
+    """
+    Split ``total`` between the keys of ``caps`` in proportion to their weight.
+
+    A key capped below its proportional part gets its cap, and what it
+    leaves is split between the others in turn (max-min fairness).
+
+    Args:
+        total (float): Amount to split
+        caps (dict): Key to its cap, None for uncapped
+        weights (dict): Key to its weight, 1 for keys not in it
+
+    Returns:
+        dict: Key to its share
+    """
+    weights = weights or {}
+    shares = {}
+    pending = list(caps)
+    remaining = total
+    while pending:
+        weight = sum(weights.get(key, 1) for key in pending)
+        capped = [
+            key for key in pending
+            if caps[key] is not None and caps[key] <= remaining * weights.get(key, 1) / weight
+        ]
+        if not capped:
+            for key in pending:
+                shares[key] = remaining * weights.get(key, 1) / weight
+            break
+        for key in capped:
+            shares[key] = caps[key]
+            remaining -= caps[key]
+            pending.remove(key)
+    return shares
+
+_default_governor = None
+_default_governor_lock = threading.Lock()
+
+def get_default_governor():
+    """Return the process-wide BandwidthGovernor, unlimited until set_rate() is called."""
+    global _default_governor
+    with _default_governor_lock:
+        if _default_governor is None:
+            _default_governor = BandwidthGovernor()
+        return _default_governor
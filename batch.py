@@ -0,0 +1,310 @@
+"""
+Batch download scheduler for the YouTube Downloader.
+Runs several downloads at once on a bounded worker pool and summarizes the results.
+"""
+
+import os
+import threading
+import time
+from bandwidth import BATCH
+from downloader import TERMINAL_RATE, YouTubeDownloader
+from ingest import BatchFile
+from journal import DONE
+from playlist import expand_urls, prefetch_metadata
+from stages import WorkerStage
+from transcode import TranscodePool
+from progress import ProgressBus
+from ui import ProgressBar, ProgressBoard
+from utils import get_human_readable_size, is_collection_url
+
+class BatchResult:
+    """Outcome of a single job in a batch."""
+
+    def __init__(self, index, url):
+        self.index = index
+        self.url = url
+        self.success = False
+        self.output_file = None
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.error = None
+        # Already in the output directory or the store, nothing was fetched
+        self.skipped = False
+        # Itags of the streams that were downloaded, e.g. '137+140'
+        self.itag = None
+        # Digest of the output file, when the download computed it
+        self.digest = None
+        # Future of a queued MP3 conversion that still has to finish
+        self.pending_conversion = None
+
+class BatchSummary:
+    """
+    Running totals of a batch.
+
+    Only the results of failed jobs are kept, so the memory a batch needs
+    does not grow with the number of URLs that succeed or are skipped.
+    """
+
+    def __init__(self):
+        self.succeeded = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.failed = []
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        """Count a finished job; safe to call from any thread."""
+        with self._lock:
+            if result.skipped:
+                self.skipped += 1
+            elif result.success:
+                self.succeeded += 1
+                self.bytes += result.bytes
+            else:
+                self.failed.append(result)
+
+    @property
+    def total(self):
+        """Number of jobs counted."""
+        return self.succeeded + self.skipped + len(self.failed)
+
+def _run_job(index, total, url, format_type, output_dir, quality, options, progress, journal=None):
+    """Download one URL and record what happened."""
+    label = f"{index+1}/{total}" if total else f"{index+1}"
+    options = dict(options, progress=progress, job_id=label)
+    print(f"\n\033[94m[{label}] Processing: {url}\033[0m")
+
+    result = BatchResult(index, url)
+    downloader = None
+    started = time.monotonic()
+    try:
+        downloader = YouTubeDownloader(
+            url,
+            format_type,
+            output_dir,
+            quality,
+            **options
+        )
+        result.success = downloader.download()
+        if downloader.plan:
+            result.itag = "+".join(str(stream.itag) for stream in downloader.plan.streams)
+        if result.success and downloader.pending_conversion:
+            result.pending_conversion = downloader.pending_conversion
+        elif result.success and downloader.output_file:
+            result.output_file = downloader.output_file
+            result.bytes = os.path.getsize(downloader.output_file)
+            result.digest = downloader.digest
+        elif not result.success:
+            result.error = downloader.error
+    except Exception as e:
+        result.error = str(e)
+    result.elapsed = time.monotonic() - started
+
+    if journal:
+        request = downloader.request_id() if downloader else url
+        if result.pending_conversion:
+            result.pending_conversion.add_done_callback(
+                lambda conversion: _journal_conversion(journal, request, result, conversion)
+            )
+        else:
+            _journal_result(journal, request, result, result.output_file)
+    return result
+
+def _journal_result(journal, request, result, output_file, error=None):
+    try:
+        if output_file and not error:
+            journal.completed(request, result.url, output_file, result.itag, result.digest)
+        else:
+            journal.failed(request, result.url, error or result.error or "Download failed")
+    except OSError as e:
+        print(f"\033[93mCould not update the batch journal: {str(e)}\033[0m")
+
+def _journal_conversion(journal, request, result, conversion):
+    try:
+        _journal_result(journal, request, result, conversion.result())
+    except Exception as e:
+        _journal_result(journal, request, result, None, f"Conversion failed: {str(e)}")
+
+def _finish_conversion(result):
+    """Record the output of a job's finished MP3 conversion, or why it failed."""
+    try:
+        result.output_file = result.pending_conversion.result()
+        result.bytes = os.path.getsize(result.output_file)
+    except Exception as e:
+        result.success = False
+        result.error = f"Conversion failed: {str(e)}"
+    result.pending_conversion = None
+
+def _skip_existing(urls, format_type, output_dir, quality, options, on_skipped, journal=None):
+    """
+    Number the URLs and drop the ones already downloaded, before any network work.
+
+    The journal answers for items it has seen; the others are looked up in
+    the output directory and the store.
+
+    Yields:
+        tuple: (index, url) of each URL that still has to be downloaded;
+               the others are passed to ``on_skipped`` as BatchResult
+    """
+    # Nothing is downloaded here, so nothing needs drawing
+    options = dict(options, progress=ProgressBus())
+    for index, url in enumerate(urls):
+        result = BatchResult(index, url)
+        result.skipped = True
+        downloader = YouTubeDownloader(url, format_type, output_dir, quality, **options)
+        entry = journal.get(downloader.request_id()) if journal else None
+        reason = journal.check(downloader.request_id()) if journal else None
+        if reason:
+            if entry["status"] == DONE:
+                result.success = True
+                result.output_file = entry["output"]
+                print(f"\033[92m[{index+1}] Already downloaded: {result.output_file}\033[0m")
+            else:
+                result.error = reason
+                print(f"\033[93m[{index+1}] Skipping {url}: {reason}\033[0m")
+            on_skipped(result)
+            continue
+        if entry and entry["status"] == DONE:
+            print(f"\033[93m[{index+1}] Output missing, downloading again: {entry['output']}\033[0m")
+
+        existing = downloader.find_existing()
+        if not existing:
+            yield index, url
+            continue
+        print(f"\033[92m[{index+1}] Already downloaded: {existing}\033[0m")
+        result.success = True
+        result.output_file = existing
+        if journal:
+            _journal_result(journal, downloader.request_id(), result, existing)
+        on_skipped(result)
+
+def run_batch(urls, format_type="mp4", output_dir="./downloads", quality=None, jobs=1,
+              transcode_workers=None, prefetch=4, journal=None, progress=None, on_result=None, **options):
+    """
+    Download a list of URLs, running up to ``jobs`` downloads at once.
+
+    Playlist and channel URLs are expanded as the batch goes, so downloads
+    start before a long playlist is fully listed. URLs whose output already
+    exists are skipped without contacting YouTube, and the metadata of the
+    next ``prefetch`` URLs is resolved while earlier ones download. With a
+    journal, every outcome is recorded as soon as it is known, and items it
+    lists as done, or as failed and not yet due for a retry, are skipped. MP3
+    conversions run on a separate transcode stage, so a download worker
+    moves on to its next URL while FFmpeg encodes the previous one.
+
+    Results are folded into a BatchSummary as they come in, so a batch of
+    millions of URLs runs in constant memory apart from its failures.
+
+    Args:
+        urls (iterable): YouTube video, playlist or channel URLs
+        format_type (str): 'mp3' or 'mp4'
+        output_dir (str): Directory to save the downloads
+        quality (str): Video quality or audio bitrate
+        jobs (int): Maximum number of concurrent downloads
+        transcode_workers (int): Maximum number of concurrent FFmpeg
+            conversions, defaults to the CPU count
+        prefetch (int): How many URLs to resolve metadata for ahead of the
+            downloads, 0 to disable
+        journal (BatchJournal): Journal to skip finished items and record outcomes
+        progress (ProgressBus): Bus the downloads report to, e.g. to add a
+            LogSink; a terminal display is subscribed to it for the batch
+        on_result (callable): Called with every BatchResult once it is final,
+            in completion order
+        **options: Extra keyword arguments passed to every YouTubeDownloader;
+            downloads run at BATCH bandwidth priority unless 'priority' is given
+
+    Returns:
+        tuple: (BatchSummary, wall time in seconds, list of per-stage statistics)
+    """
+    started = time.monotonic()
+    options.setdefault("priority", BATCH)
+    download_stage = WorkerStage("download", jobs)
+    stages = [download_stage]
+    if format_type == "mp3":
+        transcode_stage = TranscodePool(transcode_workers)
+        stages.append(transcode_stage)
+        options = dict(options, transcoder=transcode_stage)
+
+    # The total is only known up front for a plain list of videos
+    total = None
+    if isinstance(urls, (list, tuple)) and not any(is_collection_url(url) for url in urls):
+        urls = list(expand_urls(urls))
+        total = len(urls)
+    else:
+        # A batch file has deduplicated its videos already; expansion adds to its set
+        urls = expand_urls(urls, urls.videos if isinstance(urls, BatchFile) else None)
+
+    summary = BatchSummary()
+    # Jobs whose MP3 conversion is still running; each is counted once its conversion is done
+    converting = set()
+    converted = threading.Condition()
+
+    def finished(result):
+        if result.pending_conversion:
+            with converted:
+                converting.add(result)
+            result.pending_conversion.add_done_callback(lambda _: conversion_done(result))
+            return
+        summary.add(result)
+        if on_result:
+            on_result(result)
+
+    def conversion_done(result):
+        _finish_conversion(result)
+        finished(result)
+        with converted:
+            converting.discard(result)
+            converted.notify_all()
+
+    pending = _skip_existing(urls, format_type, output_dir, quality, options, finished, journal)
+    pending = prefetch_metadata(pending, lookahead=prefetch, cache=options.get("cache"), key=lambda item: item[1])
+
+    progress = progress or ProgressBus()
+    display = progress.subscribe(ProgressBoard() if download_stage.workers > 1 else ProgressBar(), rate=TERMINAL_RATE)
+
+    # Keep only a few jobs queued so the URL stream is consumed as downloads
+    # free up; each job is counted and dropped as soon as it is done
+    queued = download_stage.workers + 1
+    slots = threading.BoundedSemaphore(queued)
+
+    def done(future):
+        try:
+            finished(future.result())
+        finally:
+            slots.release()
+
+    for index, url in pending:
+        slots.acquire()
+        future = download_stage.submit(_run_job, index, total, url, format_type, output_dir, quality, options, progress, journal)
+        future.add_done_callback(done)
+    # Every slot is free again once the last job has been counted
+    for _ in range(queued):
+        slots.acquire()
+    with converted:
+        converted.wait_for(lambda: not converting)
+
+    progress.unsubscribe(display)
+    stage_stats = [stage.stats() for stage in stages]
+    for stage in stages:
+        stage.shutdown()
+    return summary, time.monotonic() - started, stage_stats
+
+def print_batch_summary(summary, wall_time, stage_stats=None):
+    """Print the aggregate outcome of a batch run from its BatchSummary."""
+    print("\n\033[96mBATCH SUMMARY\033[0m")
+    print(f"\033[92mSucceeded: {summary.succeeded}\033[0m")
+    print(f"\033[97mSkipped (already downloaded): {summary.skipped}\033[0m")
+    print(f"\033[91mFailed: {len(summary.failed)}\033[0m")
+    print(f"\033[97mDownloaded: {get_human_readable_size(summary.bytes)}\033[0m")
+    print(f"\033[97mWall time: {wall_time:.1f} seconds\033[0m")
+
+    for stats in stage_stats or []:
+        print(
+            f"\033[97mStage {stats['name']}: {stats['workers']} workers, "
+            f"{stats['utilization'] * 100:.0f}% busy, "
+            f"peak queue {stats['peak_queued']}\033[0m"
+        )
+
+    for result in sorted(summary.failed, key=lambda result: result.index):
+        reason = f" ({result.error})" if result.error else ""
+        print(f"\033[91m  [{result.index+1}] {result.url}{reason}\033[0m")
@@ -0,0 +1,4 @@
+"""
+Local benchmarks for the YouTube Downloader.
+Run from the repository root, e.g. ``python -m benchmarks.segmented``.
+"""
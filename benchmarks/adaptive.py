@@ -0,0 +1,106 @@
+"""
+Benchmark: sequential versus parallel fetch of adaptive video and audio, and
+stream-copy muxing versus re-encoding.
+
+Generates a 1080p video-only MP4 and an audio-only M4A with FFmpeg, serves
+them from a local server with a per-connection rate cap, and times each way
+of turning them into one MP4.
+
+    python -m benchmarks.adaptive --duration 60 --rate-mb 2
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.server import FileServer
+from transcode import mux_streams
+from transfer import download_single
+from utils import is_ffmpeg_available
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare ways of producing a muxed high-resolution MP4")
+    parser.add_argument("--duration", type=int, default=60, help="Length of the synthetic video in seconds")
+    parser.add_argument("--rate-mb", type=float, default=2, help="Per-connection rate cap in MB/s")
+    return parser.parse_args()
+
+def make_fixtures(root, duration):
+    """Write a video-only and an audio-only file like YouTube's adaptive streams."""
+    video_path = os.path.join(root, "video.mp4")
+    audio_path = os.path.join(root, "audio.m4a")
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-b:v", "4M", "-an", video_path
+        ],
+        check=True
+    )
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:a", "aac", "-b:a", "128k", "-vn", audio_path
+        ],
+        check=True
+    )
+    return video_path, audio_path
+
+def fetch(server, root, names, parallel):
+    paths = [os.path.join(root, f"fetched-{name}") for name in names]
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            for future in [executor.submit(download_single, server.url(name), path) for name, path in zip(names, paths)]:
+                future.result()
+    else:
+        for name, path in zip(names, paths):
+            download_single(server.url(name), path)
+    return paths
+
+def reencode(video_path, audio_path, destination):
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", video_path, "-i", audio_path,
+            "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", destination
+        ],
+        check=True
+    )
+
+def main():
+    args = parse_args()
+    if not is_ffmpeg_available():
+        print("FFmpeg is required for this benchmark.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as root:
+        video_path, audio_path = make_fixtures(root, args.duration)
+        names = [os.path.basename(video_path), os.path.basename(audio_path)]
+        total_size = os.path.getsize(video_path) + os.path.getsize(audio_path)
+
+        results = {}
+        with FileServer(root, rate_per_connection=int(args.rate_mb * 1024 * 1024)) as server:
+            for name, parallel in (("Sequential fetch", False), ("Parallel fetch", True)):
+                started = time.perf_counter()
+                fetched = fetch(server, root, names, parallel)
+                results[name] = time.perf_counter() - started
+
+        for name, mux in (("Re-encode mux", reencode), ("Stream-copy mux", mux_streams)):
+            started = time.perf_counter()
+            mux(fetched[0], fetched[1], os.path.join(root, f"{name.split()[0].lower()}.mp4"))
+            results[name] = time.perf_counter() - started
+
+    print(f"Source:  {args.duration} s at 1080p, {total_size / 1048576:.1f} MB at {args.rate_mb:.1f} MB/s")
+    for name, elapsed in results.items():
+        print(f"{name + ':':26}{elapsed:.2f} s")
+    print(f"{'Fetch speedup:':26}{results['Sequential fetch'] / results['Parallel fetch']:.2f}x")
+    print(f"{'Mux speedup:':26}{results['Re-encode mux'] / results['Stream-copy mux']:.2f}x")
+    print(
+        f"{'End to end speedup:':26}"
+        f"{(results['Sequential fetch'] + results['Re-encode mux']) / (results['Parallel fetch'] + results['Stream-copy mux']):.2f}x"
+    )
+
+if __name__ == "__main__":
+    main()
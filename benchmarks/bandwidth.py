@@ -0,0 +1,84 @@
+"""
+Benchmark: an interactive download competing with a batch for a shared link,
+with and without the bandwidth governor.
+
+A local fake YouTube caps the bandwidth of all its connections together, like
+a real uplink. A batch of downloads saturates it, then one interactive
+download starts; its time to finish and the batch's throughput are reported
+for unmanaged sharing and for the governor set just under the link rate.
+
+    python -m benchmarks.bandwidth --link-mb 16 --batch 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from bandwidth import BATCH, INTERACTIVE, BandwidthGovernor
+from benchmarks.fake_youtube import FakeYouTube
+from downloader import YouTubeDownloader
+from progress import ProgressBus
+
+MB = 1024 * 1024
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare interactive latency under a batch with and without the governor")
+    parser.add_argument("--link-mb", type=float, default=16, help="Bandwidth of the server in MB/s")
+    parser.add_argument("--batch", type=int, default=4, help="Number of concurrent batch downloads")
+    parser.add_argument("--length", type=int, default=120, help="Length of every video in seconds")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds into the batch the interactive download starts")
+    parser.add_argument("--headroom", type=float, default=0.9, help="Governor rate as a share of the link")
+    return parser.parse_args()
+
+def download(server, video_id, work_dir, governor, priority, timings):
+    started = time.perf_counter()
+    downloader = YouTubeDownloader(
+        server.watch_url(video_id), "mp4", work_dir, "medium", cache=False,
+        progress=ProgressBus(), bandwidth=governor, priority=priority
+    )
+    success = downloader.download()
+    timings[video_id] = (time.perf_counter() - started, os.path.getsize(downloader.output_file) if success else 0)
+
+def run(server, args, governor):
+    """Run the batch and the interactive download once; returns (interactive seconds, batch MB/s)."""
+    batch_ids, interactive_id = server.video_ids[:-1], server.video_ids[-1]
+    timings = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        threads = [
+            threading.Thread(target=download, args=(server, video_id, work_dir, governor, BATCH, timings))
+            for video_id in batch_ids
+        ]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in threads:
+                thread.start()
+            time.sleep(args.delay)
+            download(server, interactive_id, work_dir, governor, INTERACTIVE, timings)
+            for thread in threads:
+                thread.join()
+        wall = time.perf_counter() - started
+    batch_bytes = sum(timings[video_id][1] for video_id in batch_ids)
+    return timings[interactive_id][0], batch_bytes / MB / wall
+
+def main():
+    args = parse_args()
+    link = int(args.link_mb * MB)
+    with tempfile.TemporaryDirectory() as root:
+        with FakeYouTube(root, args.batch + 1, args.length, bandwidth=link) as server:
+            server.install()
+            contenders = (
+                ("Unmanaged", False),
+                ("Governor", BandwidthGovernor(link * args.headroom))
+            )
+            results = [(name, run(server, args, governor)) for name, governor in contenders]
+
+    print(f"Link:  {args.link_mb:.0f} MB/s shared by {args.batch} batch downloads and 1 interactive")
+    for name, (interactive, batch_rate) in results:
+        print(f"{name + ':':12}interactive done in {interactive:6.2f} s, batch {batch_rate:6.2f} MB/s")
+    print(f"{'Speedup:':12}{results[0][1][0] / results[1][1][0]:.1f}x for the interactive download")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: downloading a whole stream and cutting it versus fetching only the clip.
+
+Generates a fragmented MP4 (like YouTube's adaptive streams), a regular MP4
+(like the progressive ones) and a WebM with FFmpeg, serves them from a local
+server with a per-connection rate cap, and cuts the same window out of each
+both ways.
+
+    python -m benchmarks.clip --duration 600 --start 300 --length 30 --rate-mb 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.server import FileServer
+from clip import plan_clip
+from transcode import cut_clip
+from transfer import download_single
+from utils import is_ffmpeg_available
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare full downloads and byte-range clips")
+    parser.add_argument("--duration", type=int, default=600, help="Length of the synthetic videos in seconds")
+    parser.add_argument("--start", type=float, default=300, help="Clip start in seconds")
+    parser.add_argument("--length", type=float, default=30, help="Clip length in seconds")
+    parser.add_argument("--rate-mb", type=float, default=4, help="Per-connection rate cap in MB/s")
+    return parser.parse_args()
+
+def make_fixtures(root, duration):
+    """Write one file per container layout, with a keyframe every 2 seconds."""
+    source = [
+        "-f", "lavfi", "-i", f"testsrc2=size=854x480:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=duration={duration}"
+    ]
+    h264 = ["-c:v", "libx264", "-preset", "ultrafast", "-b:v", "1500k", "-g", "60", "-c:a", "aac"]
+    fixtures = {
+        "progressive.mp4": h264 + ["-movflags", "+faststart"],
+        "fragmented.mp4": h264 + ["-movflags", "+frag_keyframe+global_sidx+dash"],
+        "cues.webm": [
+            "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-b:v", "1M", "-g", "60",
+            "-c:a", "libopus", "-cues_to_front", "1"
+        ]
+    }
+    for name, options in fixtures.items():
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error"] + source + options + ["-shortest", os.path.join(root, name)],
+            check=True
+        )
+    return list(fixtures)
+
+def full(url, root, name, start, end):
+    source = os.path.join(root, f"full-{name}")
+    download_single(url, source)
+    cut_clip([(source, 0.0)], os.path.join(root, f"full-{name}.clip.mp4"), start, end)
+    fetched = os.path.getsize(source)
+    os.remove(source)
+    return fetched
+
+def ranged(url, root, name, start, end):
+    plan = plan_clip(url, None, start, end, os.path.getsize(os.path.join(root, name)))
+    source = os.path.join(root, f"ranged-{name}")
+    plan.fetch(url, source)
+    cut_clip([(source, plan.start_time)], os.path.join(root, f"ranged-{name}.clip.mp4"), start, end)
+    os.remove(source)
+    return plan.index_bytes + plan.filesize
+
+def main():
+    args = parse_args()
+    if not is_ffmpeg_available():
+        print("FFmpeg is required for this benchmark.")
+        sys.exit(1)
+    end = args.start + args.length
+
+    with tempfile.TemporaryDirectory() as root:
+        names = make_fixtures(root, args.duration)
+        rows = []
+        with FileServer(root, rate_per_connection=int(args.rate_mb * 1024 * 1024)) as server:
+            for name in names:
+                row = [name]
+                for function in (full, ranged):
+                    started = time.perf_counter()
+                    fetched = function(server.url(name), root, name, args.start, end)
+                    row += [fetched, time.perf_counter() - started]
+                rows.append(row)
+
+    print(f"Clip:    {args.start:g}-{end:g} s of {args.duration} s at {args.rate_mb:.1f} MB/s")
+    print(f"{'Container':18}{'Full MB':>10}{'Full s':>9}{'Clip MB':>10}{'Clip s':>9}{'Bytes':>9}{'Speedup':>9}")
+    for name, full_bytes, full_time, clip_bytes, clip_time in rows:
+        print(
+            f"{name:18}{full_bytes / 1048576:10.1f}{full_time:9.2f}{clip_bytes / 1048576:10.2f}"
+            f"{clip_time:9.2f}{full_bytes / clip_bytes:8.0f}x{full_time / clip_time:8.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: downloads over HTTPS with a connection per request versus the
+shared keep-alive connection pool.
+
+A local fake YouTube serves HTTPS with a throwaway self-signed certificate
+and waits ``--connect-latency`` seconds on every new connection, standing in
+for the round trips of a distant server's TCP and TLS handshakes. Every
+video is resolved and downloaded in ``--segments`` byte ranges, one after
+another, once with keep-alive off (a fresh connection per request, like
+plain urllib) and once with it on. Requires the openssl command.
+
+    python -m benchmarks.connections --videos 8 --segments 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import ssl
+import subprocess
+import tempfile
+import time
+from benchmarks.fake_youtube import FakeYouTube
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare downloads with and without connection reuse")
+    parser.add_argument("--videos", type=int, default=8, help="Number of videos")
+    parser.add_argument("--length", type=int, default=10, help="Length of every video in seconds")
+    parser.add_argument("--segments", type=int, default=4, help="Byte ranges fetched per download")
+    parser.add_argument("--connect-latency", type=float, default=0.05,
+                        help="Seconds the server waits on every new connection")
+    return parser.parse_args()
+
+def make_certificate(directory):
+    """Write a self-signed certificate for 127.0.0.1; returns (certificate, key) paths."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+def run(server, work_dir, segments, keep_alive):
+    """Download every video once; returns (wall seconds, per-video seconds, pool counters)."""
+    from connections import get_default_pool, install_pytube
+    from downloader import YouTubeDownloader
+    install_pytube()
+    pool = get_default_pool()
+    pool.close()
+    pool.keep_alive = keep_alive
+    before = pool.stats()
+    latencies = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for video_id in server.video_ids:
+            video_started = time.perf_counter()
+            downloader = YouTubeDownloader(
+                server.watch_url(video_id), "mp4", work_dir, "medium", cache=False, segments=segments
+            )
+            if not downloader.download():
+                raise RuntimeError(f"Download of {video_id} failed: {downloader.error}")
+            latencies.append(time.perf_counter() - video_started)
+            os.remove(downloader.output_file)
+    wall = time.perf_counter() - started
+    after = pool.stats()
+    return wall, latencies, {name: after[name] - before[name] for name in ("requests", "opened", "reused")}
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        cert, key = make_certificate(work_dir)
+        # The downloader's pool trusts the system's certificates, which this variable extends
+        os.environ["SSL_CERT_FILE"] = cert
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+
+        media_dir = os.path.join(work_dir, "media")
+        os.makedirs(media_dir)
+        with FakeYouTube(media_dir, args.videos, args.length, ssl_context=context,
+                         connect_latency=args.connect_latency) as server:
+            server.install()
+            results = [
+                (name, run(server, work_dir, args.segments, keep_alive))
+                for name, keep_alive in (("Per request", False), ("Pooled", True))
+            ]
+
+    print(f"{args.videos} videos over HTTPS, {args.segments} segments each, "
+          f"{args.connect_latency * 1000:.0f} ms per new connection")
+    for name, (wall, latencies, counters) in results:
+        median = sorted(latencies)[len(latencies) // 2]
+        print(f"{name + ':':13}{wall:6.2f} s total, {median * 1000:7.1f} ms median per video, "
+              f"{counters['opened']:3} connections for {counters['requests']} requests")
+    print(f"{'Speedup:':13}{results[0][1][0] / results[1][1][0]:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: per-URL latency of ytdl.py started cold for every URL versus
+handed to a warm daemon with --use-daemon.
+
+Every URL of a local fake YouTube is downloaded by its own ytdl.py
+invocation, timed from process start to exit: once as a fresh process each
+time, once through a daemon started beforehand. The time of ``ytdl.py
+--help`` is reported too, as the floor of a cold start.
+
+    python -m benchmarks.daemon --videos 8 --length 5
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_youtube import FakeYouTube
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YTDL = os.path.join(ROOT, "ytdl.py")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare cold and warm per-URL latency of ytdl.py")
+    parser.add_argument("--videos", type=int, default=8, help="Number of URLs, one invocation each")
+    parser.add_argument("--length", type=int, default=5, help="Length of every video in seconds")
+    parser.add_argument("--latency", type=float, default=0.02, help="Server latency per request in seconds")
+    return parser.parse_args()
+
+def run_cli(base_url, argv):
+    """Run ytdl.py with ``argv`` against the fake YouTube at ``base_url``."""
+    from benchmarks.fake_youtube import FakeYouTubeClient
+    import metadata
+    import ytdl
+    FakeYouTubeClient.base_url = base_url
+    metadata.YouTube = FakeYouTubeClient
+    ytdl.main(argv)
+
+def timed(command, env):
+    started = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, env=env, check=True, cwd=ROOT)
+    return time.perf_counter() - started
+
+def wait_for_socket(path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return
+        except OSError:
+            time.sleep(0.05)
+        finally:
+            probe.close()
+    raise RuntimeError(f"Daemon did not start on {path}")
+
+def cold(server, base_url, out_dir, env):
+    """Start a fresh process for every URL."""
+    wrapper = [sys.executable, "-m", "benchmarks.daemon", "--cli", base_url]
+    return [
+        timed(wrapper + ["-u", server.watch_url(video_id), "-o", out_dir], env)
+        for video_id in server.video_ids
+    ]
+
+def warm(server, base_url, out_dir, env, work_dir):
+    """Hand every URL to a daemon started once."""
+    socket_path = os.path.join(work_dir, "ytdl.sock")
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.daemon", "--cli", base_url, "--serve", "--socket", socket_path],
+        stdout=subprocess.DEVNULL, env=env, cwd=ROOT
+    )
+    try:
+        wait_for_socket(socket_path)
+        client = [sys.executable, YTDL, "--use-daemon", "--socket", socket_path]
+        return [
+            timed(client + ["-u", server.watch_url(video_id), "-o", out_dir], env)
+            for video_id in server.video_ids
+        ]
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    median = ordered[len(ordered) // 2]
+    print(f"{name + ':':8}first {latencies[0] * 1000:7.1f} ms, median {median * 1000:7.1f} ms, "
+          f"mean {sum(latencies) / len(latencies) * 1000:7.1f} ms")
+    return median
+
+def main():
+    # The child processes of the benchmark run ytdl.py through this module
+    # so they resolve videos with the fake YouTube
+    if len(sys.argv) > 2 and sys.argv[1] == "--cli":
+        run_cli(sys.argv[2], sys.argv[3:])
+        return
+
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        media_dir = os.path.join(work_dir, "media")
+        os.makedirs(media_dir)
+        with FakeYouTube(media_dir, args.videos, args.length, latency=args.latency) as server:
+            base_url = server.url("").rstrip("/")
+            results = {}
+            for name in ("Cold", "Warm"):
+                # Each mode gets a cold metadata cache and output directory of its own
+                cache_dir = os.path.join(work_dir, f"cache-{name.lower()}")
+                out_dir = os.path.join(work_dir, f"out-{name.lower()}")
+                env = dict(os.environ, YTDOWN_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+                if name == "Cold":
+                    results[name] = cold(server, base_url, out_dir, env)
+                else:
+                    results[name] = warm(server, base_url, out_dir, env, work_dir)
+                shutil.rmtree(out_dir, ignore_errors=True)
+            help_time = timed([sys.executable, YTDL, "--help"], dict(os.environ))
+
+    print(f"Help:   {help_time * 1000:7.1f} ms for ytdl.py --help")
+    medians = {name: summarize(name, latencies) for name, latencies in results.items()}
+    print(f"Speedup: {medians['Cold'] / medians['Warm']:.1f}x median per-URL latency with the daemon")
+
+if __name__ == "__main__":
+    main()
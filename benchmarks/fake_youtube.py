@@ -0,0 +1,116 @@
+"""
+Local stand-in for YouTube and its CDN used by the benchmarks.
+Serves per-video watch manifests and media files, and replaces pytube's YouTube class with a client for them.
+"""
+
+import json
+import os
+from urllib.parse import parse_qs
+import pytube.request
+from benchmarks.server import FileServer
+from utils import extract_video_id
+import metadata
+
+# itag, mime type, codecs, resolution, abr, progressive, share of the video bitrate
+STREAMS = (
+    (18, "video/mp4", ["avc1.42001E", "mp4a.40.2"], "360p", "96kbps", True, 0.25),
+    (22, "video/mp4", ["avc1.64001F", "mp4a.40.2"], "720p", "192kbps", True, 1.0),
+    (140, "audio/mp4", ["mp4a.40.2"], None, "128kbps", False, 0.05)
+)
+
+class _FakeStream:
+    """The attributes of a pytube Stream that StreamInfo.from_pytube reads."""
+
+    def __init__(self, data):
+        for name, value in data.items():
+            setattr(self, name, value)
+        self._filesize = data["filesize"]
+
+class FakeYouTubeClient:
+    """Drop-in for pytube.YouTube that reads the watch manifest of a FakeYouTube server."""
+
+    base_url = None
+
+    def __init__(self, url):
+        video_id = extract_video_id(url)
+        # Through pytube's request layer, like the watch page fetch of the real client
+        data = json.loads(pytube.request.get(f"{self.base_url}/watch?v={video_id}", timeout=30))
+        self.video_id = data["video_id"]
+        self.title = data["title"]
+        self.author = data["author"]
+        self.length = data["length"]
+        self.streams = [_FakeStream(stream) for stream in data["streams"]]
+
+class FakeYouTube(FileServer):
+    """
+    A FileServer with ``videos`` synthetic videos.
+
+    Each video has a 360p and a 720p progressive MP4 and an audio-only M4A of
+    random bytes, sized for ``length`` seconds at ``bitrate`` bytes per
+    second, so the downloader's progressive path runs without FFmpeg. The
+    manifest at ``/watch?v=<id>`` lists them like a resolved pytube video.
+    Fault injection options are those of FileServer.
+    """
+
+    def __init__(self, root, videos=8, length=60, bitrate=256 * 1024, **options):
+        """
+        Initialize the server and write its media files.
+
+        Args:
+            root (str): Directory for the media files
+            videos (int): Number of videos
+            length (int): Length of every video in seconds
+            bitrate (int): Bytes per second of the 720p stream
+            **options: FileServer options (rate_per_connection, bandwidth,
+                latency, error_rate)
+        """
+        super().__init__(root, routes={"/watch": self._watch}, **options)
+        self.length = length
+        self.video_ids = [f"bench{i:06d}" for i in range(videos)]
+        self._sizes = {}
+        for video_id in self.video_ids:
+            for itag, _, _, _, _, _, share in STREAMS:
+                name = f"{video_id}-{itag}.bin"
+                size = int(length * bitrate * share)
+                with open(os.path.join(root, name), "wb") as f:
+                    f.write(os.urandom(size))
+                self._sizes[name] = size
+
+    def watch_url(self, video_id):
+        """The YouTube URL of a video, as a user would pass it."""
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    def install(self):
+        """Make metadata resolution use this server instead of YouTube."""
+        FakeYouTubeClient.base_url = self.url("").rstrip("/")
+        metadata.YouTube = FakeYouTubeClient
+
+    def _watch(self, query):
+        video_id = parse_qs(query).get("v", [""])[0]
+        if video_id not in self.video_ids:
+            return 404, "application/json", b"{}"
+        streams = []
+        for itag, mime_type, codecs, resolution, abr, progressive, _ in STREAMS:
+            name = f"{video_id}-{itag}.bin"
+            streams.append({
+                "itag": itag,
+                "url": self.url(name),
+                "mime_type": mime_type,
+                "codecs": codecs,
+                "filesize": self._sizes[name],
+                "resolution": resolution,
+                "abr": abr,
+                "fps": 30 if resolution else None,
+                "bitrate": self._sizes[name] * 8 // self.length,
+                "is_progressive": progressive,
+                "includes_audio_track": True,
+                "includes_video_track": resolution is not None
+            })
+        manifest = {
+            "video_id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "author": "Benchmark",
+            "length": self.length,
+            "streams": streams
+        }
+        return 200, "application/json", json.dumps(manifest).encode()
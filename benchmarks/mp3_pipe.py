@@ -0,0 +1,75 @@
+"""
+Benchmark: download-then-transcode versus piping the stream into FFmpeg.
+
+Generates a synthetic audio file with FFmpeg, serves it from a local server
+with a per-connection rate cap, and converts it to MP3 both ways.
+
+    python -m benchmarks.mp3_pipe --duration 300 --rate-mb 1
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.server import FileServer
+from transcode import transcode_file, transcode_stream
+from transfer import download_single
+from utils import is_ffmpeg_available
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two-step and piped MP3 conversion")
+    parser.add_argument("--duration", type=int, default=300, help="Length of the synthetic audio in seconds")
+    parser.add_argument("--rate-mb", type=float, default=1, help="Per-connection rate cap in MB/s")
+    parser.add_argument("--bitrate", default="192k", help="MP3 bitrate")
+    return parser.parse_args()
+
+def make_audio(path, duration):
+    """Write a fragmented M4A like YouTube's audio-only streams."""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "frag_keyframe+empty_moov", path
+        ],
+        check=True
+    )
+
+def two_step(url, root, total_size, bitrate):
+    temp_file = os.path.join(root, "two_step.m4a")
+    download_single(url, temp_file, total_size)
+    transcode_file(temp_file, os.path.join(root, "two_step.mp3"), bitrate)
+    os.remove(temp_file)
+
+def piped(url, root, total_size, bitrate):
+    transcode_stream(url, os.path.join(root, "piped.mp3"), bitrate, total_size)
+
+def main():
+    args = parse_args()
+    if not is_ffmpeg_available():
+        print("FFmpeg is required for this benchmark.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "audio.m4a")
+        make_audio(source, args.duration)
+        total_size = os.path.getsize(source)
+
+        with FileServer(root, rate_per_connection=int(args.rate_mb * 1024 * 1024)) as server:
+            url = server.url("audio.m4a")
+            results = {}
+            for name, function in (("Download, then transcode", two_step), ("Piped into FFmpeg", piped)):
+                started = time.perf_counter()
+                function(url, root, total_size, args.bitrate)
+                results[name] = time.perf_counter() - started
+
+    print(f"Source:  {args.duration} s of audio, {total_size / 1048576:.1f} MB at {args.rate_mb:.1f} MB/s")
+    for name, elapsed in results.items():
+        print(f"{name + ':':26}{elapsed:.2f} s")
+    two_step_time, piped_time = results.values()
+    print(f"{'Speedup:':26}{two_step_time / piped_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
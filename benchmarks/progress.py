@@ -0,0 +1,79 @@
+"""
+Benchmark: CPU cost of progress reporting per chunk, drawing on every call
+versus publishing events to a rate-limited terminal sink.
+
+Feeds the same sequence of chunk callbacks to both, with the terminal output
+going to a null device, and reports time per chunk and lines written.
+
+    python -m benchmarks.progress --size-mb 512 --chunk-kb 64
+"""
+
+import argparse
+import os
+import sys
+import time
+from progress import ProgressBus, ProgressReporter
+from ui import ProgressBar, display_progress
+
+class _Stream:
+    def __init__(self, filesize):
+        self.filesize = filesize
+
+class _CountingWriter:
+    """Null stdout that counts writes."""
+
+    def __init__(self, target):
+        self.target = target
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare per-chunk and throttled progress rendering")
+    parser.add_argument("--size-mb", type=int, default=512, help="Simulated download size in MB")
+    parser.add_argument("--chunk-kb", type=int, default=64, help="Chunk size in KB")
+    parser.add_argument("--rate", type=float, default=10, help="Redraws per second of the throttled bar")
+    return parser.parse_args()
+
+def run(callback, stream, chunk_size):
+    started = time.process_time()
+    remaining = stream.filesize
+    while remaining > 0:
+        remaining = max(0, remaining - chunk_size)
+        callback(stream, None, remaining)
+    return time.process_time() - started
+
+def main():
+    args = parse_args()
+    stream = _Stream(args.size_mb * 1024 * 1024)
+    chunk_size = args.chunk_kb * 1024
+    chunks = -(-stream.filesize // chunk_size)
+
+    bus = ProgressBus()
+    bus.subscribe(ProgressBar(), rate=args.rate)
+    contenders = (("Draw every chunk", display_progress), ("Throttled events", ProgressReporter(bus, "bench").callback))
+
+    results = []
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        for name, callback in contenders:
+            sys.stdout = _CountingWriter(devnull)
+            try:
+                cpu = run(callback, stream, chunk_size)
+                writes = sys.stdout.writes
+            finally:
+                sys.stdout = stdout
+            results.append((name, cpu, writes))
+
+    print(f"Chunks:  {chunks} of {args.chunk_kb} KB")
+    for name, cpu, writes in results:
+        print(f"{name + ':':20}{cpu:8.3f} s CPU {cpu / chunks * 1e6:8.2f} us/chunk {writes:8d} writes")
+    print(f"{'Speedup:':20}{results[0][1] / results[1][1]:8.1f}x")
+
+if __name__ == "__main__":
+    main()
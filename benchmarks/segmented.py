@@ -0,0 +1,57 @@
+"""
+Benchmark: single-connection versus segmented stream download.
+
+Serves a random file from a local server that caps every connection to the
+same rate, then downloads it both ways and reports the speedup.
+
+    python -m benchmarks.segmented --size-mb 32 --rate-mb 4 --segments 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.server import FileServer
+from transfer import download_segmented, download_single
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare single-connection and segmented downloads")
+    parser.add_argument("--size-mb", type=float, default=16, help="Size of the test file in MB")
+    parser.add_argument("--rate-mb", type=float, default=4, help="Per-connection rate cap in MB/s")
+    parser.add_argument("--segments", type=int, default=8, help="Number of parallel ranges")
+    return parser.parse_args()
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+def main():
+    args = parse_args()
+    total_size = int(args.size_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "media.bin")
+        with open(source, "wb") as f:
+            f.write(os.urandom(total_size))
+
+        with FileServer(root, rate_per_connection=int(args.rate_mb * 1024 * 1024)) as server:
+            url = server.url("media.bin")
+            single_path = os.path.join(root, "single.bin")
+            segmented_path = os.path.join(root, "segmented.bin")
+
+            single = timed(download_single, url, single_path, total_size)
+            segmented = timed(download_segmented, url, segmented_path, total_size, args.segments)
+
+        with open(source, "rb") as a, open(segmented_path, "rb") as b:
+            identical = a.read() == b.read()
+
+    size_mb = total_size / (1024 * 1024)
+    print(f"File size:          {size_mb:.1f} MB (cap {args.rate_mb:.1f} MB/s per connection)")
+    print(f"Single connection:  {single:.2f} s ({size_mb / single:.1f} MB/s)")
+    print(f"{args.segments} segments:         {segmented:.2f} s ({size_mb / segmented:.1f} MB/s)")
+    print(f"Speedup:            {single / segmented:.2f}x")
+    print(f"Content identical:  {identical}")
+
+if __name__ == "__main__":
+    main()
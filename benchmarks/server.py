@@ -0,0 +1,187 @@
+"""
+Local HTTP file server used by the benchmarks.
+Serves files over HTTP or HTTPS with Range support and can inject latency, bandwidth caps, per-connection throttling and errors.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+class _Bandwidth:
+    """Rate cap shared by all connections: each send waits for its turn on a common schedule."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def take(self, size):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+class ThrottledFileHandler(BaseHTTPRequestHandler):
+    """Serve files from ``server.root`` with byte ranges, injected faults and rate caps."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        # Stands in for the round trips of the TCP and TLS handshakes of a distant server
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+        super().setup()
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        path, _, query = self.path.partition("?")
+        route = self.server.routes.get(path)
+        if route:
+            status, content_type, body = route(query)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        file_path = os.path.join(self.server.root, path.lstrip("/"))
+        if not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        stat = os.stat(file_path)
+        total_size = stat.st_size
+        start, end = 0, total_size - 1
+        match = None if self.server.ignore_ranges else RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else total_size - 1
+            else:
+                start = max(0, total_size - int(match.group(2)))
+            end = min(end, total_size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{total_size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{stat.st_mtime_ns:x}-{total_size:x}"')
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Type", "application/octet-stream")
+        self.end_headers()
+        if send_body:
+            self._send_range(file_path, start, end)
+
+    def _send_range(self, file_path, start, end):
+        rate = self.server.rate_per_connection
+        block_size = 64 * 1024
+        started = time.monotonic()
+        sent = 0
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                if self.server.bandwidth:
+                    self.server.bandwidth.take(len(block))
+                try:
+                    self.wfile.write(block)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(block)
+                remaining -= len(block)
+                if rate:
+                    # Sleep until this connection is back under its rate cap
+                    delay = sent / rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+class FileServer:
+    """Run a ThrottledFileHandler server on a background thread."""
+
+    def __init__(self, root, rate_per_connection=None, host="127.0.0.1", port=0,
+                 bandwidth=None, latency=0.0, error_rate=0.0, routes=None, ssl_context=None,
+                 connect_latency=0.0, ignore_ranges=False):
+        """
+        Initialize the server.
+
+        Args:
+            root (str): Directory whose files are served
+            rate_per_connection (int): Bytes per second allowed on each connection, None for unlimited
+            host (str): Address to bind
+            port (int): Port to bind, 0 picks a free one
+            bandwidth (int): Bytes per second shared by all connections, None for unlimited
+            latency (float): Seconds to wait before answering each request
+            error_rate (float): Share of requests answered with 503 instead
+            routes (dict): Path -> callable(query) returning (status, content type,
+                body bytes), for responses that are not files
+            ssl_context (ssl.SSLContext): Server context with a certificate,
+                to serve HTTPS instead of HTTP
+            connect_latency (float): Seconds to wait before serving each new
+                connection
+            ignore_ranges (bool): Answer every request with the whole file,
+                like servers without Range support
+        """
+        self.httpd = ThreadingHTTPServer((host, port), ThrottledFileHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.root = root
+        self.httpd.rate_per_connection = rate_per_connection
+        self.httpd.bandwidth = _Bandwidth(bandwidth) if bandwidth else None
+        self.httpd.latency = latency
+        self.httpd.error_rate = error_rate
+        self.httpd.routes = routes or {}
+        self.httpd.connect_latency = connect_latency
+        self.httpd.ignore_ranges = ignore_ranges
+        self.scheme = "https" if ssl_context else "http"
+        if ssl_context:
+            # The handshake runs on the connection's own thread, at its first read
+            self.httpd.socket = ssl_context.wrap_socket(
+                self.httpd.socket, server_side=True, do_handshake_on_connect=False
+            )
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, name):
+        host, port = self.httpd.server_address[:2]
+        return f"{self.scheme}://{host}:{port}/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,236 @@
+"""
+Benchmark suite: end-to-end scenarios against a local fake YouTube.
+
+Each scenario runs in its own process against a FakeYouTube server with its
+own fault injection, and drives a real entry point: YouTubeDownloader, the
+ytdl.py batch mode or the Flask /download endpoint. Throughput, p50/p99
+latency per video, peak RSS and CPU time are reported per scenario and saved
+as JSON, which a later run can be compared against.
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_youtube import FakeYouTube
+
+MB = 1024 * 1024
+
+# Server conditions of each scenario; 'run' names the entry point it drives
+SCENARIOS = {
+    "downloader": {"run": "downloader", "server": {"rate_per_connection": 8 * MB, "latency": 0.05}},
+    "downloader-segmented": {
+        "run": "downloader", "segments": 4, "server": {"rate_per_connection": 8 * MB, "latency": 0.05}
+    },
+    "downloader-flaky": {
+        "run": "downloader", "server": {"rate_per_connection": 8 * MB, "latency": 0.05, "error_rate": 0.1}
+    },
+    "batch": {"run": "batch", "jobs": 4, "server": {"rate_per_connection": 8 * MB, "bandwidth": 24 * MB, "latency": 0.05}},
+    "flask": {"run": "flask", "server": {"rate_per_connection": 8 * MB, "bandwidth": 24 * MB, "latency": 0.05}}
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run end-to-end benchmarks against a local fake YouTube")
+    parser.add_argument("--scenarios", help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--videos", type=int, default=8, help="Videos per scenario")
+    parser.add_argument("--length", type=int, default=60, help="Length of every video in seconds")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values``, None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+def run_downloader(server, work_dir, config):
+    """Download every video in turn with YouTubeDownloader."""
+    from downloader import YouTubeDownloader
+    latencies, total_bytes, failed = [], 0, 0
+    for video_id in server.video_ids:
+        started = time.perf_counter()
+        downloader = YouTubeDownloader(
+            server.watch_url(video_id), "mp4", work_dir, "medium", segments=config.get("segments", 1)
+        )
+        if downloader.download():
+            latencies.append(time.perf_counter() - started)
+            total_bytes += os.path.getsize(downloader.output_file)
+        else:
+            failed += 1
+    return latencies, total_bytes, failed
+
+def run_batch(server, work_dir, config):
+    """Run ``ytdl.py -b`` on a file listing every video."""
+    import batch
+    import ytdl
+    batch_file = os.path.join(work_dir, "urls.txt")
+    with open(batch_file, "w") as f:
+        f.write("\n".join(server.watch_url(video_id) for video_id in server.video_ids) + "\n")
+
+    # Keep what ytdl.main prints, but capture the per-video results it summarizes
+    captured = []
+    real_run_batch = batch.run_batch
+
+    def run_batch_and_capture(*args, **kwargs):
+        return real_run_batch(*args, on_result=captured.append, **kwargs)
+
+    batch.run_batch = run_batch_and_capture
+    sys.argv = [
+        "ytdl.py", "-b", batch_file, "-f", "mp4", "-q", "medium", "-o", os.path.join(work_dir, "out"),
+        "-j", str(config.get("jobs", 4)), "--no-journal"
+    ]
+    ytdl.main()
+    done = [result for result in captured if result.success]
+    return [result.elapsed for result in done], sum(result.bytes for result in done), len(captured) - len(done)
+
+def run_flask(server, work_dir, config):
+    """Submit every video to POST /download and wait for the jobs to finish."""
+    os.environ["DOWNLOAD_DIR"] = os.path.join(work_dir, "downloads")
+    import app
+    client = app.app.test_client()
+
+    submitted = set()
+    for video_id in server.video_ids:
+        response = client.post("/download", json={"url": server.watch_url(video_id), "format": "mp4", "quality": "medium"})
+        submitted.add(response.get_json()["job_id"])
+
+    # Latency is from accepting the request to the job being done
+    latencies, total_bytes, failed = [], 0, 0
+    while submitted:
+        for job_id in list(submitted):
+            status = client.get(f"/jobs/{job_id}").get_json()
+            if status["state"] == "done":
+                latencies.append(status["finished_at"] - status["created_at"])
+                total_bytes += status["total_bytes"]
+            elif status["state"] == "failed":
+                failed += 1
+            else:
+                continue
+            submitted.discard(job_id)
+        time.sleep(0.05)
+    app.job_manager.shutdown()
+    return latencies, total_bytes, failed
+
+RUNNERS = {"downloader": run_downloader, "batch": run_batch, "flask": run_flask}
+
+def run_child(name, args):
+    """Run one scenario in this process and write its measurements to ``args.result``."""
+    config = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as work_dir:
+        media_dir = os.path.join(work_dir, "media")
+        os.makedirs(media_dir)
+        with FakeYouTube(media_dir, args.videos, args.length, **config["server"]) as server:
+            server.install()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies, total_bytes, failed = RUNNERS[config["run"]](server, work_dir, config)
+            wall = time.perf_counter() - started
+
+    with open(args.result, "w") as f:
+        json.dump({
+            "wall_seconds": round(wall, 3),
+            "bytes": total_bytes,
+            "succeeded": len(latencies),
+            "failed": failed,
+            "throughput_mb_s": round(total_bytes / MB / wall, 2) if wall else None,
+            "p50_seconds": percentile(latencies, 0.5),
+            "p99_seconds": percentile(latencies, 0.99)
+        }, f)
+
+def run_scenario(name, args):
+    """Run a scenario in a child process and add its peak RSS and CPU time."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    cache_dir = tempfile.mkdtemp()
+    try:
+        command = [
+            sys.executable, "-m", "benchmarks.suite", "--child", name, "--result", result_path,
+            "--videos", str(args.videos), "--length", str(args.length)
+        ]
+        # A cold metadata cache of its own, so scenarios do not help each other
+        env = dict(os.environ, YTDOWN_CACHE_DIR=cache_dir)
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            return {"error": f"exit status {process.returncode}"}
+        with open(result_path) as f:
+            result = json.load(f)
+    finally:
+        os.remove(result_path)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = round(usage.ru_maxrss / 1024, 1)
+    result["cpu_seconds"] = round(usage.ru_utime + usage.ru_stime, 3)
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None):
+    columns = ("throughput_mb_s", "p50_seconds", "p99_seconds", "peak_rss_mb", "cpu_seconds")
+    print(f"{'Scenario':24}{'MB/s':>9}{'p50 s':>9}{'p99 s':>9}{'RSS MB':>9}{'CPU s':>9}{'ok/fail':>10}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:24}{result['error']}")
+            continue
+        cells = "".join(f"{result[column]:9.2f}" if result[column] is not None else f"{'-':>9}" for column in columns)
+        print(f"{name:24}{cells}{result['succeeded']:>6}/{result['failed']}")
+        previous = (baseline or {}).get(name)
+        if previous and "error" not in previous:
+            changes = "".join(
+                f"{(result[column] / previous[column] - 1) * 100:+8.0f}%" if result[column] and previous.get(column) else f"{'-':>9}"
+                for column in columns
+            )
+            print(f"{'  vs baseline':24}{changes}")
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args.child, args)
+        return
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}")
+        sys.exit(1)
+
+    results = {name: run_scenario(name, args) for name in names}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["scenarios"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "time": time.time(),
+                "videos": args.videos,
+                "length": args.length,
+                "scenarios": results
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
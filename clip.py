@@ -0,0 +1,489 @@
+"""
+Time-range clips for the YouTube Downloader.
+Maps a time window to byte ranges through the container index and fetches only those bytes.
+"""
+
+import bisect
+import os
+import struct
+from transfer import CHUNK_SIZE, PART_SUFFIX, TransferError, open_url
+
+# Bytes read from the start of a stream to find its index
+HEAD_BYTES = 64 * 1024
+# Media kept on each side of the window when cutting by sample table, in seconds
+SAMPLE_MARGIN = 1.0
+# Start of the media data kept for FFmpeg to probe the streams
+PROBE_BYTES = 64 * 1024
+
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+_SEGMENT = 0x18538067
+_SEEK_HEAD = 0x114D9B74
+_SEEK = 0x4DBB
+_SEEK_ID = 0x53AB
+_SEEK_POSITION = 0x53AC
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_CUES = 0x1C53BB6B
+_CUE_POINT = 0xBB
+_CUE_TIME = 0xB3
+_CUE_TRACK_POSITIONS = 0xB7
+_CUE_CLUSTER_POSITION = 0xF1
+_CLUSTER = 0x1F43B675
+
+class ClipError(Exception):
+    """Raised when a stream has no index that can be used to fetch a clip."""
+
+class ClipPlan:
+    """
+    Byte ranges of a stream that hold a time window.
+
+    ``fetch()`` writes them to a local file FFmpeg can cut. For fragmented
+    MP4 and WebM the ranges are concatenated: the header followed by the
+    fragments or clusters of the window, whose timestamps start at
+    ``start_time``. For regular MP4, where samples are located by absolute
+    offsets in the ``moov`` box, the ranges are written at their original
+    offsets into a sparse file of the full size, and ``start_time`` is 0.
+    """
+
+    def __init__(self, itag, container, ranges, start_time, sparse=False, total_size=None, index_bytes=0):
+        """
+        Initialize the plan.
+
+        Args:
+            itag (int): Itag of the stream the clip comes from
+            container (str): 'mp4', 'fmp4' or 'webm'
+            ranges (list): (start, end) byte ranges, end exclusive
+            start_time (float): Timestamp in seconds of the first fetched media
+            sparse (bool): Write ranges at their offsets instead of concatenating them
+            total_size (int): Size of the whole stream, for sparse files
+            index_bytes (int): Bytes read to find the ranges
+        """
+        self.itag = itag
+        self.container = container
+        self.ranges = _merge(ranges)
+        self.start_time = start_time
+        self.sparse = sparse
+        self.total_size = total_size
+        self.index_bytes = index_bytes
+        # Bytes fetch() transfers; 'filesize' so progress callbacks can treat a plan like a stream
+        self.filesize = sum(end - start for start, end in self.ranges)
+
+    def fetch(self, url, path, on_progress=None, throttle=None):
+        """
+        Download the planned ranges of ``url`` into ``path``.
+
+        Args:
+            url (str): Stream URL
+            path (str): Local file to write
+            on_progress (callable): Called with (chunk, bytes_done)
+            throttle (callable): Called with the size of each chunk read, may block
+
+        Raises:
+            TransferError: If a range comes back short
+        """
+        part_path = path + PART_SUFFIX
+        done = 0
+        with open(part_path, "wb") as f:
+            for start, end in self.ranges:
+                if self.sparse:
+                    f.seek(start)
+                remaining = end - start
+                with open_url(url, start, end - 1) as response:
+                    while remaining:
+                        chunk = response.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise TransferError(f"Range {start}-{end - 1} ended {remaining} bytes early")
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                        done += len(chunk)
+                        if on_progress:
+                            on_progress(chunk, done)
+                        if throttle:
+                            throttle(len(chunk))
+            if self.sparse and self.total_size:
+                f.truncate(self.total_size)
+        os.replace(part_path, path)
+        return path
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class _RangeReader:
+    """Reads parts of a remote file, keeping the first bytes around."""
+
+    def __init__(self, url, total_size=None):
+        self.url = url
+        self.total_size = total_size
+        self.head = b""
+        self.bytes_read = 0
+
+    def read(self, offset, length):
+        if offset + length <= len(self.head):
+            return self.head[offset:offset + length]
+        if self.total_size:
+            length = min(length, self.total_size - offset)
+        if length <= 0:
+            return b""
+        with open_url(self.url, offset, offset + length - 1) as response:
+            # A server that ignores the range sends everything; take what was asked for
+            data = response.read(length)
+        self.bytes_read += len(data)
+        if offset == 0 and len(data) > len(self.head):
+            self.head = data
+        return data
+
+def _covering(points, start, end, data_end):
+    """
+    Pick the run of index points that covers [start, end).
+
+    Args:
+        points (list): (time, byte offset) of each fragment or cluster, in order
+        data_end (int): Offset where the last one ends
+
+    Returns:
+        tuple: (time of the first point, start offset, end offset)
+    """
+    times = [time for time, _ in points]
+    first = max(bisect.bisect_right(times, start) - 1, 0)
+    last = len(points) if end is None else max(bisect.bisect_left(times, end), first + 1)
+    stop = points[last][1] if last < len(points) else data_end
+    return points[first][0], points[first][1], stop
+
+# MP4
+
+def _box_header(data, offset, limit):
+    """Return (type, header size, box size) of the box at ``offset``."""
+    size, box_type = struct.unpack_from(">I4s", data, offset)
+    header = 8
+    if size == 1:
+        size = struct.unpack_from(">Q", data, offset + 8)[0]
+        header = 16
+    elif size == 0:
+        size = limit - offset
+    if size < header:
+        raise ClipError(f"Corrupt MP4 box at offset {offset}")
+    return box_type.decode("latin-1"), header, size
+
+def _boxes(data, start=0, end=None):
+    """Yield (type, payload start, payload end) of the boxes in ``data[start:end]``."""
+    end = len(data) if end is None else end
+    while start + 8 <= end:
+        box_type, header, size = _box_header(data, start, end)
+        yield box_type, start + header, start + size
+        start += size
+
+def _child(data, start, end, box_type):
+    return next(((s, e) for t, s, e in _boxes(data, start, end) if t == box_type), None)
+
+def _top_level_boxes(reader):
+    """Yield (type, offset, header size, size) of the top-level boxes of a remote MP4."""
+    offset = 0
+    limit = reader.total_size or float("inf")
+    while offset < limit:
+        header = reader.read(offset, 16)
+        if len(header) < 8:
+            return
+        box_type, header_size, size = _box_header(header, 0, limit - offset)
+        yield box_type, offset, header_size, size
+        offset += size
+
+def _parse_sidx(data, first_byte):
+    """Return (time, offset, size) of the subsegments in a sidx payload."""
+    version = data[0]
+    timescale = struct.unpack_from(">I", data, 8)[0]
+    if version == 0:
+        earliest, first_offset = struct.unpack_from(">II", data, 12)
+        pos = 20
+    else:
+        earliest, first_offset = struct.unpack_from(">QQ", data, 12)
+        pos = 28
+    count = struct.unpack_from(">H", data, pos + 2)[0]
+    pos += 4
+
+    segments = []
+    offset = first_byte + first_offset
+    time = earliest
+    for _ in range(count):
+        reference, duration = struct.unpack_from(">II", data, pos)
+        if reference >> 31:
+            raise ClipError("Hierarchical sidx indexes are not supported")
+        size = reference & 0x7FFFFFFF
+        segments.append((time / timescale, offset, size))
+        offset += size
+        time += duration
+        pos += 12
+    return segments
+
+def _sample_table(data, start, end):
+    """Return (times, offsets, sizes, sync sample times or None) of the samples of a trak box."""
+    mdia = _child(data, start, end, "mdia")
+    mdhd = _child(data, *mdia, "mdhd")
+    version = data[mdhd[0]]
+    timescale = struct.unpack_from(">I", data, mdhd[0] + (20 if version else 12))[0]
+    stbl = _child(data, *_child(data, *mdia, "minf"), "stbl")
+    boxes = {box_type: (s, e) for box_type, s, e in _boxes(data, *stbl)}
+
+    def entries(box_type, fields, skip=4):
+        s, _ = boxes[box_type]
+        count = struct.unpack_from(">I", data, s + skip)[0]
+        values = struct.unpack_from(f">{count * len(fields)}{fields[0]}", data, s + skip + 4)
+        return [values[i:i + len(fields)] for i in range(0, len(values), len(fields))]
+
+    times = []
+    t = 0
+    for count, delta in entries("stts", "II"):
+        for _ in range(count):
+            times.append(t / timescale)
+            t += delta
+
+    s, _ = boxes["stsz"]
+    uniform, count = struct.unpack_from(">II", data, s + 4)
+    sizes = [uniform] * count if uniform else list(struct.unpack_from(f">{count}I", data, s + 12))
+
+    if "co64" in boxes:
+        chunk_offsets = [row[0] for row in entries("co64", "Q")]
+    else:
+        chunk_offsets = [row[0] for row in entries("stco", "I")]
+
+    offsets = []
+    runs = entries("stsc", "III")
+    sample = 0
+    for i, (first_chunk, per_chunk, _) in enumerate(runs):
+        last_chunk = runs[i + 1][0] - 1 if i + 1 < len(runs) else len(chunk_offsets)
+        for chunk in range(first_chunk - 1, last_chunk):
+            position = chunk_offsets[chunk]
+            for _ in range(per_chunk):
+                if sample >= len(sizes):
+                    break
+                offsets.append(position)
+                position += sizes[sample]
+                sample += 1
+
+    sync = None
+    if "stss" in boxes:
+        sync = [times[row[0] - 1] for row in entries("stss", "I") if row[0] - 1 < len(times)]
+    return times[:len(offsets)], offsets, sizes[:len(offsets)], sync
+
+def _plan_mp4(reader, itag, start, end):
+    boxes = {}
+    for box_type, offset, header, size in _top_level_boxes(reader):
+        boxes.setdefault(box_type, (offset, header, size))
+        if box_type == "sidx" or (box_type == "moof" and "sidx" not in boxes):
+            break
+        if "moov" in boxes and "mdat" in boxes:
+            break
+
+    if "sidx" in boxes:
+        offset, header, size = boxes["sidx"]
+        segments = _parse_sidx(reader.read(offset + header, size - header), offset + size)
+        points = [(time, position) for time, position, _ in segments]
+        data_end = segments[-1][1] + segments[-1][2]
+        start_time, first, stop = _covering(points, start, end, data_end)
+        # Header (ftyp + moov) followed by the fragments of the window
+        return ClipPlan(itag, "fmp4", [(0, offset), (first, stop)], start_time,
+                        index_bytes=reader.bytes_read)
+
+    if "moov" not in boxes or "mdat" not in boxes:
+        raise ClipError("MP4 stream has neither a sidx index nor a moov box")
+
+    moov_offset, header, size = boxes["moov"]
+    moov = reader.read(moov_offset, size)
+    tracks = [_sample_table(moov, s, e) for box_type, s, e in _boxes(moov, header) if box_type == "trak"]
+    tracks = [track for track in tracks if track[1]]
+    if not tracks:
+        raise ClipError("MP4 stream has no samples")
+
+    # Begin at the keyframe before the window so the first frames decode
+    window_start = start
+    for times, _, _, sync in tracks:
+        if sync:
+            index = bisect.bisect_right(sync, start) - 1
+            window_start = min(window_start, sync[max(index, 0)])
+    window_start -= SAMPLE_MARGIN
+    window_end = None if end is None else end + SAMPLE_MARGIN
+
+    low, high = None, 0
+    for times, offsets, sizes, _ in tracks:
+        first = max(bisect.bisect_left(times, window_start), 0)
+        last = len(times) if window_end is None else bisect.bisect_right(times, window_end)
+        if first >= last:
+            continue
+        low = min(low, min(offsets[first:last])) if low is not None else min(offsets[first:last])
+        high = max(high, max(offsets[i] + sizes[i] for i in range(first, last)))
+    if low is None:
+        raise ClipError("The requested time range has no samples")
+
+    mdat_offset, mdat_header, _ = boxes["mdat"]
+    data_start = mdat_offset + mdat_header
+    ranges = [
+        (0, data_start + PROBE_BYTES),
+        (moov_offset, moov_offset + size),
+        (low, high)
+    ]
+    return ClipPlan(itag, "mp4", ranges, 0.0, sparse=True, total_size=reader.total_size,
+                    index_bytes=reader.bytes_read)
+
+# WebM
+
+def _read_vint(data, pos, keep_marker=False):
+    """Return (value, length) of the EBML variable-size integer at ``pos``."""
+    first = data[pos]
+    length = 1
+    marker = 0x80
+    while length <= 8 and not first & marker:
+        marker >>= 1
+        length += 1
+    if length > 8:
+        raise ClipError(f"Corrupt EBML number at offset {pos}")
+    value = first if keep_marker else first & (marker - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, length
+
+def _elements(data, pos, end):
+    """Yield (id, element start, data start, data end) of the EBML elements in ``data[pos:end]``."""
+    while pos < end:
+        element_id, id_length = _read_vint(data, pos, keep_marker=True)
+        size, size_length = _read_vint(data, pos + id_length)
+        data_start = pos + id_length + size_length
+        unknown = size == (1 << (7 * size_length)) - 1
+        data_end = end if unknown else data_start + size
+        yield element_id, pos, data_start, data_end
+        pos = data_end
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], "big")
+
+def _element_at(reader, offset):
+    """Read the whole element at ``offset``; returns (id, bytes, data start within them)."""
+    header = reader.read(offset, 16)
+    element_id, id_length = _read_vint(header, 0, keep_marker=True)
+    size, size_length = _read_vint(header, id_length)
+    data = reader.read(offset, id_length + size_length + size)
+    return element_id, data, id_length + size_length
+
+def _parse_cues(data, start, end, scale, segment_start):
+    points = []
+    for element_id, _, s, e in _elements(data, start, end):
+        if element_id != _CUE_POINT:
+            continue
+        time = position = None
+        for child_id, _, cs, ce in _elements(data, s, e):
+            if child_id == _CUE_TIME:
+                time = _uint(data, cs, ce) * scale / 1e9
+            elif child_id == _CUE_TRACK_POSITIONS and position is None:
+                for grandchild_id, _, gs, ge in _elements(data, cs, ce):
+                    if grandchild_id == _CUE_CLUSTER_POSITION:
+                        position = segment_start + _uint(data, gs, ge)
+        if time is not None and position is not None:
+            points.append((time, position))
+    # Several tracks can point at the same cluster
+    unique = {}
+    for time, position in sorted(points):
+        unique.setdefault(position, time)
+    return sorted((time, position) for position, time in unique.items())
+
+def _plan_webm(reader, itag, start, end):
+    head = reader.read(0, HEAD_BYTES)
+    # The EBML header is followed by the Segment holding everything else
+    _, _, _, header_end = next(_elements(head, 0, len(head)))
+    element_id, _, segment_start, _ = next(_elements(head, header_end, len(head)))
+    if element_id != _SEGMENT:
+        raise ClipError("WebM stream has no Segment")
+
+    scale = 1000000
+    cues = None
+    cues_position = None
+    first_cluster = None
+    pos = segment_start
+    while first_cluster is None:
+        element_id, data, data_start = _element_header_or_element(reader, pos)
+        length = len(data)
+        if element_id == _CLUSTER:
+            first_cluster = pos
+            break
+        if element_id == _SEEK_HEAD:
+            for seek_id, _, s, e in _elements(data, data_start, length):
+                if seek_id != _SEEK:
+                    continue
+                fields = {child_id: (cs, ce) for child_id, _, cs, ce in _elements(data, s, e)}
+                if _SEEK_ID in fields and _SEEK_POSITION in fields:
+                    if _uint(data, *fields[_SEEK_ID]) == _CUES:
+                        cues_position = segment_start + _uint(data, *fields[_SEEK_POSITION])
+        elif element_id == _INFO:
+            for child_id, _, s, e in _elements(data, data_start, length):
+                if child_id == _TIMECODE_SCALE:
+                    scale = _uint(data, s, e)
+        elif element_id == _CUES:
+            cues = (pos, pos + length, data, data_start)
+        pos += length
+
+    if cues is None:
+        if cues_position is None:
+            raise ClipError("WebM stream has no Cues index")
+        element_id, data, data_start = _element_at(reader, cues_position)
+        if element_id != _CUES:
+            raise ClipError("WebM SeekHead does not point at the Cues")
+        cues = (cues_position, cues_position + len(data), data, data_start)
+
+    cues_start, cues_end, data, data_start = cues
+    points = _parse_cues(data, data_start, len(data), scale, segment_start)
+    if not points:
+        raise ClipError("WebM Cues index is empty")
+    # Clusters run up to the Cues when those are at the end, otherwise to the end of the file
+    data_end = cues_start if cues_start > first_cluster else reader.total_size
+    if data_end is None:
+        raise ClipError("WebM stream size is unknown")
+    start_time, first, stop = _covering(points, start, end, data_end)
+
+    # Leave the Cues out: their cluster offsets are wrong in the concatenated file
+    header = [(0, first_cluster)]
+    if cues_start < first_cluster:
+        header = [(0, cues_start), (cues_end, first_cluster)]
+    return ClipPlan(itag, "webm", header + [(first, stop)], start_time, index_bytes=reader.bytes_read)
+
+def _element_header_or_element(reader, offset):
+    """Read an element, but only its header if it is a Cluster (which can be huge)."""
+    header = reader.read(offset, 16)
+    element_id, id_length = _read_vint(header, 0, keep_marker=True)
+    size, size_length = _read_vint(header, id_length)
+    if element_id == _CLUSTER:
+        return element_id, header[:id_length + size_length], id_length + size_length
+    return element_id, reader.read(offset, id_length + size_length + size), id_length + size_length
+
+def plan_clip(url, itag, start, end=None, total_size=None):
+    """
+    Find the byte ranges of a stream that hold the time window [start, end).
+
+    Args:
+        url (str): Stream URL; the server must support range requests
+        itag (int): Itag of the stream
+        start (float): Window start in seconds
+        end (float): Window end in seconds, None for the end of the stream
+        total_size (int): Size of the stream, if known
+
+    Returns:
+        ClipPlan: The ranges to fetch
+
+    Raises:
+        ClipError: If the container or its index is not supported
+        TransferError: If the server does not support range requests
+    """
+    reader = _RangeReader(url, total_size)
+    head = reader.read(0, HEAD_BYTES)
+    try:
+        if head[4:8] == b"ftyp":
+            return _plan_mp4(reader, itag, start, end)
+        if head[:4] == EBML_MAGIC:
+            return _plan_webm(reader, itag, start, end)
+    except (struct.error, IndexError, KeyError, TypeError, StopIteration) as e:
+        raise ClipError(f"Could not read the stream index: {e!r}")
+    raise ClipError("Unsupported container; expected MP4 or WebM")
@@ -0,0 +1,356 @@
+"""
+Shared HTTP connection pool for the YouTube Downloader.
+Keeps connections to YouTube and its CDN open across requests, downloads and threads, so each host costs one handshake.
+"""
+
+import http.client
+import io
+import os
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+TIMEOUT = 30
+# Connections to one host open at the same time; more requests wait for one to free up
+MAX_PER_HOST = 16
+# Seconds an unused connection is kept before it is closed instead of reused
+IDLE_TIMEOUT = 60
+MAX_REDIRECTS = 10
+# Bytes of an unfinished body read so its connection can be reused instead of closed
+DRAIN_LIMIT = 64 * 1024
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Requests that are safe to send again when a reused connection turns out closed
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+# Raised by a kept-alive connection the server closed in the meantime
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+class PooledResponse:
+    """
+    Response of ConnectionPool.urlopen(), with the interface of urllib's.
+
+    Its connection goes back to the pool when the body has been read to the
+    end, or when the response is closed with little of it left, and is
+    closed otherwise.
+    """
+
+    def __init__(self, pool, key, conn, response, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        # Bodiless responses, e.g. to HEAD, are often never read or closed
+        if response.length == 0 or response.isclosed():
+            self.close()
+
+    def read(self, amt=None):
+        try:
+            data = self._response.read(amt)
+        except BaseException:
+            self._finish(reuse=False)
+            raise
+        if self._response.isclosed():
+            self._finish(reuse=True)
+        return data
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def close(self):
+        if self._conn is None:
+            return
+        length = self._response.length
+        if not self._response.isclosed() and length is not None and length <= DRAIN_LIMIT:
+            try:
+                self._response.read()
+            except (OSError, http.client.HTTPException):
+                self._finish(reuse=False)
+                return
+        self._finish(reuse=self._response.isclosed())
+
+    def _finish(self, reuse):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        self._response.close()
+        self._pool._release(self._key, conn if reuse and not self._response.will_close else None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Callers such as pytube drop some responses unread; free their slot
+        self._finish(reuse=False)
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP/1.1 connections, shared by all downloads of a process.
+
+    Connections are kept per scheme, host and port and handed to one
+    request at a time. A request takes the most recently used idle
+    connection, or opens a new one while fewer than ``max_per_host`` are in
+    use, and otherwise waits for one, at most its timeout. Requests go through ``urlopen()``,
+    which behaves like urllib's: redirects are followed, error statuses
+    raise HTTPError and connection failures URLError. Requests for hosts
+    behind a configured proxy are left to urllib.
+    """
+
+    def __init__(self, max_per_host=MAX_PER_HOST, idle_timeout=IDLE_TIMEOUT, keep_alive=True, ssl_context=None):
+        """
+        Initialize the pool.
+
+        Args:
+            max_per_host (int): Connections to one host open at the same time
+            idle_timeout (float): Seconds an idle connection stays reusable
+            keep_alive (bool): Reuse connections; False opens one per request
+            ssl_context (ssl.SSLContext): Context for HTTPS connections,
+                None for the system's default
+        """
+        self.max_per_host = max(1, max_per_host)
+        self.idle_timeout = idle_timeout
+        self.keep_alive = keep_alive
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._lock = threading.RLock()
+        self._available = threading.Condition(self._lock)
+        # Idle connections per host as (connection, time it was returned), most recent last
+        self._idle = {}
+        self._in_use = {}
+        self._stats = {"requests": 0, "opened": 0, "reused": 0, "retries": 0, "waits": 0}
+
+    def urlopen(self, url, data=None, timeout=TIMEOUT):
+        """
+        Send a request and return its response once the headers have arrived.
+
+        Args:
+            url (str | urllib.request.Request): URL or request to send
+            data (bytes): Request body
+            timeout (float): Socket timeout in seconds
+
+        Returns:
+            PooledResponse: The response; read it to the end or close it
+
+        Raises:
+            urllib.error.HTTPError: If the final response has an error status
+            urllib.error.URLError: If the server cannot be reached, or no
+                connection to it freed up within ``timeout``
+        """
+        request = url if isinstance(url, urllib.request.Request) else urllib.request.Request(url, data)
+        if data is not None:
+            request.data = data
+        if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+            timeout = socket.getdefaulttimeout()
+        if _uses_proxy(request.full_url):
+            return urllib.request.urlopen(request, timeout=timeout)
+
+        method = request.get_method()
+        full_url, body = request.full_url, request.data
+        headers = dict(request.header_items())
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, full_url, body, headers, timeout)
+            if response.status not in REDIRECT_CODES or not response.getheader("Location"):
+                break
+            response.close()
+            full_url = urllib.parse.urljoin(full_url, response.getheader("Location"))
+            # Like browsers and urllib, only 307 and 308 repeat a POST
+            if response.status not in (307, 308) and method != "HEAD":
+                method, body = "GET", None
+                headers = {
+                    name: value for name, value in headers.items()
+                    if name.lower() not in ("content-length", "content-type")
+                }
+        else:
+            raise urllib.error.HTTPError(full_url, response.status, "Too many redirects", response.headers, None)
+
+        if response.status >= 400:
+            # Read the (short) error body so the connection can be reused
+            try:
+                content = response.read(DRAIN_LIMIT)
+            except (OSError, http.client.HTTPException):
+                content = b""
+            response.close()
+            raise urllib.error.HTTPError(full_url, response.status, response.reason, response.headers, io.BytesIO(content))
+        return response
+
+    def stats(self):
+        """Return request and connection counters and the connections currently open."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(conns) for conns in self._idle.values())
+            stats["in_use"] = sum(self._in_use.values())
+            stats["hosts"] = len({key for key, count in self._in_use.items() if count} | set(self._idle))
+        stats["reuse_rate"] = stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    def close(self):
+        """Close the idle connections; connections in use are closed when their responses finish."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    def _send(self, method, url, body, headers, timeout):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise urllib.error.URLError(f"Unsupported URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        headers = dict(headers)
+        headers.setdefault("Connection", "keep-alive" if self.keep_alive else "close")
+        if body is not None and not any(name.lower() == "content-type" for name in headers):
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.timeout = timeout
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                self._release(key, None)
+                if reused and method in IDEMPOTENT_METHODS:
+                    # The server closed it while idle; a GET or HEAD can be sent again on a fresh one,
+                    # but a POST may have been processed before the connection dropped
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    continue
+                raise urllib.error.URLError(e) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._release(key, None)
+                raise urllib.error.URLError(e) from e
+            except BaseException:
+                conn.close()
+                self._release(key, None)
+                raise
+            return PooledResponse(self, key, conn, response, url)
+
+    def _acquire(self, key, timeout):
+        """
+        Take an idle connection to ``key`` or reserve a new one; returns (connection, reused).
+
+        Raises:
+            urllib.error.URLError: If every connection to ``key`` stayed in
+                use for ``timeout`` seconds, e.g. held by responses never closed
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._available:
+            waited = False
+            while True:
+                now = time.monotonic()
+                idle = self._idle.get(key, [])
+                while idle:
+                    conn, returned = idle.pop()
+                    if now - returned <= self.idle_timeout and not _closed_by_peer(conn):
+                        self._in_use[key] = self._in_use.get(key, 0) + 1
+                        self._stats["requests"] += 1
+                        self._stats["reused"] += 1
+                        return conn, True
+                    conn.close()
+                if not idle:
+                    self._idle.pop(key, None)
+                if self._in_use.get(key, 0) < self.max_per_host:
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    self._stats["requests"] += 1
+                    self._stats["opened"] += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - now if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise urllib.error.URLError(f"connection pool exhausted: {self.max_per_host} connections to {key[1]} in use")
+                self._available.wait(remaining)
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def _release(self, key, conn):
+        """Give back a slot for ``key``, keeping ``conn`` for reuse unless it is None."""
+        with self._available:
+            self._in_use[key] = self._in_use.get(key, 1) - 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+            if conn is not None and self.keep_alive:
+                self._idle.setdefault(key, []).append((conn, time.monotonic()))
+                conn = None
+            self._available.notify()
+        if conn is not None:
+            conn.close()
+
+def _closed_by_peer(conn):
+    """Whether an idle connection became unusable; an idle socket only turns readable when the server closed it."""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+def _uses_proxy(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(parts.hostname or "")
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_default_pool():
+    """
+    Return the process-wide ConnectionPool, creating it on first use.
+
+    YTDOWN_MAX_CONNECTIONS_PER_HOST sets its per-host limit and
+    YTDOWN_HTTP_KEEPALIVE=0 turns reuse off.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool(
+                max_per_host=int(os.environ.get("YTDOWN_MAX_CONNECTIONS_PER_HOST") or MAX_PER_HOST),
+                keep_alive=os.environ.get("YTDOWN_HTTP_KEEPALIVE", "1") != "0"
+            )
+        return _default_pool
+
+def urlopen(url, data=None, timeout=TIMEOUT):
+    """urllib.request.urlopen() through the process-wide pool."""
+    return get_default_pool().urlopen(url, data, timeout)
+
+def install_pytube():
+    """
+    Route pytube's requests (watch pages, player scripts, stream sizes) through the process-wide pool.
+
+    This replaces pytube.request.urlopen for everything in the process that
+    uses pytube, so only the applications (ytdl.py, the web apps and the
+    worker) call it, just before their first request to YouTube, and not
+    the modules they import.
+    """
+    import pytube.request
+    pytube.request.urlopen = urlopen
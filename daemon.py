@@ -0,0 +1,150 @@
+"""
+Warm daemon for the YouTube Downloader command line.
+Keeps one process, with its imports, caches and probes, running ytdl.py commands sent over a Unix socket.
+"""
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("YTDOWN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ytdown")),
+    "ytdl.sock"
+)
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening on the socket."""
+
+class _SocketWriter:
+    """Stands in for sys.stdout while a command runs, sending what it prints to the client."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.connected = True
+
+    def write(self, text):
+        # A client that went away stops listening, but its command runs to the end
+        if text and self.connected:
+            try:
+                self._conn.sendall(json.dumps({"out": text}).encode() + b"\n")
+            except OSError:
+                self.connected = False
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def serve(path, handler):
+    """
+    Run commands sent with submit() until the process is interrupted.
+
+    Commands run one at a time, in the working directory of the client that
+    sent them, with everything they print streamed back to it. Whatever the
+    handler leaves behind in the process (imported modules, the metadata
+    cache, the FFmpeg probe, the bandwidth governor) is there for the next
+    command.
+
+    Args:
+        path (str): Unix socket to listen on
+        handler (callable): Called with the options of each command; a
+            SystemExit it raises sets the command's exit status
+
+    Raises:
+        OSError: If another daemon is already listening on ``path``
+    """
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            os.remove(path)
+        else:
+            raise OSError(f"A daemon is already listening on {path}")
+        finally:
+            probe.close()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        # Commands run as this user, so only this user may send them
+        os.chmod(path, 0o600)
+        server.listen(16)
+        print(f"\033[92mDaemon listening on {path}. Press Ctrl+C to stop.\033[0m")
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                _handle(conn, handler)
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+def _handle(conn, handler):
+    try:
+        request = json.loads(conn.makefile("rb").readline())
+    except ValueError:
+        return
+    writer = _SocketWriter(conn)
+    cwd, stdout = os.getcwd(), sys.stdout
+    code = 0
+    try:
+        os.chdir(request["cwd"])
+        sys.stdout = writer
+        handler(request["options"])
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            code = e.code or 0
+        else:
+            print(e.code)
+            code = 1
+    except Exception as e:
+        print(f"\033[91mAn unexpected error occurred: {str(e)}\033[0m")
+        code = 1
+    finally:
+        sys.stdout = stdout
+        os.chdir(cwd)
+    if writer.connected:
+        try:
+            conn.sendall(json.dumps({"exit": code}).encode() + b"\n")
+        except OSError:
+            pass
+
+def submit(path, options, output=None):
+    """
+    Run a command on the daemon, copying what it prints to ``output``.
+
+    Args:
+        path (str): Unix socket of the daemon
+        options (dict): Parsed command line options, JSON serializable
+        output (file): Where to write the command's output, default stdout
+
+    Returns:
+        int: Exit status of the command
+
+    Raises:
+        DaemonUnavailable: If no daemon is listening on ``path``
+    """
+    output = output or sys.stdout
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            conn.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonUnavailable(f"No daemon at {path}") from e
+        conn.sendall(json.dumps({"cwd": os.getcwd(), "options": options}).encode() + b"\n")
+        for line in conn.makefile("rb"):
+            message = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            output.write(message["out"])
+            output.flush()
+        # The daemon went away before the command finished
+        return 1
+    finally:
+        conn.close()
@@ -1,20 +1,66 @@
 """
 YouTube Downloader core functionality module.
-Handles the actual downloading of videos using pytube.
+Handles the actual downloading of videos resolved through pytube.
 """
 
 import os
 import shutil
 import subprocess
-from pytube import YouTube
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
 from pytube.exceptions import PytubeError
-from ui import display_progress
-from utils import sanitize_filename
+from bandwidth import INTERACTIVE, get_default_governor
+from clip import ClipError, ClipPlan, plan_clip
+from integrity import BlockDigest, IntegrityError, file_digest
+from metadata import get_default_cache, resolve_video
+from metrics import ACTIVE_DOWNLOADS, DOWNLOADS, FAILURES, STORE_LOOKUPS, record_transfer, stage_timer
+from selection import ADAPTIVE, SelectionTarget, StreamSelector
+from storage import ensure_free_space
+from store import ArtifactStore
+from transcode import TranscodeError, cut_clip, mux_streams, transcode_file, transcode_stream
+from transfer import (
+    SINGLE_SUFFIX, PartialDownload, ResourceChanged, TransferError, download_resumable, download_single
+)
+from progress import ProgressBus, ProgressReporter
+from ui import ProgressBar
+from utils import extract_video_id, get_human_readable_size, is_ffmpeg_available, sanitize_filename
+
+# Redraws per second of the default terminal progress bar
+TERMINAL_RATE = 10
+
+# Times a download that came out short or damaged is started over
+INTEGRITY_RETRIES = 2
+
+class _StreamGroup:
+    """Several streams downloaded together and reported as one."""
+    
+    def __init__(self, streams):
+        self.streams = streams
+        self.itag = "+".join(str(stream.itag) for stream in streams)
+        sizes = [stream.filesize for stream in streams]
+        self.filesize = sum(sizes) if all(sizes) else None
+    
+    def progress_callback(self, callback):
+        """Wrap ``callback`` so per-stream progress is reported as group progress."""
+        done = {}
+        lock = threading.Lock()
+        
+        def on_progress(stream, chunk, bytes_remaining):
+            with lock:
+                done[stream.itag] = (stream.filesize or 0) - bytes_remaining
+                callback(self, chunk, (self.filesize or 0) - sum(done.values()))
+        
+        return on_progress
 
 class YouTubeDownloader:
     """Class to handle YouTube video downloads."""
     
-    def __init__(self, url, format_type="mp4", output_dir="./downloads", quality=None, filename=None):
+    def __init__(self, url, format_type="mp4", output_dir="./downloads", quality=None, filename=None,
+                 progress_callback=None, segments=1, stream_audio=True, transcoder=None, cache=None,
+                 store=None, max_bytes=None, preferred_codecs=None, selector=None, start=None, end=None,
+                 progress=None, job_id=None, bandwidth=None, priority=INTERACTIVE, rate_limit=None):
         """
         Initialize the downloader.
         
@@ -24,93 +70,274 @@ class YouTubeDownloader:
             output_dir (str): Directory to save the downloads
             quality (str): Video quality or audio bitrate
             filename (str): Custom filename for the download
+            progress_callback (callable): pytube-style progress callback
+                (stream, chunk, bytes_remaining), called for every chunk;
+                replaces progress events
+            progress (ProgressBus): Bus to publish progress events on;
+                defaults to one drawing a bar in the terminal
+            segments (int): Number of parallel range requests per stream
+            stream_audio (bool): For MP3, feed the audio stream to FFmpeg while
+                it downloads instead of converting a finished file
+            transcoder (TranscodePool): For MP3, hand the downloaded audio to
+                this pool instead of converting inline; the conversion is then
+                left in pending_conversion for the caller to wait on
+            cache (MetadataCache): Metadata cache to use, None for the shared
+                default, False to always resolve from YouTube
+            store (ArtifactStore): Store that deduplicates finished downloads;
+                output files become links to its artifacts
+            max_bytes (int): Most bytes to transfer; larger streams are skipped
+            preferred_codecs (list): Codec families in order of preference,
+                e.g. ['avc1'] or ['opus', 'mp4a']
+            selector (StreamSelector): Policy for choosing streams; defaults to
+                the best quality within the target, then the fewest bytes
+            start (float): Start of a clip in seconds; only the bytes of the
+                clip are fetched when the stream index allows it
+            end (float): End of a clip in seconds, None for the end of the video
+            job_id (str): Name of the download in progress events, defaults to the URL
+            bandwidth (BandwidthGovernor): Governor pacing the transfer, None
+                for the shared default, False for no pacing
+            priority (str): Priority class of the transfer, INTERACTIVE or BATCH
+            rate_limit (float): Cap on this download in bytes per second
         """
         self.url = url
         self.format_type = format_type.lower()
         self.output_dir = output_dir
         self.quality = quality
         self.custom_filename = filename
+        self.job_id = job_id or url
         
-        # Initialize YouTube object
-        self.yt = None
-        
-        # Quality settings
-        self.quality_settings = {
-            "mp4": {
-                "low": "360p",
-                "medium": "720p",
-                "high": "1080p",
-                "best": None  # Will select highest available
-            },
-            "mp3": {
-                "low": "128kbps",
-                "medium": "192kbps",
-                "high": "256kbps",
-                "best": "320kbps"
-            }
-        }
+        # Progress events, unless the caller takes raw per-chunk callbacks
+        self.reporter = None
+        if not progress_callback:
+            if progress is None:
+                progress = ProgressBus()
+                progress.subscribe(ProgressBar(), rate=TERMINAL_RATE)
+            self.reporter = ProgressReporter(progress, self.job_id)
+            progress_callback = self.reporter.callback
+        self.progress_callback = progress_callback
+        self.segments = max(1, int(segments or 1))
+        self.stream_audio = stream_audio
+        self.transcoder = transcoder
+        self.cache = cache
+        self.store = store
+        
+        # Bandwidth share of the running download; transfers pace their reads with it
+        self.bandwidth = get_default_governor() if bandwidth is None else bandwidth
+        self.priority = priority
+        self.rate_limit = rate_limit
+        self.share = None
+        
+        # Resolved video metadata (VideoInfo)
+        self.info = None
+        
+        # Path of the finished file, set by download() on success
+        self.output_file = None
+        
+        # Why the last download() failed, and the exception type behind it
+        self.error = None
+        self.error_type = None
+        
+        # Future for an MP3 conversion queued on the transcoder
+        self.pending_conversion = None
+        
+        # Artifact store id of the output, when a store is used
+        self.artifact_key = None
+        
+        # Digest of the output ('sha256-4m:<hex>'), when it is known without reading the file again
+        self.digest = None
+        # Digests of the stream files written by this download, by path
+        self.digests = {}
+        # Whether the last failure was a short or damaged transfer, which is worth retrying
+        self._retryable = False
+        
+        # What to produce and how to choose the streams for it
+        self.target = SelectionTarget.from_quality(
+            self.format_type, quality, max_bytes=max_bytes, preferred_codecs=preferred_codecs
+        )
+        self.selector = selector or StreamSelector()
+        
+        # StreamPlan chosen for the download
+        self.plan = None
+        
+        # Time window of a clip, in seconds
+        self.clip = start is not None or end is not None
+        self.clip_start = start or 0.0
+        self.clip_end = end
     
     def _initialize_youtube(self):
-        """Initialize the YouTube object with progress callback."""
+        """Resolve the video metadata, from the cache when possible."""
         try:
-            self.yt = YouTube(
-                self.url,
-                on_progress_callback=display_progress,
-                on_complete_callback=lambda stream, file_path: print(f"\n\033[92mDownload completed: {file_path}\033[0m")
-            )
+            with stage_timer("resolve"):
+                self.info = resolve_video(self.url, self.cache)
             return True
-        except PytubeError as e:
-            print(f"\033[91mError initializing YouTube: {str(e)}\033[0m")
-            return False
+        except Exception as e:
+            return self._fail(f"Error initializing YouTube: {str(e)}", e)
+    
+    def _fail(self, message, error=None):
+        """Report why the download failed and return False."""
+        self.error = message
+        self.error_type = type(error).__name__ if error else "InvalidRequest"
+        print(f"\033[91m{message}\033[0m")
+        return False
+    
+    def _stage(self, name):
+        """Report what the download is doing, e.g. 'muxing'."""
+        if self.reporter:
+            self.reporter.stage(name)
+    
+    def _transfer(self, function, *args, **kwargs):
+        """
+        Run a transfer function, recording its duration and throughput.
+        
+        Bytes are counted as the function reads them, through its throttle
+        callback, so a resumed download only counts what it fetched, not the
+        part already on disk.
+        """
+        share = self.share
+        lock = threading.Lock()
+        fetched = 0
+        
+        def throttle(size):
+            nonlocal fetched
+            # Segmented transfers call this from several threads
+            with lock:
+                fetched += size
+            if share:
+                share.consume(size)
+        
+        started = time.perf_counter()
+        try:
+            with stage_timer("transfer"):
+                return function(*args, throttle=throttle, **kwargs)
+        finally:
+            record_transfer(fetched, time.perf_counter() - started)
+    
+    def _on_complete(self, stream, file_path):
+        """Report a finished stream download."""
+        print(f"\n\033[92mDownload completed: {file_path}\033[0m")
+    
+    def _download_stream(self, stream, file_path, progress_callback=None, announce=True):
+        """
+        Download a stream to ``file_path``.
+        
+        Data is written to a ``.part`` file with a resume sidecar, split into
+        parallel range requests when segments > 1, so an interrupted download
+        continues where it stopped on the next run. Falls back to a plain
+        single request if the stream size is unknown or ranges are refused.
+        
+        Returns:
+            str: Path of the downloaded file
+        """
+        progress_callback = progress_callback or self.progress_callback
+        
+        def on_progress(chunk, bytes_done):
+            progress_callback(stream, chunk, (stream.filesize or bytes_done) - bytes_done)
+        
+        if stream.filesize:
+            if os.path.exists(file_path) and os.path.getsize(file_path) == stream.filesize:
+                print(f"\033[93mAlready downloaded: {file_path}\033[0m")
+                return file_path
+            
+            try:
+                digest = BlockDigest(stream.filesize)
+                self._transfer(
+                    download_resumable, stream.url, file_path, stream.filesize, stream.itag, self.segments,
+                    on_progress, digest=digest
+                )
+                return self._stream_done(stream, file_path, digest, announce)
+            except ResourceChanged as e:
+                print(f"\n\033[93m{str(e)}, restarting in a single request...\033[0m")
+                PartialDownload(file_path, stream.itag, stream.filesize).discard()
+            except TransferError as e:
+                # The partial download stays, for a later attempt to resume from
+                print(f"\n\033[93mRange download failed ({str(e)}), restarting in a single request...\033[0m")
+        
+        part_path = file_path + SINGLE_SUFFIX
+        digest = BlockDigest(stream.filesize)
+        self._transfer(download_single, stream.url, part_path, stream.filesize, on_progress, digest=digest)
+        os.replace(part_path, file_path)
+        # A partial download of the same file is no longer needed
+        PartialDownload(file_path, stream.itag, stream.filesize).discard()
+        return self._stream_done(stream, file_path, digest, announce)
+    
+    def _stream_done(self, stream, file_path, digest, announce):
+        """Check the size of a finished stream file and keep the digest hashed while it was written."""
+        size = os.path.getsize(file_path)
+        if stream.filesize and size != stream.filesize:
+            raise IntegrityError(f"{file_path} has {size} bytes, the stream has {stream.filesize}")
+        self.digests[file_path] = digest.hexdigest()
+        if announce:
+            self._on_complete(stream, file_path)
+        return file_path
     
-    def _get_safe_filename(self):
+    def _get_safe_filename(self, title=None):
         """Get a safe filename for the download."""
         if self.custom_filename:
             return sanitize_filename(self.custom_filename)
         
         # Get title from YouTube and sanitize it
-        video_title = sanitize_filename(self.yt.title)
+        video_title = sanitize_filename(title or self.info.title)
+        if self.clip:
+            video_title += f"_{self._clip_label()}"
         return video_title
     
+    def _clip_label(self):
+        """Clip window as text, e.g. '90-120' or '90-end'."""
+        end = f"{self.clip_end:g}" if self.clip_end is not None else "end"
+        return f"{self.clip_start:g}-{end}"
+    
+    def _select_plan(self):
+        """
+        Pick how to produce the output from the available streams.
+        
+        Returns:
+            StreamPlan: The chosen plan, or None if no stream can be used
+        """
+        with stage_timer("select"):
+            self.target.can_mux = is_ffmpeg_available()
+            plan = self.selector.select(self.info, self.target)
+        if not plan:
+            if self.target.max_bytes:
+                print(f"\033[91mNo stream fits in {get_human_readable_size(self.target.max_bytes)}\033[0m")
+            return None
+        
+        if plan.rejected:
+            print(f"\033[93mNo stream meets the requested quality, using the closest ({plan.rejected})\033[0m")
+        print(f"\033[94mSelected: {plan.describe()}\033[0m")
+        print(f"\033[97m  {'; '.join(plan.reasons)}\033[0m")
+        self.plan = plan
+        return plan
+    
     def _download_mp4(self):
         """Download the video in MP4 format."""
         try:
-            # Determine resolution based on quality
-            resolution = None
-            if self.quality and self.quality in self.quality_settings["mp4"]:
-                resolution = self.quality_settings["mp4"][self.quality]
-            
-            # If resolution is specified, try to get that specific stream
-            if resolution:
-                stream = self.yt.streams.filter(
-                    progressive=True,
-                    file_extension="mp4",
-                    resolution=resolution
-                ).first()
-            else:
-                # Otherwise get the highest resolution
-                stream = self.yt.streams.filter(
-                    progressive=True,
-                    file_extension="mp4"
-                ).order_by('resolution').desc().first()
-            
-            if not stream:
-                print(f"\033[93mCould not find {resolution} stream, downloading best available...\033[0m")
-                stream = self.yt.streams.filter(
-                    progressive=True,
-                    file_extension="mp4"
-                ).order_by('resolution').desc().first()
-            
-            if not stream:
+            plan = self._select_plan()
+            if not plan:
                 raise PytubeError("No suitable video stream found")
             
             # Get filename
             filename = self._get_safe_filename()
             
+            if self.clip:
+                return self._produce(
+                    _StreamGroup(plan.streams), None, f"{filename}.mp4",
+                    lambda file_path: self._download_clip(plan, file_path)
+                )
+            
+            # Separate video and audio streams are muxed without re-encoding
+            if plan.kind == ADAPTIVE:
+                video, audio = plan.video, plan.audio
+                print(f"\033[94mFetching {video.resolution} video and {audio.abr} audio in parallel...\033[0m")
+                return self._produce(
+                    _StreamGroup([video, audio]), None, f"{filename}.mp4",
+                    lambda file_path: self._download_adaptive(video, audio, file_path)
+                )
+            
             # Download the video
-            output_path = stream.download(
-                output_path=self.output_dir,
-                filename=f"{filename}.mp4"
+            stream = plan.video
+            output_path = self._produce(
+                stream, None, f"{filename}.mp4",
+                lambda file_path: self._download_stream(stream, file_path)
             )
             
             return output_path
@@ -119,86 +346,430 @@ class YouTubeDownloader:
             print(f"\033[91mError downloading MP4: {str(e)}\033[0m")
             return None
     
+    def _download_adaptive(self, video, audio, file_path):
+        """
+        Download a video-only and an audio-only stream at the same time and
+        mux them into ``file_path`` with stream copy.
+        
+        Returns:
+            str: Path of the muxed file
+        """
+        base = os.path.splitext(file_path)[0]
+        video_path = f"{base}.video.{video.subtype}"
+        audio_path = f"{base}.audio.{audio.subtype}"
+        group = _StreamGroup([video, audio])
+        progress_callback = group.progress_callback(self.progress_callback)
+        
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ytdown-adaptive") as executor:
+            futures = [
+                executor.submit(self._download_stream, video, video_path, progress_callback, False),
+                executor.submit(self._download_stream, audio, audio_path, progress_callback, False)
+            ]
+            for future in futures:
+                future.result()
+        
+        self._stage("muxing")
+        with stage_timer("transcode"):
+            mux_streams(video_path, audio_path, file_path)
+        os.remove(video_path)
+        os.remove(audio_path)
+        self._on_complete(group, file_path)
+        return file_path
+    
+    def _download_clip(self, plan, file_path, bitrate=None):
+        """
+        Fetch the clip window of every stream in ``plan`` and cut it into
+        ``file_path``, encoding to MP3 when ``bitrate`` is given.
+        
+        Streams whose index cannot be read are downloaded whole instead.
+        
+        Returns:
+            str: Path of the clip
+        """
+        base = os.path.splitext(file_path)[0]
+        sources = [self._plan_clip(stream) for stream in plan.streams]
+        paths = [f"{base}.clip{i}.{stream.subtype}" for i, stream in enumerate(plan.streams)]
+        group = _StreamGroup(sources)
+        progress_callback = group.progress_callback(self.progress_callback)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="ytdown-clip") as executor:
+                futures = [
+                    executor.submit(self._fetch_clip_source, stream, source, path, progress_callback)
+                    for stream, source, path in zip(plan.streams, sources, paths)
+                ]
+                inputs = [future.result() for future in futures]
+            self._stage("cutting")
+            with stage_timer("transcode"):
+                cut_clip(inputs, file_path, self.clip_start, self.clip_end, bitrate)
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        self._on_complete(group, file_path)
+        return file_path
+    
+    def _plan_clip(self, stream):
+        """Return the ClipPlan of ``stream``, or the stream itself if it has to be fetched whole."""
+        try:
+            clip = plan_clip(stream.url, stream.itag, self.clip_start, self.clip_end, stream.filesize)
+        except (ClipError, TransferError, OSError) as e:
+            print(f"\033[93mCannot fetch only the clip ({str(e)}), downloading the whole stream...\033[0m")
+            return stream
+        
+        total = f" of {get_human_readable_size(stream.filesize)}" if stream.filesize else ""
+        print(f"\033[94mClip {self._clip_label()}: fetching {get_human_readable_size(clip.filesize)}{total}\033[0m")
+        return clip
+    
+    def _fetch_clip_source(self, stream, source, path, progress_callback):
+        """Download what a clip needs from one stream; returns (path, media start time)."""
+        if isinstance(source, ClipPlan):
+            self._transfer(
+                source.fetch, stream.url, path,
+                lambda chunk, bytes_done: progress_callback(source, chunk, source.filesize - bytes_done)
+            )
+            return path, source.start_time
+        
+        self._download_stream(stream, path, progress_callback, False)
+        return path, 0.0
+    
     def _download_mp3(self):
         """Download the video as MP3 (audio only)."""
         try:
             # Get the audio stream
-            stream = self.yt.streams.filter(only_audio=True).order_by('abr').desc().first()
-            
-            if not stream:
+            plan = self._select_plan()
+            if not plan:
                 raise PytubeError("No suitable audio stream found")
+            stream = plan.audio
             
             # Get filename
             filename = self._get_safe_filename()
-            temp_file = os.path.join(self.output_dir, f"{filename}.{stream.subtype}")
-            
-            # Download the audio stream
-            stream.download(
-                output_path=self.output_dir,
-                filename=f"{filename}.{stream.subtype}"
-            )
             
-            # Convert to MP3 using FFmpeg if available
-            mp3_file = os.path.join(self.output_dir, f"{filename}.mp3")
+            bitrate = self.target.bitrate
             
-            # First try using FFmpeg
-            try:
-                bitrate = "256k"  # Default bitrate
-                if self.quality and self.quality in self.quality_settings["mp3"]:
-                    bitrate_value = self.quality_settings["mp3"][self.quality].replace("kbps", "k")
-                    bitrate = bitrate_value
-                
-                subprocess.run(
-                    ["ffmpeg", "-i", temp_file, "-b:a", bitrate, "-vn", mp3_file],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True
+            if self.clip:
+                return self._produce(
+                    stream, bitrate, f"{filename}.mp3",
+                    lambda mp3_file: self._download_clip(plan, mp3_file, bitrate)
                 )
-                
-                # Remove the temporary file
-                os.remove(temp_file)
-                
-                return mp3_file
             
-            except (subprocess.SubprocessError, FileNotFoundError):
-                # If FFmpeg is not available or fails, just rename the file
-                print("\033[93mFFmpeg not found or failed. Converting by renaming file extension.\033[0m")
-                print("\033[93mNote: For better quality conversions, install FFmpeg.\033[0m")
-                
-                shutil.move(temp_file, mp3_file)
-                return mp3_file
+            return self._produce(
+                stream, bitrate, f"{filename}.mp3",
+                lambda mp3_file: self._produce_mp3(stream, mp3_file, bitrate)
+            )
         
         except PytubeError as e:
             print(f"\033[91mError downloading MP3: {str(e)}\033[0m")
             return None
     
+    def _produce_mp3(self, stream, mp3_file, bitrate):
+        """
+        Download an audio stream and convert it to ``mp3_file``.
+        
+        Returns:
+            str or Future: The MP3 path, or a Future of it when the conversion
+            was queued on the transcoder
+        """
+        temp_file = f"{os.path.splitext(mp3_file)[0]}.{stream.subtype}"
+        
+        # Encode while downloading when FFmpeg is available
+        if self.stream_audio and not self.transcoder and stream.filesize and is_ffmpeg_available():
+            def on_progress(chunk, bytes_done):
+                self.progress_callback(stream, chunk, stream.filesize - bytes_done)
+            
+            try:
+                self._stage("transcoding")
+                # Transfer and encoding overlap, so the time counts as transfer
+                self._transfer(transcode_stream, stream.url, mp3_file, bitrate, stream.filesize, on_progress)
+                self._on_complete(stream, mp3_file)
+                return mp3_file
+            except (TranscodeError, OSError) as e:
+                print(f"\n\033[93mStreaming conversion failed ({str(e)}), downloading first...\033[0m")
+        
+        # Download the audio stream
+        self._download_stream(stream, temp_file)
+        
+        # Let the transcode stage convert it while we move on
+        if self.transcoder:
+            return self.transcoder.submit(self._convert_to_mp3, temp_file, mp3_file, bitrate)
+        
+        return self._convert_to_mp3(temp_file, mp3_file, bitrate)
+    
+    def _produce(self, stream, bitrate, filename, produce):
+        """
+        Create an output file, reusing the artifact store when one is set.
+        
+        Without a store, ``produce`` writes straight to the output directory.
+        With one, an existing artifact for the same video, stream, format and
+        bitrate is linked instead of downloaded, an identical download that
+        is already running is waited for, and otherwise ``produce`` writes
+        into the store's staging area before the result is committed and
+        linked under the user-facing name.
+        
+        Args:
+            stream (StreamInfo): Stream the output is made from
+            bitrate (str): Target bitrate, part of the artifact identity
+            filename (str): User-facing filename in the output directory
+            produce (callable): Called with the path to write; returns that
+                path, or a Future of it for a queued conversion
+        
+        Returns:
+            str: Path of the output file in the output directory
+        """
+        user_path = os.path.join(self.output_dir, filename)
+        needed = self._estimate_size(stream, bitrate)
+        if not self.store:
+            # Fail before writing anything if the disk cannot hold the result
+            ensure_free_space(self.output_dir, needed)
+            result = produce(user_path)
+            if isinstance(result, Future):
+                self.pending_conversion = result
+                return user_path
+            self.digest = self.digests.get(result)
+            return result
+        
+        ext = os.path.splitext(filename)[1].lstrip(".")
+        key = self.store.key(self.info.video_id, stream.itag, self.format_type, bitrate, self._variant())
+        self.artifact_key = key
+        
+        path, in_flight = self.store.claim(key)
+        STORE_LOOKUPS.inc(result="hit" if path else "coalesced" if in_flight else "miss")
+        if path:
+            print(f"\033[92mAlready in store, linking: {user_path}\033[0m")
+            self.store.remember(self.request_id(), key)
+            self.digest = (self.store.lookup(key)[1] or {}).get("digest")
+            return self.store.link(path, user_path, key)
+        if in_flight:
+            print("\033[93mIdentical download in progress, waiting for it...\033[0m")
+            path = in_flight.result()
+            self.store.remember(self.request_id(), key)
+            return self.store.link(path, user_path, key)
+        
+        metadata = {
+            "video_id": self.info.video_id,
+            "itag": stream.itag,
+            "format": self.format_type,
+            "bitrate": bitrate,
+            "title": self.info.title
+        }
+        if self.clip:
+            metadata["clip"] = [self.clip_start, self.clip_end]
+        
+        def commit(staged_path):
+            with stage_timer("finalize"):
+                # Outputs FFmpeg wrote were never seen here, so they are hashed now
+                digest = self.digests.get(staged_path) or file_digest(staged_path)
+                path = self.store.commit(key, staged_path, ext, digest=digest, **metadata)
+                self.digest = digest
+                self.store.remember(self.request_id(), key)
+                return self.store.link(path, user_path, key)
+        
+        # Hold room in the store's quota until the artifact is committed
+        reservation = ExitStack()
+        try:
+            reservation.enter_context(self.store.reserve(needed))
+            result = produce(self.store.staging_path(key, ext))
+        except BaseException as e:
+            reservation.close()
+            self.store.abort(key, e)
+            raise
+        
+        if not isinstance(result, Future):
+            with reservation:
+                try:
+                    return commit(result)
+                except BaseException as e:
+                    # Release anyone waiting on the artifact, as on_converted does
+                    self.store.abort(key, e)
+                    raise
+        
+        # Commit once the queued conversion finishes
+        linked = Future()
+        
+        def on_converted(future):
+            with reservation:
+                try:
+                    linked.set_result(commit(future.result()))
+                except BaseException as e:
+                    self.store.abort(key, e)
+                    linked.set_exception(e)
+        
+        result.add_done_callback(on_converted)
+        self.pending_conversion = linked
+        return user_path
+    
+    def _variant(self):
+        """Artifact variant of the output, e.g. the clip window, or None."""
+        return f"clip={self._clip_label()}" if self.clip else None
+    
+    def request_id(self):
+        """Identify this request by video id, format, quality and clip, without contacting YouTube."""
+        video_id = self.info.video_id if self.info else extract_video_id(self.url)
+        return ArtifactStore.request_id(video_id or self.url, self.format_type, self.quality, self._variant())
+    
+    def find_existing(self):
+        """
+        Find an earlier result of this exact request without contacting YouTube.
+        
+        Looks in the artifact store, linking a hit into the output directory,
+        and then for a file of the expected name in the output directory when
+        the title is in the metadata cache.
+        
+        Returns:
+            str: Path of the existing output, or None
+        """
+        video_id = extract_video_id(self.url)
+        if not video_id:
+            return None
+        
+        if self.store:
+            path, metadata = self.store.find(self.request_id())
+            if path:
+                filename = f"{self._get_safe_filename(metadata.get('title') or video_id)}.{metadata['ext']}"
+                self.artifact_key = metadata["key"]
+                self.digest = metadata.get("digest")
+                return self.store.link(path, os.path.join(self.output_dir, filename), metadata["key"])
+        
+        if self.cache is False:
+            return None
+        info = (self.cache or get_default_cache()).get(video_id)
+        if info:
+            path = os.path.join(self.output_dir, f"{self._get_safe_filename(info.title)}.{self.format_type}")
+            if os.path.exists(path) and os.path.getsize(path):
+                return path
+        return None
+    
+    def _estimate_size(self, stream, bitrate):
+        """Estimate the disk space needed to produce the output of ``stream``."""
+        needed = stream.filesize or 0
+        if self.clip and self.info.length:
+            # Only the window is kept, plus the fragments around its edges
+            window = (self.clip_end or self.info.length) - self.clip_start
+            needed = int(needed * min(1.0, window / self.info.length + 0.05))
+        if bitrate and self.info.length:
+            # The source is kept next to the MP3 until the conversion finishes
+            kbps = int("".join(filter(str.isdigit, bitrate)) or 0)
+            length = (self.clip_end or self.info.length) - self.clip_start
+            needed += int(length * kbps * 1000 // 8)
+        return needed
+    
+    def _convert_to_mp3(self, temp_file, mp3_file, bitrate):
+        """Convert a downloaded audio file to MP3 and remove the original."""
+        self._stage("converting")
+        # First try using FFmpeg
+        try:
+            with stage_timer("transcode"):
+                transcode_file(temp_file, mp3_file, bitrate)
+            
+            # Remove the temporary file
+            os.remove(temp_file)
+            
+            return mp3_file
+        
+        except (subprocess.SubprocessError, FileNotFoundError):
+            # If FFmpeg is not available or fails, just rename the file
+            print("\033[93mFFmpeg not found or failed. Converting by renaming file extension.\033[0m")
+            print("\033[93mNote: For better quality conversions, install FFmpeg.\033[0m")
+            
+            shutil.move(temp_file, mp3_file)
+            return mp3_file
+    
     def download(self):
         """Download the video in the specified format."""
+        self.error = None
+        self.error_type = None
+        if self.reporter:
+            self.reporter.started()
+        ACTIVE_DOWNLOADS.inc()
+        if self.bandwidth:
+            self.share = self.bandwidth.register(self.job_id, self.priority, self.rate_limit)
+        try:
+            for attempt in range(INTEGRITY_RETRIES + 1):
+                # Nothing of a failed attempt may be reported as the result of the next one
+                self.pending_conversion = None
+                self.digest = None
+                success = self._download()
+                if success or not self._retryable or attempt == INTEGRITY_RETRIES:
+                    break
+                print(f"\033[93mRetrying the download ({attempt + 1}/{INTEGRITY_RETRIES})...\033[0m")
+        finally:
+            ACTIVE_DOWNLOADS.dec()
+            if self.share:
+                self.share.close()
+                self.share = None
+        DOWNLOADS.inc(result="success" if success else "failure")
+        if not success:
+            FAILURES.inc(exception=self.error_type or "DownloadFailed")
+        if not self.reporter:
+            return success
+        
+        if not success:
+            self.reporter.error(self.error or "Download failed")
+        elif self.pending_conversion:
+            self.pending_conversion.add_done_callback(self._on_converted)
+        else:
+            self.reporter.done(self.output_file)
+        return success
+    
+    def _on_converted(self, conversion):
+        """Report the download as done once its queued conversion is."""
+        error = conversion.exception()
+        if error:
+            self.reporter.error(f"Conversion failed: {str(error)}")
+        else:
+            self.reporter.done(conversion.result())
+    
+    def _download(self):
+        self._retryable = False
+        self.digests = {}
+        existing = self.find_existing()
+        if existing:
+            self.output_file = existing
+            print(f"\n\033[92mAlready downloaded: {existing}\033[0m")
+            return True
+        
         print(f"\n\033[94mInitializing download from: {self.url}\033[0m")
         
+        self._stage("resolving")
         if not self._initialize_youtube():
             return False
         
-        print(f"\033[94mVideo Title: {self.yt.title}\033[0m")
-        print(f"\033[94mAuthor: {self.yt.author}\033[0m")
-        print(f"\033[94mLength: {self.yt.length} seconds\033[0m")
+        print(f"\033[94mVideo Title: {self.info.title}\033[0m")
+        print(f"\033[94mAuthor: {self.info.author}\033[0m")
+        print(f"\033[94mLength: {self.info.length} seconds\033[0m")
         print(f"\033[94mFormat: {self.format_type.upper()}\033[0m")
         
+        if self.clip:
+            if self.clip_end is not None and self.clip_end <= self.clip_start:
+                return self._fail("Clip end must be after its start")
+            if self.info.length and self.clip_start >= self.info.length:
+                return self._fail(f"Clip starts after the end of the video ({self.info.length} seconds)")
+            if not is_ffmpeg_available():
+                return self._fail("Cutting clips requires FFmpeg")
+            print(f"\033[94mClip: {self._clip_label()} seconds\033[0m")
+        
+        self._stage("downloading")
         try:
             if self.format_type == "mp4":
                 output_file = self._download_mp4()
             elif self.format_type == "mp3":
                 output_file = self._download_mp3()
             else:
-                print(f"\033[91mUnsupported format: {self.format_type}\033[0m")
-                return False
+                return self._fail(f"Unsupported format: {self.format_type}")
+            
+            if output_file and self.pending_conversion:
+                self.output_file = output_file
+                print(f"\033[92mDownload successful! Queued for MP3 conversion: {output_file}\033[0m")
+                return True
             
             if output_file:
+                self.output_file = output_file
                 file_size = os.path.getsize(output_file) / (1024 * 1024)  # Size in MB
                 print(f"\033[92mDownload successful! File saved to: {output_file} ({file_size:.2f} MB)\033[0m")
                 return True
             return False
         
         except Exception as e:
-            print(f"\033[91mError during download: {str(e)}\033[0m")
-            return False
\ No newline at end of file
+            self._retryable = isinstance(e, (TransferError, IntegrityError))
+            return self._fail(f"Error during download: {str(e)}", e)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Batch file ingestion for the YouTube Downloader.
+Streams URL files of any length into canonical, deduplicated download jobs.
+"""
+
+import binascii
+from utils import canonical_url, extract_video_id, is_collection_url, validate_url
+
+# Invalid lines printed with their line number; any further ones are only counted
+MAX_REPORTED = 20
+
+# Characters a video id can end with: its 11 characters hold exactly 64 bits,
+# so the last one only carries 4 and its 2 low bits are always zero
+_LAST_CHARACTERS = frozenset("AEIMQUYcgkosw048")
+_BASE64 = bytes.maketrans(b"-_", b"+/")
+
+def pack_video_id(video_id):
+    """
+    Return a video id as the 64-bit integer it encodes.
+
+    The integer takes 36 bytes instead of the string's 60 in the set of ids
+    seen, which adds up for batch files of millions of lines. Strings
+    that only look like ids, i.e. whose last character carries more than 64
+    bits, are returned unchanged.
+    """
+    if len(video_id) != 11 or video_id[-1] not in _LAST_CHARACTERS:
+        return video_id
+    try:
+        return int.from_bytes(binascii.a2b_base64(video_id.encode().translate(_BASE64) + b"="), "big")
+    except (binascii.Error, UnicodeEncodeError):
+        return video_id
+
+class BatchFile:
+    """
+    The download jobs of a batch file, read lazily.
+
+    Iterating reads the file one line at a time and yields each video once,
+    as its canonical watch URL, however it was written (youtu.be links,
+    mobile or embed URLs, extra parameters such as a start time). Playlist
+    and channel URLs are passed through for the batch to expand. Blank
+    lines and lines starting with '#' are ignored, and invalid lines are
+    reported with their line number. Memory stays constant apart from the
+    compact set of ids seen, so files of millions of lines can be fed to
+    run_batch(), which consumes the stream as downloads free up.
+
+    The counters describe the lines read so far, and the whole file once it
+    has been iterated. ``videos`` holds the ids yielded so far, packed by
+    pack_video_id(); expand_urls() adds the videos of expanded collections
+    to it, so the batch keeps a single set of ids.
+    """
+
+    def __init__(self, path, max_reported=MAX_REPORTED):
+        """
+        Initialize the reader; the file is opened when iteration starts.
+
+        Args:
+            path (str): File with one URL per line
+            max_reported (int): Invalid lines to print; further ones are counted
+        """
+        self.path = path
+        self.max_reported = max_reported
+        self.lines = 0
+        self.jobs = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.videos = set()
+
+    def __iter__(self):
+        self.lines = self.jobs = self.duplicates = self.invalid = 0
+        videos = self.videos
+        videos.clear()
+        collections = set()
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for number, line in enumerate(f, 1):
+                self.lines = number
+                url = line.strip()
+                if not url or url.startswith("#"):
+                    continue
+
+                if not validate_url(url):
+                    self._report(number, url)
+                    continue
+                video_id = extract_video_id(url)
+                if video_id:
+                    packed = pack_video_id(video_id)
+                    if packed in videos:
+                        self.duplicates += 1
+                        continue
+                    videos.add(packed)
+                    self.jobs += 1
+                    yield canonical_url(video_id)
+                elif is_collection_url(url):
+                    if url in collections:
+                        self.duplicates += 1
+                        continue
+                    collections.add(url)
+                    self.jobs += 1
+                    yield url
+                else:
+                    self._report(number, url)
+
+    def _report(self, number, url):
+        self.invalid += 1
+        if self.invalid <= self.max_reported:
+            print(f"\033[93mLine {number}: not a YouTube video, playlist or channel URL: {url[:100]}\033[0m")
+        elif self.invalid == self.max_reported + 1:
+            print("\033[93mFurther invalid lines are only counted\033[0m")
+
+    def print_summary(self):
+        """Print how the lines read so far were used."""
+        print(
+            f"\n\033[97mRead {self.lines} lines of {self.path}: {self.jobs} URLs to download, "
+            f"{self.duplicates} duplicates skipped, {self.invalid} invalid\033[0m"
+        )
@@ -0,0 +1,199 @@
+"""
+Integrity checks for the YouTube Downloader.
+Digests computed while downloads are written, and verification of finished files against them.
+"""
+
+import hashlib
+import os
+import threading
+
+# Files are hashed in blocks of this size, so byte ranges written in parallel can be hashed as they arrive
+BLOCK_SIZE = 4 * 1024 * 1024
+# Name of the block digest, recorded in front of every digest it produced
+ALGORITHM = "sha256-4m"
+
+READ_SIZE = 1024 * 1024
+
+class IntegrityError(Exception):
+    """Raised when downloaded data does not match its expected size or digest."""
+
+class BlockDigest:
+    """
+    SHA-256 digest of a file that is written in parallel byte ranges.
+
+    Every BLOCK_SIZE block of the file is hashed on its own as its bytes
+    arrive, and the digest of the file is the SHA-256 of the block digests
+    in order. Ranges starting on a block boundary (see
+    transfer.split_ranges) can therefore be fed concurrently and in any
+    order, as long as each is fed front to back, and the digest does not
+    depend on how the file was split. file_digest() computes the same value
+    from a finished file.
+    """
+
+    def __init__(self, total_size=None):
+        """
+        Initialize the digest.
+
+        Args:
+            total_size (int): Size of the file, to complete its last block
+                as soon as it arrives; None if unknown
+        """
+        self.total_size = total_size
+        self._lock = threading.Lock()
+        # Block index -> digest of each complete block
+        self._done = {}
+        # Block index -> (hash, bytes fed) of blocks being written
+        self._open = {}
+
+    def update(self, offset, data):
+        """
+        Add ``data`` written at ``offset``.
+
+        Raises:
+            ValueError: If ``data`` does not continue where its block was left
+        """
+        view = memoryview(data)
+        while view:
+            index, within = divmod(offset, BLOCK_SIZE)
+            piece = view[:BLOCK_SIZE - within]
+            with self._lock:
+                digest, fed = self._open.pop(index, (None, 0))
+                if fed != within or index in self._done:
+                    raise ValueError(f"Block {index} was fed out of order at offset {offset}")
+            # Only one range writes a block, so hashing needs no lock and ranges hash in parallel
+            digest = digest or hashlib.sha256()
+            digest.update(piece)
+            fed += len(piece)
+            with self._lock:
+                if fed == BLOCK_SIZE or (self.total_size is not None and offset + len(piece) >= self.total_size):
+                    self._done[index] = digest.digest()
+                else:
+                    self._open[index] = (digest, fed)
+            offset += len(piece)
+            view = view[len(piece):]
+
+    def blocks(self):
+        """Return the hex digests of the complete blocks by index, e.g. to save with a partial download."""
+        with self._lock:
+            return {str(index): digest.hex() for index, digest in self._done.items()}
+
+    def prime(self, path, start, end, expected=None):
+        """
+        Feed the bytes ``[start, end)`` that an earlier run wrote to ``path``.
+
+        Used when a download resumes, so its digest covers what was already
+        downloaded. Each complete block is checked against the digest the
+        earlier run recorded for it, when there is one.
+
+        Args:
+            path (str): File holding the bytes
+            start (int): Offset of the first byte, on a block boundary
+            end (int): Offset after the last byte
+            expected (dict): Block digests from blocks(), by index
+
+        Returns:
+            int: Offset up to which the data can be trusted; ``end`` unless a
+                block differs from what was recorded, in which case it is the
+                start of that block, from where it has to be downloaded again
+        """
+        expected = expected or {}
+        offset = start
+        with open(path, "rb") as f:
+            f.seek(start)
+            while offset < end:
+                index = offset // BLOCK_SIZE
+                block_end = min((index + 1) * BLOCK_SIZE, end)
+                data = f.read(block_end - offset)
+                if len(data) != block_end - offset:
+                    return self._rewind(index)
+                self.update(offset, data)
+                with self._lock:
+                    digest = self._done.get(index)
+                if digest and str(index) in expected and digest.hex() != expected[str(index)]:
+                    return self._rewind(index)
+                offset = block_end
+        return end
+
+    def _rewind(self, index):
+        """Forget block ``index`` and return its start, where downloading resumes."""
+        with self._lock:
+            self._done.pop(index, None)
+            self._open.pop(index, None)
+        return index * BLOCK_SIZE
+
+    def hexdigest(self):
+        """
+        Return the digest of the whole file as '<ALGORITHM>:<hex>'.
+
+        Raises:
+            IntegrityError: If some of the file was never fed
+        """
+        with self._lock:
+            # With an unknown size, the block being written last is the final one
+            for index, (digest, _) in self._open.items():
+                self._done[index] = digest.digest()
+            self._open = {}
+            count = len(self._done)
+            if self.total_size is not None:
+                count = max(count, -(-self.total_size // BLOCK_SIZE))
+            missing = [index for index in range(count) if index not in self._done]
+            if missing:
+                raise IntegrityError(f"Blocks {missing[:5]} of the file were never received")
+            combined = b"".join(self._done[index] for index in range(count))
+        return f"{ALGORITHM}:{hashlib.sha256(combined).hexdigest()}"
+
+def file_digest(path, algorithm=ALGORITHM):
+    """
+    Compute the digest of a file on disk in one pass.
+
+    Args:
+        path (str): File to read
+        algorithm (str): ALGORITHM, or 'sha256' for a plain SHA-256
+
+    Returns:
+        str: '<algorithm>:<hex>'
+    """
+    if algorithm == "sha256":
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), b""):
+                digest.update(chunk)
+        return f"sha256:{digest.hexdigest()}"
+    if algorithm != ALGORITHM:
+        raise ValueError(f"Unknown digest algorithm: {algorithm}")
+
+    blocks = BlockDigest(os.path.getsize(path))
+    offset = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            blocks.update(offset, chunk)
+            offset += len(chunk)
+    return blocks.hexdigest()
+
+def verify_file(path, size=None, digest=None):
+    """
+    Check a file against its recorded size and digest.
+
+    Args:
+        path (str): File to check
+        size (int): Expected size in bytes, None to skip the check
+        digest (str): Expected '<algorithm>:<hex>', None to skip the check
+
+    Returns:
+        str: What is wrong with the file, or None if it matches
+    """
+    try:
+        actual_size = os.path.getsize(path)
+    except OSError:
+        return "missing"
+    if size is not None and actual_size != size:
+        return f"size is {actual_size} bytes, expected {size}"
+    if digest:
+        algorithm = digest.partition(":")[0]
+        try:
+            actual = file_digest(path, algorithm)
+        except ValueError as e:
+            return str(e)
+        if actual != digest:
+            return "content does not match its digest"
+    return None
@@ -0,0 +1,275 @@
+"""
+Shared job queues for the YouTube Downloader.
+Lets the web app hand jobs to worker processes on any host that can reach the queue.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from jobs import DONE, FAILED, QUEUED, RUNNING, Job
+
+class JobQueue:
+    """
+    Interface of a queue backend.
+
+    Workers claim a job for a lease and renew it with heartbeats while they
+    run it. A job whose lease runs out, because its worker died or lost its
+    connection, goes back to the queue for another worker, until it has been
+    tried ``max_attempts`` times. Updates from a worker that no longer holds
+    the lease are ignored. Backends are chosen by open_queue().
+    """
+
+    def put(self, job):
+        """Add a queued Job."""
+        raise NotImplementedError
+
+    def claim(self, worker, lease):
+        """
+        Take the oldest queued job for ``lease`` seconds.
+
+        Returns:
+            Job: The job, now RUNNING on ``worker``, or None if there is none
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, job_id, worker, lease):
+        """
+        Extend the lease of a running job by ``lease`` seconds from now.
+
+        Returns:
+            Job: The job as stored, e.g. with a changed rate_limit, or None
+                if ``worker`` no longer holds it
+        """
+        raise NotImplementedError
+
+    def update(self, job_id, worker=None, **fields):
+        """
+        Change fields of a job, and release its lease if the state becomes DONE or FAILED.
+
+        Args:
+            job_id (str): Job to update
+            worker (str): Only update if this worker holds the job; None for
+                updates from the web app, e.g. a new rate_limit
+            **fields: Job attributes to set
+
+        Returns:
+            bool: False if the job is unknown or held by another worker
+        """
+        raise NotImplementedError
+
+    def release(self, job_id, worker):
+        """Put a job back in the queue without counting the attempt, e.g. when its worker shuts down."""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Return the Job with the given id, or None."""
+        raise NotImplementedError
+
+    def list_jobs(self):
+        """Return all known jobs, oldest first."""
+        raise NotImplementedError
+
+    def pending(self):
+        """Return the number of jobs waiting for a worker."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a SQLite database, for workers on one host or on hosts sharing
+    a filesystem with working locks.
+
+    Claims run in an immediate transaction, so two workers never take the
+    same job. Every change bumps the job's version, which the web app polls
+    to report progress.
+    """
+
+    def __init__(self, path, max_attempts=3, max_history=500):
+        """
+        Open a queue, creating it if needed.
+
+        Args:
+            path (str): Database file
+            max_attempts (int): Claims after which a job whose worker keeps
+                disappearing is failed instead of requeued
+            max_history (int): Number of finished jobs kept for status queries
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.max_history = max_history
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0, "
+            "worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+
+    def put(self, job):
+        with self._write() as db:
+            db.execute(
+                "INSERT INTO jobs (id, state, version, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job.id, job.state, job.version, job.created_at, json.dumps(job.to_dict()))
+            )
+            self._trim_history(db)
+
+    def claim(self, worker, lease):
+        now = time.time()
+        with self._write() as db:
+            self._requeue_expired(db, now)
+            row = db.execute(
+                "SELECT id, data FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if not row:
+                return None
+            job_id, data = row[0], json.loads(row[1])
+            data.update(state=RUNNING, started_at=now, error=None)
+            db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "version = version + 1, data = ? WHERE id = ?",
+                (RUNNING, worker, now + lease, json.dumps(data), job_id)
+            )
+            return self._job(db, job_id)
+
+    def heartbeat(self, job_id, worker, lease):
+        with self._write() as db:
+            updated = db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time() + lease, job_id, worker, RUNNING)
+            ).rowcount
+            return self._job(db, job_id) if updated else None
+
+    def update(self, job_id, worker=None, **fields):
+        with self._write() as db:
+            if worker is None:
+                row = db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            else:
+                row = db.execute(
+                    "SELECT data FROM jobs WHERE id = ? AND worker = ? AND state = ?", (job_id, worker, RUNNING)
+                ).fetchone()
+            if not row:
+                return False
+            data = json.loads(row[0])
+            data.update(fields)
+            if data["state"] in (DONE, FAILED):
+                db.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, version = version + 1, "
+                    "data = ? WHERE id = ?",
+                    (data["state"], json.dumps(data), job_id)
+                )
+            else:
+                db.execute(
+                    "UPDATE jobs SET state = ?, version = version + 1, data = ? WHERE id = ?",
+                    (data["state"], json.dumps(data), job_id)
+                )
+            return True
+
+    def release(self, job_id, worker):
+        with self._write() as db:
+            row = db.execute(
+                "SELECT data FROM jobs WHERE id = ? AND worker = ? AND state = ?", (job_id, worker, RUNNING)
+            ).fetchone()
+            if row:
+                self._requeue(db, job_id, json.loads(row[0]), refund=True)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._job(self._db, job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            rows = self._db.execute("SELECT data, version FROM jobs ORDER BY created_at").fetchall()
+        return [self._from_row(data, version) for data, version in rows]
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _write(self):
+        """Run the block in an immediate transaction, holding the database's write lock from the start."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _requeue_expired(self, db, now):
+        expired = db.execute(
+            "SELECT id, attempts, data FROM jobs WHERE state = ? AND lease_expires < ?", (RUNNING, now)
+        ).fetchall()
+        for job_id, attempts, data in expired:
+            data = json.loads(data)
+            if attempts >= self.max_attempts:
+                data.update(state=FAILED, error=f"Worker lost {attempts} times", finished_at=now)
+                db.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, version = version + 1, "
+                    "data = ? WHERE id = ?",
+                    (FAILED, json.dumps(data), job_id)
+                )
+            else:
+                self._requeue(db, job_id, data)
+
+    def _requeue(self, db, job_id, data, refund=False):
+        data.update(state=QUEUED, stage=None, speed=None, eta=None)
+        db.execute(
+            "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, version = version + 1, "
+            "attempts = attempts - ?, data = ? WHERE id = ?",
+            (QUEUED, 1 if refund else 0, json.dumps(data), job_id)
+        )
+
+    def _trim_history(self, db):
+        db.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE state IN (?, ?) "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (DONE, FAILED, self.max_history)
+        )
+
+    def _job(self, db, job_id):
+        row = db.execute("SELECT data, version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(*row) if row else None
+
+    @staticmethod
+    def _from_row(data, version):
+        job = Job.from_dict(json.loads(data))
+        job.version = version
+        return job
+
+# Queue backends by URL scheme; other backends register a factory taking the rest of the URL
+QUEUE_BACKENDS = {"sqlite": SQLiteJobQueue}
+
+def open_queue(spec, **options):
+    """
+    Open the queue named by ``spec``.
+
+    Args:
+        spec (str): 'scheme://location', e.g. 'sqlite:///srv/ytdown/queue.db'
+            for the file /srv/ytdown/queue.db, or a plain path for a SQLite queue
+        **options: Passed to the backend
+
+    Raises:
+        ValueError: If the scheme has no backend
+    """
+    scheme, separator, location = spec.partition("://")
+    if not separator:
+        return SQLiteJobQueue(spec, **options)
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown job queue backend: {scheme}")
+    return QUEUE_BACKENDS[scheme](location, **options)
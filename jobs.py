@@ -0,0 +1,290 @@
+"""
+Background job queue for the YouTube Downloader web front ends.
+Runs downloads on a bounded executor and tracks their state and progress.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bandwidth import get_default_governor
+from downloader import YouTubeDownloader
+from progress import ProgressBus
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Progress updates per second pushed to waiting clients
+PROGRESS_RATE = 4
+
+# Job attributes that from_dict() restores from a snapshot
+SNAPSHOT_FIELDS = (
+    'id', 'state', 'bytes_done', 'total_bytes', 'speed', 'eta', 'stage', 'created_at',
+    'started_at', 'finished_at', 'output_file', 'artifact_id', 'error', 'version'
+)
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+class Job:
+    """State of a single background download."""
+
+    def __init__(self, url, format_type, quality, start=None, end=None, rate_limit=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.format_type = format_type
+        self.quality = quality
+        self.start = start
+        self.end = end
+        # Cap on the job's transfer rate in bytes per second
+        self.rate_limit = rate_limit
+        self.state = QUEUED
+        self.bytes_done = 0
+        self.total_bytes = 0
+        # Smoothed transfer rate and time left, from progress events
+        self.speed = None
+        self.eta = None
+        # What the download is doing, e.g. 'downloading' or 'muxing'
+        self.stage = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.output_file = None
+        self.artifact_id = None
+        self.error = None
+        # Bumped on every change so waiters can tell when to report again
+        self.version = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a Job from a to_dict() snapshot, e.g. one kept in a shared queue."""
+        job = cls(data['url'], data['format'], data['quality'], data.get('start'), data.get('end'), data.get('rate_limit'))
+        for name in SNAPSHOT_FIELDS:
+            if name in data:
+                setattr(job, name, data[name])
+        return job
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    @property
+    def rate(self):
+        """Average transfer rate in bytes per second."""
+        if not self.started_at:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        """Return a JSON-serializable snapshot of the job."""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'format': self.format_type,
+            'quality': self.quality,
+            'start': self.start,
+            'end': self.end,
+            'rate_limit': self.rate_limit,
+            'state': self.state,
+            'bytes_done': self.bytes_done,
+            'total_bytes': self.total_bytes,
+            'rate': round(self.rate, 1),
+            'speed': round(self.speed, 1) if self.speed else None,
+            'eta': round(self.eta, 1) if self.eta is not None else None,
+            'stage': self.stage,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'artifact_id': self.artifact_id,
+            'file_url': f'/files/{self.artifact_id}' if self.artifact_id else None,
+            'error': self.error,
+            'version': self.version
+        }
+
+class JobManager:
+    """Bounded pool of background download jobs."""
+
+    def __init__(self, output_dir, max_workers=4, max_pending=100, max_history=500, store=None, bandwidth=None):
+        """
+        Initialize the job manager.
+
+        Args:
+            output_dir (str): Directory to save the downloads
+            max_workers (int): Number of downloads that run at the same time
+            max_pending (int): Number of queued jobs accepted before rejecting new ones
+            max_history (int): Number of finished jobs kept for status queries
+            store (ArtifactStore): Store shared by all jobs to deduplicate downloads
+            bandwidth (BandwidthGovernor): Governor sharing the link between
+                jobs, None for the process-wide default
+        """
+        self.output_dir = output_dir
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.store = store
+        self.bandwidth = bandwidth or get_default_governor()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytdown-job")
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+        # Every job reports here; waiters hear about it a few times a second
+        self.progress = ProgressBus()
+        self.progress.subscribe(self._on_progress, rate=PROGRESS_RATE)
+
+    def submit(self, url, format_type="mp4", quality=None, start=None, end=None, rate_limit=None):
+        """Queue a download, or a clip of [start, end) seconds, and return its Job without waiting for it."""
+        with self._changed:
+            pending = sum(1 for job in self._jobs.values() if job.state == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already waiting")
+            job = Job(url, format_type, quality, start, end, rate_limit)
+            self._jobs[job.id] = job
+            self._trim_history()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """Return the Job with the given id, or None."""
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        """Return all known jobs, oldest first."""
+        with self._changed:
+            return list(self._jobs.values())
+
+    def wait_for_update(self, job, version, timeout=15.0):
+        """
+        Block until the job changes past ``version`` or the timeout expires.
+
+        Returns:
+            dict: Snapshot of the job at wake-up time
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version, timeout=timeout)
+            return job.to_dict()
+
+    def set_rate_limit(self, job, rate):
+        """Change a job's cap in bytes per second, None to lift it; applies at once if it is running."""
+        self._update(job, rate_limit=rate)
+        self.bandwidth.set_job_rate(job.id, rate)
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and optionally wait for running ones."""
+        self._executor.shutdown(wait=wait)
+
+    def _update(self, job, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _on_progress(self, event):
+        job = self.get(event.job)
+        if not job:
+            return
+        # Every event carries the latest byte counts, including the final ones
+        self._update(
+            job,
+            bytes_done=event.bytes_done,
+            total_bytes=event.total_bytes or 0,
+            speed=event.speed,
+            eta=event.eta,
+            stage=event.stage
+        )
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        self._update(job, state=RUNNING, started_at=time.time())
+        try:
+            downloader = YouTubeDownloader(
+                url=job.url,
+                format_type=job.format_type,
+                output_dir=self.output_dir,
+                quality=job.quality,
+                progress=self.progress,
+                job_id=job.id,
+                store=self.store,
+                start=job.start,
+                end=job.end,
+                bandwidth=self.bandwidth,
+                rate_limit=job.rate_limit
+            )
+            if downloader.download():
+                self._update(
+                    job,
+                    state=DONE,
+                    output_file=downloader.output_file,
+                    artifact_id=downloader.artifact_key,
+                    finished_at=time.time()
+                )
+            else:
+                self._update(job, state=FAILED, error=downloader.error or "Download failed", finished_at=time.time())
+        except Exception as e:
+            self._update(job, state=FAILED, error=str(e), finished_at=time.time())
+
+class QueuedJobManager:
+    """
+    JobManager for a shared queue: jobs are only enqueued here and run by
+    worker processes (see worker.py), so download capacity grows with the
+    number of workers rather than with this process.
+    """
+
+    # Seconds between status reads while a client waits for a job to change
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, queue, max_pending=100):
+        """
+        Initialize the manager.
+
+        Args:
+            queue (JobQueue): Queue the workers take jobs from
+            max_pending (int): Number of queued jobs accepted before rejecting new ones
+        """
+        self.queue = queue
+        self.max_pending = max_pending
+
+    def submit(self, url, format_type="mp4", quality=None, start=None, end=None, rate_limit=None):
+        """Queue a download for the workers and return its Job."""
+        pending = self.queue.pending()
+        if pending >= self.max_pending:
+            raise JobQueueFull(f"{pending} jobs already waiting")
+        job = Job(url, format_type, quality, start, end, rate_limit)
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """Return the Job with the given id as last reported by its worker, or None."""
+        return self.queue.get(job_id)
+
+    def list_jobs(self):
+        return self.queue.list_jobs()
+
+    def wait_for_update(self, job, version, timeout=15.0):
+        """
+        Poll the queue until the job moves past ``version`` or the timeout expires.
+
+        Returns:
+            dict: Snapshot of the job at wake-up time
+        """
+        deadline = time.monotonic() + timeout
+        current = self.queue.get(job.id) or job
+        while current.version == version and not current.finished and time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            current = self.queue.get(job.id) or current
+        return current.to_dict()
+
+    def set_rate_limit(self, job, rate):
+        """Change a job's cap; its worker applies it at the next heartbeat."""
+        self.queue.update(job.id, rate_limit=rate)
+        job.rate_limit = rate
+
+    def shutdown(self, wait=True):
+        self.queue.close()
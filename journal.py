@@ -0,0 +1,209 @@
+"""
+Batch journal for the YouTube Downloader.
+An append-only record of every batch item, so interrupted or repeated batches pick up where they left off.
+"""
+
+import json
+import os
+import threading
+import time
+from integrity import file_digest, verify_file
+from utils import extract_video_id, get_human_readable_size
+
+JOURNAL_FILENAME = ".ytdl-journal.jsonl"
+DONE = "done"
+FAILED = "failed"
+
+class BatchJournal:
+    """
+    Outcome of every batch item, one JSON line per event.
+
+    Lines are only ever appended and flushed to disk one by one, so a crash
+    loses at most the line being written, which is ignored on the next
+    load. The latest line per request wins and is kept in memory, making
+    the skip check on a re-run a dictionary lookup. Failed items are
+    retried on later runs after an exponentially growing delay, up to
+    ``max_attempts`` times.
+    """
+
+    def __init__(self, path, max_attempts=5, backoff=60, max_backoff=24 * 3600):
+        """
+        Open a journal, creating it if needed.
+
+        Args:
+            path (str): Journal file, or a directory to keep it in
+            max_attempts (int): Failures after which an item is no longer retried
+            backoff (float): Seconds to wait before the first retry; doubles
+                with every further failure
+            max_backoff (float): Longest wait between retries in seconds
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, JOURNAL_FILENAME)
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Set when the last line was cut short, so the next one starts on its own line
+        self._torn = False
+        self._load()
+
+    def get(self, request):
+        """Return the latest entry for ``request``, or None."""
+        return self._entries.get(request)
+
+    def check(self, request, now=None):
+        """
+        Decide whether a batch item has to run.
+
+        A finished item whose output has gone is recorded as such and runs
+        again.
+
+        Returns:
+            str: Why the item is skipped, or None if it should run
+        """
+        entry = self._entries.get(request)
+        if not entry:
+            return None
+        if entry["status"] == DONE:
+            if os.path.exists(entry["output"]):
+                return "already downloaded"
+            self.invalidated(request, entry["url"], f"Output missing: {entry['output']}")
+            return None
+        if entry["attempts"] >= self.max_attempts:
+            return f"gave up after {entry['attempts']} failed attempts"
+        wait = entry["retry_at"] - (now or time.time())
+        if wait > 0:
+            return f"failed {entry['attempts']} times, next retry in {wait:.0f} s"
+        return None
+
+    def completed(self, request, url, output_file, itag=None, digest=None):
+        """
+        Record a finished item with the size and digest of its output.
+
+        ``digest`` is the one computed while the output was written, if any;
+        otherwise the output is hashed here.
+        """
+        self._append({
+            "request": request,
+            "video_id": extract_video_id(url),
+            "url": url,
+            "status": DONE,
+            "itag": itag,
+            "output": os.path.abspath(output_file),
+            "size": os.path.getsize(output_file),
+            "digest": digest or file_digest(output_file)
+        })
+
+    def failed(self, request, url, error):
+        """Record a failed item and when it may be retried."""
+        previous = self._entries.get(request)
+        attempts = previous["attempts"] + 1 if previous and previous["status"] == FAILED else 1
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        self._append({
+            "request": request,
+            "video_id": extract_video_id(url),
+            "url": url,
+            "status": FAILED,
+            "error": error,
+            "attempts": attempts,
+            "retry_at": time.time() + delay
+        })
+
+    def invalidated(self, request, url, reason):
+        """Record that a finished item's output turned out damaged, so the next run downloads it again."""
+        self._append({
+            "request": request,
+            "video_id": extract_video_id(url),
+            "url": url,
+            "status": FAILED,
+            "error": reason,
+            "attempts": 0,
+            "retry_at": time.time()
+        })
+
+    def verify(self):
+        """
+        Check the outputs of the finished items against the size and digest recorded for them.
+
+        Items whose output is damaged are marked failed, so they are
+        downloaded again by the next run. Outputs that are missing are left
+        alone, as they may have been moved on purpose; the next run
+        downloads them anyway.
+
+        Yields:
+            tuple: (request, output, problem) per finished item, where problem
+                   says what is wrong, or is None if the output is intact
+        """
+        for request, entry in list(self._entries.items()):
+            if entry["status"] != DONE:
+                continue
+            problem = verify_file(entry["output"], entry.get("size"), entry.get("digest"))
+            if problem and problem != "missing":
+                self.invalidated(request, entry["url"], f"Output damaged: {problem}")
+            yield request, entry["output"], problem
+
+    def summary(self):
+        """
+        Count the items of the journal by state.
+
+        Returns:
+            dict: 'done', 'failed' (will be retried), 'gave_up', 'bytes' and
+                  the 'failures' entries, most recent first
+        """
+        failures = [entry for entry in self._entries.values() if entry["status"] == FAILED]
+        done = [entry for entry in self._entries.values() if entry["status"] == DONE]
+        return {
+            "done": len(done),
+            "failed": sum(1 for entry in failures if entry["attempts"] < self.max_attempts),
+            "gave_up": sum(1 for entry in failures if entry["attempts"] >= self.max_attempts),
+            "bytes": sum(entry["size"] for entry in done),
+            "failures": sorted(failures, key=lambda entry: entry["time"], reverse=True)
+        }
+
+    def _append(self, entry):
+        entry["time"] = time.time()
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            if self._torn:
+                line = "\n" + line
+                self._torn = False
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[entry["request"]] = entry
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    self._entries[entry["request"]] = entry
+        except FileNotFoundError:
+            pass
+
+def print_journal_status(journal):
+    """Print what a batch journal knows, without downloading anything."""
+    summary = journal.summary()
+    print(f"\n\033[96mBATCH JOURNAL\033[0m \033[97m{journal.path}\033[0m")
+    print(f"\033[92mDone: {summary['done']} ({get_human_readable_size(summary['bytes'])})\033[0m")
+    print(f"\033[93mFailed, will retry: {summary['failed']}\033[0m")
+    print(f"\033[91mGave up: {summary['gave_up']}\033[0m")
+
+    now = time.time()
+    for entry in summary["failures"]:
+        if entry["attempts"] >= journal.max_attempts:
+            when = "gave up"
+        elif entry["retry_at"] > now:
+            when = f"retry in {entry['retry_at'] - now:.0f} s"
+        else:
+            when = "retry on next run"
+        print(f"\033[91m  {entry['url']} ({entry['attempts']} attempts, {when}): {entry['error']}\033[0m")
@@ -0,0 +1,271 @@
+"""
+Video metadata resolution and caching for the YouTube Downloader.
+Resolves title, author, length and the stream list once and reuses them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+from pytube import YouTube
+from utils import extract_video_id
+
+CACHE_DIR = os.environ.get("YTDOWN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ytdown"))
+DEFAULT_TTL = 3600
+# Stream URLs stop working at their 'expire' time; stop serving them a bit earlier
+EXPIRY_MARGIN = 300
+
+class StreamInfo:
+    """Plain description of one downloadable stream."""
+
+    FIELDS = (
+        "itag", "url", "mime_type", "codecs", "filesize", "resolution", "abr",
+        "fps", "bitrate", "is_progressive", "includes_audio_track", "includes_video_track"
+    )
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields.get(name))
+        self.type, self.subtype = (self.mime_type or "/").split("/")
+
+    @classmethod
+    def from_pytube(cls, stream):
+        return cls(
+            itag=stream.itag,
+            url=stream.url,
+            mime_type=stream.mime_type,
+            codecs=list(stream.codecs),
+            filesize=stream._filesize or None,
+            resolution=stream.resolution,
+            abr=stream.abr,
+            fps=getattr(stream, "fps", None),
+            bitrate=stream.bitrate,
+            is_progressive=stream.is_progressive,
+            includes_audio_track=stream.includes_audio_track,
+            includes_video_track=stream.includes_video_track
+        )
+
+    @property
+    def height(self):
+        """Vertical resolution as an int, e.g. 720 for '720p'."""
+        return int("".join(filter(str.isdigit, self.resolution))) if self.resolution else None
+
+    @property
+    def abr_kbps(self):
+        """Audio bitrate as an int, e.g. 128 for '128kbps'."""
+        return int("".join(filter(str.isdigit, self.abr))) if self.abr else None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+class VideoInfo:
+    """Resolved metadata of a video: what is needed to pick and fetch a stream."""
+
+    def __init__(self, video_id, title, author, length, streams, fetched_at=None):
+        self.video_id = video_id
+        self.title = title
+        self.author = author
+        self.length = length
+        self.streams = streams
+        self.fetched_at = fetched_at or time.time()
+
+    @classmethod
+    def from_pytube(cls, yt):
+        return cls(
+            video_id=yt.video_id,
+            title=yt.title,
+            author=yt.author,
+            length=yt.length,
+            streams=[StreamInfo.from_pytube(stream) for stream in yt.streams]
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            video_id=data["video_id"],
+            title=data["title"],
+            author=data["author"],
+            length=data["length"],
+            streams=[StreamInfo(**stream) for stream in data["streams"]],
+            fetched_at=data["fetched_at"]
+        )
+
+    @property
+    def expires_at(self):
+        """Earliest 'expire' time among the signed stream URLs, or None."""
+        times = []
+        for stream in self.streams:
+            expire = parse_qs(urlparse(stream.url or "").query).get("expire")
+            if expire and expire[0].isdigit():
+                times.append(int(expire[0]))
+        return min(times) if times else None
+
+    def to_dict(self):
+        return {
+            "video_id": self.video_id,
+            "title": self.title,
+            "author": self.author,
+            "length": self.length,
+            "streams": [stream.to_dict() for stream in self.streams],
+            "fetched_at": self.fetched_at
+        }
+
+class MetadataCache:
+    """
+    Two-level cache of VideoInfo keyed by video id.
+
+    An in-process LRU sits in front of a SQLite file shared by every entry
+    point (CLI, Flask, Streamlit). Entries expire after ``ttl`` seconds or
+    shortly before their stream URLs do, whichever comes first, and the
+    least recently used entries are evicted once the file holds more than
+    ``max_bytes`` of metadata.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=64 * 1024 * 1024, memory_entries=256):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): SQLite file, None for the default under CACHE_DIR
+            ttl (int): Seconds an entry stays valid
+            max_bytes (int): Size budget of the stored metadata
+            memory_entries (int): Number of entries kept in the in-process LRU
+        """
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "metadata.db")
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            "video_id TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, video_id):
+        """Return the cached VideoInfo for ``video_id``, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(video_id)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(video_id)
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self._db.execute(
+                "SELECT data, expires_at FROM videos WHERE video_id = ? AND expires_at > ?",
+                (video_id, now)
+            ).fetchone()
+            if not row:
+                self._memory.pop(video_id, None)
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE videos SET accessed_at = ? WHERE video_id = ?", (now, video_id))
+            self._db.commit()
+            info = VideoInfo.from_dict(json.loads(row[0]))
+            self._remember(video_id, info, row[1])
+            self._stats["disk_hits"] += 1
+            return info
+
+    def put(self, info):
+        """Store a freshly resolved VideoInfo."""
+        now = time.time()
+        expires_at = now + self.ttl
+        if info.expires_at:
+            expires_at = min(expires_at, info.expires_at - EXPIRY_MARGIN)
+        if expires_at <= now:
+            return
+
+        data = json.dumps(info.to_dict())
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO videos (video_id, data, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (info.video_id, data, len(data), expires_at, now)
+            )
+            self._evict(now)
+            self._db.commit()
+            self._remember(info.video_id, info, expires_at)
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"], stats["bytes"] = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM videos"
+            ).fetchone()
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, video_id, info, expires_at):
+        self._memory[video_id] = (info, expires_at)
+        self._memory.move_to_end(video_id)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        cursor = self._db.execute("DELETE FROM videos WHERE expires_at <= ?", (now,))
+        self._stats["evictions"] += cursor.rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM videos").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for video_id, size in self._db.execute(
+            "SELECT video_id, size FROM videos ORDER BY accessed_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+            self._memory.pop(video_id, None)
+            self._stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Return the process-wide MetadataCache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache()
+        return _default_cache
+
+def resolve_video(url, cache=None):
+    """
+    Resolve a video URL to its VideoInfo, going to YouTube only on a cache miss.
+
+    Args:
+        url (str): YouTube video URL
+        cache (MetadataCache): Cache to use, None for the default one;
+            pass False to bypass caching
+
+    Returns:
+        VideoInfo: The resolved metadata
+    """
+    if cache is None:
+        cache = get_default_cache()
+
+    video_id = extract_video_id(url)
+    if cache and video_id:
+        info = cache.get(video_id)
+        if info:
+            return info
+
+    info = VideoInfo.from_pytube(YouTube(url))
+    if cache:
+        cache.put(info)
+    return info
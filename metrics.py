@@ -0,0 +1,237 @@
+"""
+Metrics for the YouTube Downloader.
+Counters, gauges and histograms of where download time goes, exported in the Prometheus text format or as JSON.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for a metadata lookup and for an hour-long transcode
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Bytes per second, 64 KB/s to 1 GB/s
+THROUGHPUT_BUCKETS = tuple(64 * 1024 * 4 ** i for i in range(8))
+
+class _Metric:
+    """A named family of values, one per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def _label_dict(self, key):
+        return dict(zip(self.labelnames, key))
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. bytes transferred."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in sorted(values.items())]
+
+    def to_dict(self):
+        with self._lock:
+            return [dict(self._label_dict(key), value=value) for key, value in sorted(self._values.items())]
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. running downloads."""
+
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. stage durations."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+    def to_dict(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        summaries = []
+        for key, (counts, total) in sorted(values.items()):
+            count = sum(counts)
+            summaries.append(dict(
+                self._label_dict(key),
+                count=count,
+                sum=round(total, 6),
+                mean=round(total / count, 6) if count else None,
+                p50=self._quantile(counts, 0.5),
+                p90=self._quantile(counts, 0.9),
+                p99=self._quantile(counts, 0.99)
+            ))
+        return summaries
+
+    def _quantile(self, counts, q):
+        """Upper bucket bound below which a share ``q`` of the observations fall."""
+        count = sum(counts)
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (None,), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return None
+
+class MetricsRegistry:
+    """
+    The metrics of a process.
+
+    Metrics are updated in place under a short lock, so recording is cheap
+    enough to leave on. Collectors add values that live elsewhere, such as
+    cache statistics, when the metrics are read.
+    """
+
+    def __init__(self, prefix="ytdown"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._caches = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def add_cache(self, name, stats):
+        """Report the numeric fields of ``stats()``, e.g. MetadataCache.stats, as cache gauges."""
+        with self._lock:
+            self._caches[name] = stats
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._all_metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Return a JSON-serializable summary, with histogram quantiles estimated from the buckets."""
+        return {metric.name: metric.to_dict() for metric in self._all_metrics()}
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def _all_metrics(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            caches = dict(self._caches)
+        if caches:
+            gauge = Gauge(f"{self.prefix}_cache", "Cache statistics by cache and field", ("cache", "field"))
+            for cache, stats in caches.items():
+                try:
+                    values = stats()
+                except Exception:
+                    continue
+                for field, value in values.items():
+                    if isinstance(value, (int, float)):
+                        gauge.set(value, cache=cache, field=field)
+            metrics.append(gauge)
+        return metrics
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "stage_seconds", "Time spent per download stage (resolve, select, transfer, transcode, finalize)", ("stage",)
+)
+TRANSFERRED_BYTES = registry.counter("transferred_bytes_total", "Bytes downloaded from YouTube")
+TRANSFER_SECONDS = registry.counter("transfer_seconds_total", "Time spent transferring bytes")
+THROUGHPUT = registry.histogram(
+    "throughput_bytes_per_second", "Transfer rate of each stream download", buckets=THROUGHPUT_BUCKETS
+)
+THROTTLED_SECONDS = registry.counter("throttled_seconds_total", "Time downloads waited for the bandwidth governor")
+ACTIVE_DOWNLOADS = registry.gauge("active_downloads", "Downloads currently running")
+DOWNLOADS = registry.counter("downloads_total", "Finished downloads by result", ("result",))
+FAILURES = registry.counter("failures_total", "Failed downloads by exception type", ("exception",))
+STORE_LOOKUPS = registry.counter("store_lookups_total", "Artifact store lookups by result", ("result",))
+
+def stage_timer(stage):
+    """Context manager recording the duration of a download stage."""
+    return STAGE_SECONDS.time(stage=stage)
+
+def record_transfer(size, seconds):
+    """Record ``size`` bytes transferred in ``seconds``."""
+    TRANSFERRED_BYTES.inc(size)
+    TRANSFER_SECONDS.inc(seconds)
+    if seconds > 0:
+        THROUGHPUT.observe(size / seconds)
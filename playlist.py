@@ -0,0 +1,100 @@
+"""
+Playlist and channel expansion for the YouTube Downloader.
+Turns collection URLs into a lazy stream of video URLs and resolves their metadata ahead of use.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pytube import Channel, Playlist
+from ingest import pack_video_id
+from metadata import resolve_video
+from utils import extract_video_id, is_channel_url, is_collection_url
+
+def iter_collection(url):
+    """
+    Yield the video URLs of a playlist or channel, page by page.
+
+    Only the pages needed so far are fetched, so the first videos can start
+    downloading while the rest of a long playlist is still unknown.
+    """
+    collection = Channel(url) if is_channel_url(url) else Playlist(url)
+    yield from collection.url_generator()
+
+def expand_urls(urls, seen=None):
+    """
+    Expand playlist and channel URLs into video URLs, lazily and without repeats.
+
+    Args:
+        urls (iterable): Video, playlist or channel URLs
+        seen (set): Ids packed by ingest.pack_video_id() of the videos
+            ``urls`` has already deduplicated, e.g. BatchFile.videos. Its
+            video URLs are then passed through as they are, and only the
+            videos of expanded collections are checked and added to it.
+
+    Yields:
+        str: Video URLs, each video id at most once
+    """
+    deduplicated = seen is not None
+    seen = set() if seen is None else seen
+    for url in urls:
+        if not is_collection_url(url):
+            video_id = None if deduplicated else extract_video_id(url)
+            if video_id:
+                packed = pack_video_id(video_id)
+                if packed in seen:
+                    continue
+                seen.add(packed)
+            yield url
+            continue
+
+        print(f"\033[94mExpanding: {url}\033[0m")
+        try:
+            for video_url in iter_collection(url):
+                video_id = extract_video_id(video_url)
+                if video_id:
+                    packed = pack_video_id(video_id)
+                    if packed in seen:
+                        continue
+                    seen.add(packed)
+                yield video_url
+        except Exception as e:
+            print(f"\033[91mError expanding {url}: {str(e)}\033[0m")
+
+def prefetch_metadata(items, workers=2, lookahead=4, cache=None, key=None):
+    """
+    Pass ``items`` through while resolving the metadata of the next few in the background.
+
+    The resolved metadata lands in the metadata cache, so by the time a
+    download starts on a URL its title and streams are usually already
+    known. Failures are left for the download itself to report.
+
+    Args:
+        items (iterable): Video URLs, or anything ``key`` maps to one
+        workers (int): Concurrent metadata requests
+        lookahead (int): How many URLs to resolve ahead of the consumer
+        cache (MetadataCache): Cache to fill, None for the default one;
+            False disables prefetching
+        key (callable): Returns the URL of an item, None if items are URLs
+
+    Yields:
+        The same items, in order
+    """
+    if cache is False or lookahead < 1:
+        yield from items
+        return
+
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as executor:
+        for item in items:
+            url = key(item) if key else item
+            window.append((item, executor.submit(_resolve_quietly, url, cache)))
+            if len(window) > lookahead:
+                yield window.popleft()[0]
+        while window:
+            yield window.popleft()[0]
+
+def _resolve_quietly(url, cache):
+    try:
+        resolve_video(url, cache)
+    except Exception:
+        pass
@@ -0,0 +1,250 @@
+"""
+Progress events for the YouTube Downloader.
+Downloads publish typed events on a bus; sinks such as the terminal, the web job list or a log subscribe at their own rate.
+"""
+
+import logging
+import threading
+import time
+
+STARTED = "started"
+BYTES = "bytes"
+STAGE = "stage"
+DONE = "done"
+ERROR = "error"
+
+# Weight of the newest measurement in the smoothed speed
+SPEED_SMOOTHING = 0.3
+
+class ProgressEvent:
+    """Something that happened to one download, with its transfer state at the time."""
+
+    def __init__(self, job, kind, bytes_done=0, total_bytes=None, speed=None, eta=None, stage=None, message=None):
+        """
+        Initialize the event.
+
+        Args:
+            job (str): Download the event belongs to, e.g. its URL or batch label
+            kind (str): STARTED, BYTES, STAGE, DONE or ERROR
+            bytes_done (int): Bytes transferred so far
+            total_bytes (int): Bytes to transfer, None if unknown
+            speed (float): Smoothed transfer rate in bytes per second
+            eta (float): Estimated seconds until the transfer ends
+            stage (str): What the download is doing, e.g. 'downloading' or 'muxing'
+            message (str): Output path for DONE, error text for ERROR
+        """
+        self.job = job
+        self.kind = kind
+        self.time = time.time()
+        self.bytes_done = bytes_done
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.stage = stage
+        self.message = message
+
+    @property
+    def fraction(self):
+        """Share of the transfer done, between 0 and 1, or None if the total is unknown."""
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.bytes_done / self.total_bytes)
+
+    def to_dict(self):
+        return {
+            "job": self.job,
+            "kind": self.kind,
+            "time": self.time,
+            "bytes_done": self.bytes_done,
+            "total_bytes": self.total_bytes,
+            "speed": self.speed,
+            "eta": self.eta,
+            "stage": self.stage,
+            "message": self.message
+        }
+
+class _Subscription:
+    """A sink and the BYTES events held back from it until its next turn."""
+
+    def __init__(self, sink, rate):
+        self.sink = sink
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = 0.0
+
+    def offer(self, event, now):
+        with self._lock:
+            if event.kind == BYTES:
+                self._pending[event.job] = event
+                if now - self._last_flush < self.interval:
+                    return
+                self._last_flush = now
+                pending, self._pending = self._pending, {}
+                for held in pending.values():
+                    self._deliver(held)
+                return
+            # Anything else goes out at once, after the latest progress of its job
+            held = self._pending.pop(event.job, None)
+            if held:
+                self._deliver(held)
+            self._deliver(event)
+
+    def _deliver(self, event):
+        try:
+            self.sink(event)
+        except Exception:
+            # A broken sink must not break the download reporting to it
+            pass
+
+class ProgressBus:
+    """
+    Fan-out of progress events to subscribed sinks.
+
+    BYTES events are coalesced per sink: a sink subscribed at ``rate``
+    receives at most ``rate`` rounds of them per second, each with only the
+    latest event of every job, so rendering costs the same however small
+    the chunks are. Other events are delivered immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        # Shortest delivery interval of any sink, None without sinks;
+        # BYTES events more frequent than this would never be seen
+        self.interval = None
+
+    def subscribe(self, sink, rate=10):
+        """
+        Call ``sink(event)`` for events published from now on.
+
+        Args:
+            sink (callable): Receives each ProgressEvent
+            rate (float): Most BYTES deliveries per second, None for every one
+
+        Returns:
+            object: Token for unsubscribe()
+        """
+        subscription = _Subscription(sink, rate)
+        with self._lock:
+            self._set_subscriptions(self._subscriptions + [subscription])
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._set_subscriptions([s for s in self._subscriptions if s is not subscription])
+
+    def _set_subscriptions(self, subscriptions):
+        self._subscriptions = subscriptions
+        self.interval = min((s.interval for s in subscriptions), default=None)
+
+    def publish(self, event):
+        now = time.monotonic()
+        for subscription in self._subscriptions:
+            subscription.offer(event, now)
+
+class ProgressReporter:
+    """
+    Turns the byte counts of one download into events on a bus.
+
+    Called for every chunk, so it does no more than a clock read and a
+    comparison unless an event is due; speed and ETA are only computed for
+    the events that are actually published.
+    """
+
+    def __init__(self, bus, job):
+        self.bus = bus
+        self.job = job
+        self.stage_name = None
+        self.bytes_done = 0
+        self.total_bytes = None
+        self.speed = None
+        self._last_emit = 0.0
+        self._last_sample = None
+
+    def started(self):
+        self._publish(STARTED)
+
+    def stage(self, name):
+        """Report that the download moved on to ``name``, e.g. 'muxing'."""
+        self.stage_name = name
+        self._publish(STAGE)
+
+    def update(self, bytes_done, total_bytes=None):
+        """Record the transfer state; publishes a BYTES event when some sink is due for one."""
+        self.bytes_done = bytes_done
+        self.total_bytes = total_bytes or self.total_bytes
+        interval = self.bus.interval
+        if interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_emit < interval:
+            return
+        self._last_emit = now
+        self._measure(now)
+        self._publish(BYTES)
+
+    def callback(self, stream, chunk, bytes_remaining):
+        """pytube-style progress callback feeding update()."""
+        total_bytes = stream.filesize
+        self.update((total_bytes or 0) - bytes_remaining, total_bytes)
+
+    def done(self, output_file=None):
+        self._publish(DONE, output_file)
+
+    def error(self, message):
+        self._publish(ERROR, message)
+
+    def _measure(self, now):
+        if self._last_sample:
+            last_time, last_bytes = self._last_sample
+            elapsed = now - last_time
+            if elapsed > 0 and self.bytes_done >= last_bytes:
+                current = (self.bytes_done - last_bytes) / elapsed
+                self.speed = current if self.speed is None else (
+                    SPEED_SMOOTHING * current + (1 - SPEED_SMOOTHING) * self.speed
+                )
+        self._last_sample = (now, self.bytes_done)
+
+    def _publish(self, kind, message=None):
+        eta = None
+        if self.speed and self.total_bytes:
+            eta = max(0.0, (self.total_bytes - self.bytes_done) / self.speed)
+        self.bus.publish(ProgressEvent(
+            self.job, kind, self.bytes_done, self.total_bytes, self.speed, eta, self.stage_name, message
+        ))
+
+class LogSink:
+    """Writes progress events to a logger: milestones at ``level``, byte counts at DEBUG."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("ytdown.progress")
+        self.level = level
+
+    def __call__(self, event):
+        if event.kind == BYTES:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("%s: %s", event.job, format_transfer(event))
+        elif event.kind == ERROR:
+            self.logger.error("%s: %s", event.job, event.message)
+        elif event.kind == STAGE:
+            self.logger.log(self.level, "%s: %s", event.job, event.stage)
+        else:
+            self.logger.log(self.level, "%s: %s %s", event.job, event.kind, event.message or "")
+
+def format_duration(seconds):
+    """Format seconds as 'm:ss' or 'h:mm:ss'."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def format_transfer(event):
+    """Short summary of a BYTES event, e.g. '12.3/45.6 MB, 2.1 MB/s, ETA 0:16'."""
+    done = event.bytes_done / 1048576
+    text = f"{done:.1f}/{event.total_bytes / 1048576:.1f} MB" if event.total_bytes else f"{done:.1f} MB"
+    if event.speed:
+        text += f", {event.speed / 1048576:.1f} MB/s"
+    if event.eta is not None:
+        text += f", ETA {format_duration(event.eta)}"
+    return text
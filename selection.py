@@ -0,0 +1,258 @@
+"""
+Stream selection for the YouTube Downloader.
+Ranks the ways of producing an output from a video's streams by quality and cost.
+"""
+
+from utils import get_human_readable_size
+
+# Quality labels: maximum video height for MP4, target bitrate in kbps for MP3
+QUALITY_TARGETS = {
+    "mp4": {"low": 360, "medium": 720, "high": 1080, "best": None},
+    "mp3": {"low": 128, "medium": 192, "high": 256, "best": 320}
+}
+DEFAULT_MP3_BITRATE = 256
+# Without a quality, MP4 stays at the 720p of the combined stream, which needs no mux
+DEFAULT_MP4_HEIGHT = 720
+# Codec preference when none is given: H.264 plays everywhere, AV1 and VP9 do not.
+# Unlike an explicit preference, it is a filter: other codecs are only a fallback
+DEFAULT_CODECS = {"mp4": ["avc1"], "mp3": []}
+
+PROGRESSIVE = "progressive"
+ADAPTIVE = "adaptive"
+AUDIO = "audio"
+
+class SelectionTarget:
+    """What the output should look like and the limits on producing it."""
+
+    def __init__(self, format_type, max_height=None, bitrate_kbps=None, max_bytes=None,
+                 preferred_codecs=None, can_mux=True):
+        """
+        Initialize the target.
+
+        Args:
+            format_type (str): 'mp3' or 'mp4'
+            max_height (int): Highest acceptable video height, None for no limit
+            bitrate_kbps (int): MP3 bitrate; the source should be at least this good
+            max_bytes (int): Most bytes to transfer, None for no limit
+            preferred_codecs (list): Codec families in order of preference,
+                e.g. ['avc1', 'vp9'] or ['opus', 'mp4a']; None for DEFAULT_CODECS,
+                which streams must then match to meet the target
+            can_mux (bool): Whether separate video and audio streams can be
+                combined, i.e. FFmpeg is available
+        """
+        self.format_type = format_type
+        self.max_height = max_height
+        self.bitrate_kbps = bitrate_kbps
+        self.max_bytes = max_bytes
+        # Only the default list filters; an explicit one ranks codecs after quality
+        self.codec_filter = preferred_codecs is None
+        if preferred_codecs is None:
+            preferred_codecs = DEFAULT_CODECS.get(format_type, [])
+        self.preferred_codecs = [codec.strip().lower() for codec in preferred_codecs]
+        self.can_mux = can_mux
+
+    @classmethod
+    def from_quality(cls, format_type, quality=None, **constraints):
+        """Build the target for a quality label such as 'high'; no label means DEFAULT_MP4_HEIGHT or DEFAULT_MP3_BITRATE."""
+        levels = QUALITY_TARGETS.get(format_type, {})
+        if format_type == "mp3":
+            return cls(format_type, bitrate_kbps=levels.get(quality) or DEFAULT_MP3_BITRATE, **constraints)
+        # 'best' is in the table with no height limit
+        return cls(format_type, max_height=levels[quality] if quality in levels else DEFAULT_MP4_HEIGHT, **constraints)
+
+    @property
+    def bitrate(self):
+        """FFmpeg bitrate argument for MP3 targets, e.g. '256k'."""
+        return f"{self.bitrate_kbps}k" if self.bitrate_kbps else None
+
+class StreamPlan:
+    """One way of producing the output: which streams to fetch and how to combine them."""
+
+    def __init__(self, kind, streams, length=None):
+        """
+        Initialize the plan.
+
+        Args:
+            kind (str): PROGRESSIVE, ADAPTIVE (video and audio muxed) or AUDIO
+            streams (list): StreamInfo to download, video first
+            length (int): Video length in seconds, used to estimate sizes
+        """
+        self.kind = kind
+        self.streams = streams
+        sizes = [_estimate_bytes(stream, length) for stream in streams]
+        self.estimated_bytes = sum(sizes) if None not in sizes else None
+        self.score = ()
+        self.reasons = []
+        # Why the plan misses the target, None if it meets it
+        self.rejected = None
+        # False if the plan cannot be used at all, even as a fallback
+        self.feasible = True
+
+    @property
+    def video(self):
+        return next((stream for stream in self.streams if stream.includes_video_track), None)
+
+    @property
+    def audio(self):
+        return next((stream for stream in reversed(self.streams) if stream.includes_audio_track), None)
+
+    def describe(self):
+        """Short human-readable summary, e.g. '1080p avc1 + 128kbps mp4a (adaptive, 52.1 MB)'."""
+        parts = []
+        if self.kind != AUDIO:
+            parts.append(f"{self.video.resolution} {_codec_family(self.video, video=True) or ''}".strip())
+        if self.kind != PROGRESSIVE:
+            parts.append(f"{self.audio.abr} {_codec_family(self.audio, video=False) or ''}".strip())
+        size = get_human_readable_size(self.estimated_bytes) if self.estimated_bytes else "size unknown"
+        return f"{' + '.join(parts)} ({self.kind}, {size})"
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "itags": [stream.itag for stream in self.streams],
+            "estimated_bytes": self.estimated_bytes,
+            "rejected": self.rejected,
+            "reasons": self.reasons,
+            "description": self.describe()
+        }
+
+def _estimate_bytes(stream, length):
+    if stream.filesize:
+        return stream.filesize
+    if stream.bitrate and length:
+        return stream.bitrate * length // 8
+    if stream.abr_kbps and length:
+        return stream.abr_kbps * 1000 * length // 8
+    return None
+
+def _codec_family(stream, video):
+    """Codec family of the video or audio track of a stream, e.g. 'avc1' or 'opus'."""
+    codecs = stream.codecs or []
+    if stream.includes_video_track and stream.includes_audio_track:
+        codecs = codecs[:1] if video else codecs[1:]
+    return codecs[0].split(".")[0].lower() if codecs else None
+
+def score_quality(plan, target):
+    """Prefer the highest video, or the MP3 source closest to meeting the bitrate."""
+    if target.format_type == "mp3":
+        abr = plan.audio.abr_kbps or 0
+        shortfall = max(0, target.bitrate_kbps - abr)
+        if shortfall:
+            return shortfall, f"{abr}kbps source is below the {target.bitrate_kbps}kbps target"
+        return 0, f"{abr}kbps source meets the {target.bitrate_kbps}kbps target"
+    video = plan.video
+    fps = f" at {video.fps} fps" if video.fps else ""
+    return -(video.height or 0), f"{video.resolution}{fps}"
+
+def score_codec(plan, target):
+    """Prefer codecs earlier in the target's preference list."""
+    if not target.preferred_codecs:
+        return 0, None
+    codec = _codec_family(plan.audio if target.format_type == "mp3" else plan.video, target.format_type != "mp3")
+    if codec in target.preferred_codecs:
+        rank = target.preferred_codecs.index(codec)
+        return rank, f"{codec} is preferred codec #{rank + 1}"
+    return len(target.preferred_codecs), f"{codec or 'unknown codec'} is not a preferred codec"
+
+def score_processing(plan, target):
+    """Prefer outputs that need less work after the download."""
+    if plan.kind == PROGRESSIVE:
+        return 0, "kept as-is, no processing"
+    if plan.kind == ADAPTIVE:
+        return 1, "video and audio muxed without re-encoding"
+    return 0, f"{_codec_family(plan.audio, video=False) or 'audio'} re-encoded to MP3"
+
+def score_bytes(plan, target):
+    """Prefer fewer bytes to transfer."""
+    if plan.estimated_bytes is None:
+        return float("inf"), "size unknown"
+    return plan.estimated_bytes, f"{get_human_readable_size(plan.estimated_bytes)} to transfer"
+
+# Applied in order: a later scorer only breaks ties of the earlier ones
+DEFAULT_SCORERS = (score_quality, score_codec, score_processing, score_bytes)
+
+class StreamSelector:
+    """
+    Ranks the candidate plans for a video against a SelectionTarget.
+
+    Each scorer takes (plan, target) and returns (cost, reason); plans are
+    ordered by their costs, compared scorer by scorer, so the scorer list
+    decides what matters most. Plans that miss the target (too high, too
+    large, in a codec outside the default list, or needing a mux without
+    FFmpeg) rank after the ones that meet it. Pass different scorers, or override candidates(), to change the
+    policy.
+    """
+
+    def __init__(self, scorers=DEFAULT_SCORERS):
+        self.scorers = list(scorers)
+
+    def candidates(self, info, target):
+        """Return every plan that can produce ``target`` from the streams of ``info``."""
+        if target.format_type == "mp3":
+            return [
+                StreamPlan(AUDIO, [stream], info.length) for stream in info.streams
+                if stream.includes_audio_track and not stream.includes_video_track and stream.abr_kbps
+            ]
+
+        plans = [
+            StreamPlan(PROGRESSIVE, [stream], info.length) for stream in info.streams
+            if stream.is_progressive and stream.subtype == "mp4" and stream.height
+        ]
+        # Video-only streams go with the best audio that fits in an MP4 as-is
+        audio = max(
+            (
+                stream for stream in info.streams
+                if stream.includes_audio_track and not stream.includes_video_track
+                and stream.subtype == "mp4" and stream.abr_kbps
+            ),
+            key=lambda stream: stream.abr_kbps,
+            default=None
+        )
+        if audio:
+            plans.extend(
+                StreamPlan(ADAPTIVE, [stream, audio], info.length) for stream in info.streams
+                if stream.includes_video_track and not stream.includes_audio_track
+                and stream.subtype == "mp4" and stream.height
+            )
+        return plans
+
+    def rank(self, info, target):
+        """
+        Score every candidate plan.
+
+        Returns:
+            list: StreamPlan, best first, each with its score and reasons
+        """
+        plans = self.candidates(info, target)
+        for plan in plans:
+            self._check(plan, target)
+            results = [scorer(plan, target) for scorer in self.scorers]
+            plan.score = tuple(cost for cost, _ in results)
+            plan.reasons = [reason for _, reason in results if reason]
+        return sorted(plans, key=lambda plan: (plan.rejected is not None, plan.score))
+
+    def select(self, info, target):
+        """
+        Return the best plan for ``target``, or None.
+
+        If no plan meets the target, the closest feasible one (within
+        ``max_bytes`` and not needing a missing FFmpeg) is returned with
+        ``rejected`` set.
+        """
+        plans = self.rank(info, target)
+        return next((plan for plan in plans if plan.feasible), None)
+
+    @staticmethod
+    def _check(plan, target):
+        if target.max_bytes and plan.estimated_bytes and plan.estimated_bytes > target.max_bytes:
+            plan.feasible = False
+            plan.rejected = f"over the {get_human_readable_size(target.max_bytes)} limit"
+        elif plan.kind == ADAPTIVE and not target.can_mux:
+            plan.feasible = False
+            plan.rejected = "muxing needs FFmpeg"
+        elif target.max_height and plan.video and (plan.video.height or 0) > target.max_height:
+            plan.rejected = f"above {target.max_height}p"
+        elif target.codec_filter and target.preferred_codecs and plan.video:
+            codec = _codec_family(plan.video, video=True)
+            if codec not in target.preferred_codecs:
+                plan.rejected = f"{codec or 'unknown codec'} is not {' or '.join(target.preferred_codecs)}"
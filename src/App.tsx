@@ -8,6 +8,32 @@ interface DownloadOptions {
   format: Format;
   quality: Quality;
   url: string;
+  fileUrl?: string;
+}
+
+interface JobStatus {
+  state: 'queued' | 'running' | 'done' | 'failed';
+  version: number;
+  error: string | null;
+  file_url: string | null;
+}
+
+const API_URL = 'http://localhost:5000';
+
+// Long-poll the job until it finishes
+async function waitForJob(jobId: string): Promise<JobStatus> {
+  let version = -1;
+  while (true) {
+    const response = await fetch(`${API_URL}/jobs/${jobId}?since=${version}`);
+    const job: JobStatus = await response.json();
+    if (!response.ok) {
+      throw new Error('Job lookup failed');
+    }
+    if (job.state === 'done' || job.state === 'failed') {
+      return job;
+    }
+    version = job.version;
+  }
 }
 
 function App() {
@@ -29,7 +55,7 @@ function App() {
 
     setIsLoading(true);
     try {
-      const response = await fetch('http://localhost:5000/download', {
+      const response = await fetch(`${API_URL}/download`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -41,7 +67,14 @@ function App() {
         throw new Error('Download failed');
       }
 
-      setDownloadHistory(prev => [...prev, { url, format, quality }]);
+      const { job_id: jobId } = await response.json();
+      const job = await waitForJob(jobId);
+      if (job.state === 'failed') {
+        throw new Error(job.error || 'Download failed');
+      }
+
+      const fileUrl = job.file_url ? `${API_URL}${job.file_url}` : undefined;
+      setDownloadHistory(prev => [...prev, { url, format, quality, fileUrl }]);
       setUrl('');
     } catch (err) {
       setError('Failed to download. Please try again.');
@@ -174,9 +207,20 @@ function App() {
                       )}
                       <span className="truncate max-w-md">{item.url}</span>
                     </div>
-                    <span className="text-sm bg-gray-600 px-2 py-1 rounded">
-                      {item.format.toUpperCase()} - {item.quality}
-                    </span>
+                    <div className="flex items-center space-x-2">
+                      <span className="text-sm bg-gray-600 px-2 py-1 rounded">
+                        {item.format.toUpperCase()} - {item.quality}
+                      </span>
+                      {item.fileUrl && (
+                        <a
+                          href={item.fileUrl}
+                          className="flex items-center text-sm bg-blue-600 hover:bg-blue-700 px-2 py-1 rounded"
+                        >
+                          <Download className="w-4 h-4 mr-1" />
+                          Save
+                        </a>
+                      )}
+                    </div>
                   </div>
                 ))}
               </div>
@@ -0,0 +1,107 @@
+"""
+Pipeline stages for the YouTube Downloader.
+A stage is a bounded set of worker threads fed from a queue, with usage statistics.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+class WorkerStage:
+    """
+    Bounded pool of worker threads that process submitted calls in order.
+
+    Workers are daemon threads, so an interrupted program does not wait for
+    running downloads to finish before exiting. ``stats()`` reports queue
+    depth and how busy the workers have been, which is what is needed to
+    balance the size of one stage against another.
+    """
+
+    def __init__(self, name, workers):
+        """
+        Initialize the stage.
+
+        Args:
+            name (str): Stage name used in statistics and thread names
+            workers (int): Number of calls that run at the same time
+        """
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._peak_queued = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"ytdown-{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """Queue ``function(*args, **kwargs)`` and return a Future for its result."""
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        with self._lock:
+            self._peak_queued = max(self._peak_queued, self._queue.qsize())
+        return future
+
+    def stats(self):
+        """Return queue depth, activity counters and utilization of the stage."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at
+            busy = self._busy_seconds
+            return {
+                'name': self.name,
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'peak_queued': self._peak_queued,
+                'active': self._active,
+                'completed': self._completed,
+                'failed': self._failed,
+                'busy_seconds': round(busy, 3),
+                'utilization': busy / (elapsed * self.workers) if elapsed > 0 else 0.0
+            }
+
+    def shutdown(self, wait=True):
+        """Let the workers finish what is queued, then stop them."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            future, function, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._active += 1
+            started = time.monotonic()
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+            with self._lock:
+                self._active -= 1
+                self._busy_seconds += time.monotonic() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
@@ -5,6 +5,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const btnText = downloadBtn.querySelector('.btn-text');
     const spinner = downloadBtn.querySelector('.spinner');
     const historyList = document.getElementById('historyList');
+    const jobsContainer = document.getElementById('jobs');
+    const jobsList = document.getElementById('jobsList');
     
     let downloadHistory = JSON.parse(localStorage.getItem('downloadHistory') || '[]');
     updateHistoryDisplay();
@@ -32,7 +34,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // Show loading state
         downloadBtn.disabled = true;
-        btnText.textContent = 'Downloading...';
+        btnText.textContent = 'Submitting...';
         spinner.classList.remove('hidden');
 
         try {
@@ -50,19 +52,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(data.error || 'Download failed');
             }
 
-            // Add to history
-            const historyItem = { url, format, quality, timestamp: new Date().toISOString() };
-            downloadHistory.unshift(historyItem);
-            if (downloadHistory.length > 10) downloadHistory.pop();
-            localStorage.setItem('downloadHistory', JSON.stringify(downloadHistory));
-            updateHistoryDisplay();
+            trackJob(data.job_id, { url, format, quality });
 
             // Reset form
             form.reset();
             document.querySelector('.format-btn[data-format="mp4"]').classList.add('active');
             document.querySelector('.format-btn[data-format="mp3"]').classList.remove('active');
-            
-            alert('Download completed successfully!');
         } catch (error) {
             alert(error.message);
         } finally {
@@ -73,11 +68,104 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Follow a background job until it finishes
+    function trackJob(jobId, request) {
+        const item = document.createElement('div');
+        item.className = 'history-item job-item';
+        item.innerHTML = `
+            <div class="history-url"></div>
+            <div class="history-format">Queued</div>
+            <div class="job-progress"><div class="job-progress-bar"></div></div>
+        `;
+        item.querySelector('.history-url').textContent = request.url;
+        jobsList.prepend(item);
+        jobsContainer.classList.remove('hidden');
+
+        const onUpdate = (job) => {
+            renderJob(item, job);
+            if (job.state === 'done') {
+                addToHistory({ ...request, fileUrl: job.file_url });
+            }
+            if (job.state === 'done' || job.state === 'failed') {
+                setTimeout(() => {
+                    item.remove();
+                    if (!jobsList.children.length) jobsContainer.classList.add('hidden');
+                }, 10000);
+                return true;
+            }
+            return false;
+        };
+
+        if (window.EventSource) {
+            const source = new EventSource(`/jobs/${jobId}/events`);
+            source.onmessage = (event) => {
+                if (onUpdate(JSON.parse(event.data))) source.close();
+            };
+            source.onerror = () => {
+                // Fall back to long-polling if the stream drops
+                source.close();
+                pollJob(jobId, onUpdate);
+            };
+        } else {
+            pollJob(jobId, onUpdate);
+        }
+    }
+
+    async function pollJob(jobId, onUpdate) {
+        let version = -1;
+        while (true) {
+            try {
+                const response = await fetch(`/jobs/${jobId}?since=${version}`);
+                const job = await response.json();
+                if (!response.ok) throw new Error(job.error || 'Job lookup failed');
+                version = job.version;
+                if (onUpdate(job)) return;
+            } catch (error) {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+            }
+        }
+    }
+
+    function renderJob(item, job) {
+        const percentage = job.total_bytes ? (job.bytes_done / job.total_bytes) * 100 : 0;
+        const rate = job.rate ? ` - ${(job.rate / 1048576).toFixed(1)} MB/s` : '';
+        let status = 'Queued';
+        if (job.state === 'running') status = `${percentage.toFixed(1)}%${rate}`;
+        if (job.state === 'done') status = 'Completed';
+        if (job.state === 'failed') status = `Failed: ${job.error || 'unknown error'}`;
+
+        item.classList.toggle('done', job.state === 'done');
+        item.classList.toggle('failed', job.state === 'failed');
+        item.querySelector('.history-format').textContent = status;
+        item.querySelector('.job-progress-bar').style.width = `${job.state === 'done' ? 100 : percentage}%`;
+
+        if (job.state === 'done' && job.file_url && !item.querySelector('.file-link')) {
+            item.querySelector('.history-format').after(fileLink(job.file_url));
+        }
+    }
+
+    function fileLink(fileUrl) {
+        const link = document.createElement('a');
+        link.className = 'history-format file-link';
+        link.href = fileUrl;
+        link.textContent = 'Save file';
+        return link;
+    }
+
+    function addToHistory({ url, format, quality, fileUrl }) {
+        const historyItem = { url, format, quality, fileUrl, timestamp: new Date().toISOString() };
+        downloadHistory.unshift(historyItem);
+        if (downloadHistory.length > 10) downloadHistory.pop();
+        localStorage.setItem('downloadHistory', JSON.stringify(downloadHistory));
+        updateHistoryDisplay();
+    }
+
     function updateHistoryDisplay() {
         historyList.innerHTML = downloadHistory.map(item => `
             <div class="history-item">
                 <div class="history-url">${item.url}</div>
                 <div class="history-format">${item.format.toUpperCase()} - ${item.quality}</div>
+                ${item.fileUrl ? `<a class="history-format file-link" href="${item.fileUrl}">Save file</a>` : ''}
             </div>
         `).join('');
     }
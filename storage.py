@@ -0,0 +1,222 @@
+"""
+Disk quota management for the YouTube Downloader.
+Tracks stored artifacts in an index and evicts the least useful ones to stay under a byte quota.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Space left free on the disk on top of what a download needs
+FREE_SPACE_MARGIN = 64 * 1024 * 1024
+
+class InsufficientStorage(OSError):
+    """Raised when there is no room for a download, even after eviction."""
+
+def ensure_free_space(directory, needed, margin=FREE_SPACE_MARGIN):
+    """
+    Fail fast if ``directory`` is on a disk without room for ``needed`` bytes.
+
+    Raises:
+        InsufficientStorage: If the free space is below ``needed + margin``
+    """
+    free = shutil.disk_usage(directory).free
+    if free < needed + margin:
+        raise InsufficientStorage(
+            f"Not enough disk space in {directory}: need {needed} bytes, {free} free"
+        )
+
+class StorageManager:
+    """
+    Byte quota and eviction for the artifacts of an ArtifactStore.
+
+    A SQLite index records the size, last access and hit count of every
+    artifact and the user-facing links that point at it, so accounting
+    never needs a directory walk. When a download needs room, artifacts are
+    evicted least recently used first ("lru") or least frequently used
+    first ("lfu"). Artifacts being served (pinned) and space reserved for
+    downloads still being written are never given up.
+    """
+
+    def __init__(self, root, quota_bytes=None, policy="lru"):
+        """
+        Initialize the storage manager.
+
+        Args:
+            root (str): Store directory; the index lives in root/index.db
+            quota_bytes (int): Maximum bytes of artifacts, None for no quota
+            policy (str): 'lru' or 'lfu'
+        """
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.policy = policy
+        self._lock = threading.RLock()
+        self._pins = {}
+        self._reserved = 0
+
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS links (key TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (key, path))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS requests (request TEXT PRIMARY KEY, key TEXT NOT NULL)")
+        self._db.commit()
+
+    def register(self, key, path, size):
+        """Add a committed artifact to the index."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (key, path, size, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, path, size, now, now)
+            )
+            self._db.commit()
+
+    def add_request(self, request, key):
+        """Record that ``request`` was answered with artifact ``key``."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO requests (request, key) VALUES (?, ?)", (request, key))
+            self._db.commit()
+
+    def find_request(self, request):
+        """Return the key of the artifact last used for ``request``, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT key FROM requests WHERE request = ?", (request,)).fetchone()
+        return row[0] if row else None
+
+    def add_link(self, key, path):
+        """Record a user-facing link so it is removed along with the artifact."""
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO links (key, path) VALUES (?, ?)", (key, os.path.abspath(path)))
+            self._db.commit()
+
+    def touch(self, key):
+        """Mark an artifact as used now."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE artifacts SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+    def forget(self, key):
+        """Drop an artifact from the index without touching its files."""
+        with self._lock:
+            self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM links WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM requests WHERE key = ?", (key,))
+            self._db.commit()
+
+    def remove(self, key, links=True):
+        """
+        Delete an artifact with its metadata, e.g. one found damaged.
+
+        Args:
+            key (str): Artifact key
+            links (bool): Also delete the user-facing links to it; if False
+                they are left in place and only dropped from the index
+        """
+        with self._lock:
+            artifact = self._db.execute("SELECT path FROM artifacts WHERE key = ?", (key,)).fetchone()
+            links = [row[0] for row in self._db.execute("SELECT path FROM links WHERE key = ?", (key,))] if links else []
+            if artifact:
+                self._delete_files(artifact[0], links)
+            self.forget(key)
+
+    def is_empty(self):
+        """Return True if no artifact has been indexed yet."""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM artifacts LIMIT 1").fetchone() is None
+
+    def used_bytes(self):
+        """Return the total size of the indexed artifacts."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    @contextmanager
+    def pinned(self, key):
+        """Keep an artifact from being evicted while the block runs, e.g. while serving it."""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    @contextmanager
+    def reserve(self, needed):
+        """
+        Hold room for a download of ``needed`` bytes while the block runs.
+
+        Evicts artifacts if the quota would be exceeded and checks the free
+        disk space, so a download fails before it starts rather than
+        halfway through.
+
+        Raises:
+            InsufficientStorage: If the room cannot be made
+        """
+        needed = needed or 0
+        with self._lock:
+            if self.quota_bytes is not None:
+                excess = self.used_bytes() + self._reserved + needed - self.quota_bytes
+                # Don't empty the store for a download that could never fit
+                too_large = self._reserved + needed > self.quota_bytes
+                if excess > 0 and (too_large or self.evict(excess) < excess):
+                    raise InsufficientStorage(
+                        f"Download of {needed} bytes does not fit in the {self.quota_bytes} byte quota"
+                    )
+            ensure_free_space(self.root, self._reserved + needed)
+            self._reserved += needed
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= needed
+
+    def evict(self, needed):
+        """
+        Delete unpinned artifacts until ``needed`` bytes are freed.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        order = "last_access" if self.policy == "lru" else "hits, last_access"
+        freed = 0
+        with self._lock:
+            candidates = self._db.execute(f"SELECT key, path, size FROM artifacts ORDER BY {order}").fetchall()
+            for key, path, size in candidates:
+                if freed >= needed:
+                    break
+                if key in self._pins:
+                    continue
+                self.remove(key)
+                freed += size
+        return freed
+
+    @staticmethod
+    def _delete_files(path, links):
+        for link in links:
+            try:
+                # Leave files that were replaced by something else under the same name
+                if os.path.samefile(link, path):
+                    os.remove(link)
+            except OSError:
+                pass
+        for stale in (path, os.path.splitext(path)[0] + ".json"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
@@ -0,0 +1,257 @@
+"""
+Content-addressed artifact store for the YouTube Downloader.
+Keeps one copy of every finished download and links user-facing names to it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from integrity import file_digest, verify_file
+from storage import StorageManager
+
+class ArtifactStore:
+    """
+    Finished downloads keyed by what produced them.
+
+    An artifact is identified by (video id, itag, format, bitrate), so the
+    same request from any user resolves to the same file. Concurrent
+    requests for an artifact that is still being produced wait for the one
+    producer instead of downloading it again. User-facing filenames are
+    hardlinks (or symlinks, or copies as a last resort) to the stored file.
+
+    Coalescing is per process; two processes racing on the same artifact
+    both download it, and the second commit simply replaces the first.
+    Processes sharing a store, such as workers, each need their own
+    ``owner`` so they do not write to the same staging file.
+
+    Every artifact's metadata records its size and digest. A stored file
+    whose size no longer matches is dropped when it is looked up, so the
+    request downloads it again, and verify() checks the digests too.
+    """
+
+    def __init__(self, root, quota_bytes=None, policy="lru", owner=None):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory holding the objects and staging areas
+            quota_bytes (int): Maximum bytes of stored artifacts, None for no quota
+            policy (str): Eviction order when over quota, 'lru' or 'lfu'
+            owner (str): Name of this process among those sharing the store;
+                keeps its staging files apart from theirs
+        """
+        self.root = root
+        self.owner = owner
+        self.objects_dir = os.path.join(root, "objects")
+        self.staging_dir = os.path.join(root, "staging")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.storage = StorageManager(root, quota_bytes, policy)
+        if self.storage.is_empty():
+            self._index_existing()
+
+    @staticmethod
+    def key(video_id, itag, format_type, bitrate=None, variant=None):
+        """Return the artifact id for a download request; ``variant`` tells apart e.g. clips."""
+        identity = f"{video_id}:{itag}:{format_type}:{bitrate or ''}"
+        if variant:
+            identity += f":{variant}"
+        return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def request_id(video_id, format_type, quality=None, variant=None):
+        """
+        Identify what was asked for, before the stream is known.
+
+        Unlike key(), this needs no metadata, so a repeated request can be
+        answered from the store without contacting YouTube.
+        """
+        return f"{video_id}:{format_type}:{quality or ''}:{variant or ''}"
+
+    def remember(self, request, key):
+        """Answer later identical requests with artifact ``key``; see find()."""
+        self.storage.add_request(request, key)
+
+    def find(self, request):
+        """Return (path, metadata) of the artifact last used for ``request``, or (None, None)."""
+        key = self.storage.find_request(request)
+        if not key:
+            return None, None
+        path, metadata = self.lookup(key)
+        if path:
+            self.storage.touch(key)
+        return path, metadata
+
+    def object_path(self, key, ext):
+        return os.path.join(self.objects_dir, key[:2], f"{key}.{ext}")
+
+    def lookup(self, key):
+        """Return (path, metadata) of a stored artifact, or (None, None) if it is missing or truncated."""
+        try:
+            with open(self._meta_path(key), "r") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        path = self.object_path(key, metadata["ext"])
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None, None
+        if size != metadata.get("size", size):
+            # Files in the user's output directories are not the lookup's to delete
+            self.storage.remove(key, links=False)
+            return None, None
+        return path, metadata
+
+    def claim(self, key):
+        """
+        Find an artifact or become the one producing it.
+
+        Returns:
+            tuple: (path, None) if the artifact exists,
+                   (None, future) if another caller is producing it; the
+                   future resolves to its path,
+                   (None, None) if the caller must produce it and then call
+                   commit() or abort()
+        """
+        with self._lock:
+            path, _ = self.lookup(key)
+            if path:
+                self.storage.touch(key)
+                return path, None
+            if key in self._in_flight:
+                return None, self._in_flight[key]
+            self._in_flight[key] = Future()
+            return None, None
+
+    def staging_path(self, key, ext):
+        """Return a private path where the producer of ``key`` writes its output."""
+        name = f"{key}.{self.owner}.{ext}" if self.owner else f"{key}.{ext}"
+        return os.path.join(self.staging_dir, name)
+
+    def commit(self, key, staged_path, ext, digest=None, **metadata):
+        """
+        Move a produced file into the store and release anyone waiting on it.
+
+        ``digest`` is the file's digest string, if the producer hashed it
+        while writing; otherwise it is computed here.
+        """
+        digest = digest or file_digest(staged_path)
+        path = self.object_path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged_path, path)
+
+        metadata.update(key=key, ext=ext, size=os.path.getsize(path), digest=digest, created_at=time.time())
+        temp_path = self._meta_path(key) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(metadata, f)
+        os.replace(temp_path, self._meta_path(key))
+        self.storage.register(key, path, metadata["size"])
+
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future:
+            future.set_result(path)
+        return path
+
+    def abort(self, key, error):
+        """Give up producing ``key`` and pass the error to anyone waiting on it."""
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future:
+            future.set_exception(error)
+
+    def reserve(self, needed):
+        """Context manager holding room for a download of ``needed`` bytes; see StorageManager.reserve."""
+        return self.storage.reserve(needed)
+
+    def pinned(self, key):
+        """Context manager that keeps ``key`` from being evicted, e.g. while it is served."""
+        return self.storage.pinned(key)
+
+    def link(self, path, user_path, key=None):
+        """
+        Expose a stored artifact under a user-facing name.
+
+        Tries a hardlink, then a symlink, then a copy, and replaces any file
+        already at ``user_path``. Links of a known ``key`` are removed when
+        the artifact is evicted.
+        """
+        if os.path.abspath(path) == os.path.abspath(user_path):
+            return user_path
+        # Renaming a hardlink over another link to the same file is a no-op
+        # that would leave the temporary link behind
+        if os.path.exists(user_path) and os.path.samefile(path, user_path):
+            if key:
+                self.storage.add_link(key, user_path)
+            return user_path
+        os.makedirs(os.path.dirname(os.path.abspath(user_path)), exist_ok=True)
+        temp_path = f"{user_path}.link-{threading.get_ident()}"
+        try:
+            os.link(path, temp_path)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(path), temp_path)
+            except OSError:
+                shutil.copy2(path, temp_path)
+        os.replace(temp_path, user_path)
+        if key:
+            self.storage.add_link(key, user_path)
+        return user_path
+
+    def verify(self):
+        """
+        Check every stored artifact against the size and digest recorded when it was committed.
+
+        Damaged artifacts are deleted together with their links, so the next
+        request for one downloads it again. Artifacts committed before
+        digests were recorded get theirs now.
+
+        Yields:
+            tuple: (key, path, problem) per artifact, where problem says what
+                   is wrong, or is None if the artifact is intact
+        """
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in sorted(filenames):
+                if not filename.endswith(".json"):
+                    continue
+                key = filename[:-len(".json")]
+                try:
+                    with open(self._meta_path(key), "r") as f:
+                        metadata = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                path = self.object_path(key, metadata["ext"])
+                problem = verify_file(path, metadata.get("size"), metadata.get("digest"))
+                if problem:
+                    self.storage.remove(key)
+                elif not metadata.get("digest"):
+                    metadata["digest"] = file_digest(path)
+                    self._write_metadata(key, metadata)
+                yield key, path, problem
+
+    def _write_metadata(self, key, metadata):
+        temp_path = self._meta_path(key) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(metadata, f)
+        os.replace(temp_path, self._meta_path(key))
+
+    def _index_existing(self):
+        """Register artifacts already on disk, e.g. from before the index existed."""
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                key = filename[:-len(".json")]
+                path, metadata = self.lookup(key)
+                if path:
+                    self.storage.register(key, path, os.path.getsize(path))
+
+    def _meta_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], f"{key}.json")
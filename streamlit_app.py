@@ -1,7 +1,20 @@
 import streamlit as st
 import os
-from downloader import YouTubeDownloader
-from utils import validate_url, create_output_dir, get_human_readable_size
+import time
+from connections import install_pytube
+from jobqueue import open_queue
+from jobs import DONE, FAILED, QUEUED, JobManager, JobQueueFull, QueuedJobManager
+from progress import BYTES, ProgressEvent, format_transfer
+from store import ArtifactStore
+from utils import validate_url, create_output_dir, get_human_readable_size, parse_timestamp
+
+# Seconds between refreshes of the job list while it is shown
+REFRESH_SECONDS = 1.0
+# Number of recent jobs listed
+HISTORY_LIMIT = 20
+
+# Fragments refresh just the job list (Streamlit 1.33+); older versions rerun the page
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
 
 # Page config
 st.set_page_config(
@@ -47,16 +60,69 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Create downloads directory
-DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
+DOWNLOAD_DIR = os.environ.get('DOWNLOAD_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
 create_output_dir(DOWNLOAD_DIR)
+install_pytube()
+
+@st.cache_resource
+def get_artifact_store():
+    """Share one artifact store across sessions so identical downloads coalesce."""
+    quota_mb = os.environ.get('DOWNLOAD_QUOTA_MB')
+    return ArtifactStore(
+        os.path.join(DOWNLOAD_DIR, '.store'),
+        quota_bytes=int(quota_mb) * 1024 * 1024 if quota_mb else None,
+        policy=os.environ.get('DOWNLOAD_EVICTION_POLICY', 'lru')
+    )
+
+@st.cache_resource
+def get_job_manager():
+    """
+    Run downloads for all sessions on one background executor.
+
+    Submitting returns at once, so a download never holds up a script run
+    and sessions do not wait for each other. With JOB_QUEUE set, jobs go to
+    the shared queue of `python -m worker` processes instead, as in app.py.
+    """
+    job_queue = os.environ.get('JOB_QUEUE')
+    if job_queue:
+        return QueuedJobManager(open_queue(job_queue))
+    return JobManager(
+        DOWNLOAD_DIR,
+        max_workers=int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', 4)),
+        store=get_artifact_store()
+    )
+
+def render_jobs():
+    """
+    Show the most recent jobs of all sessions with their progress.
+
+    Returns:
+        bool: True if some job is still queued or running
+    """
+    jobs = sorted(get_job_manager().list_jobs(), key=lambda job: job.created_at, reverse=True)[:HISTORY_LIMIT]
+    if not jobs:
+        return False
+    st.markdown("### 📋 Downloads")
+    for job in jobs:
+        label = f"{job.format_type.upper()} {job.quality or ''} · {job.url[:50]}"
+        if job.start is not None or job.end is not None:
+            label += f" · clip {job.start or 0:g}-{'end' if job.end is None else f'{job.end:g}'}s"
+        if job.state == DONE:
+            size = f" ({get_human_readable_size(job.total_bytes)})" if job.total_bytes else ""
+            st.success(f"✅ {label}{size}")
+        elif job.state == FAILED:
+            st.error(f"❌ {label}: {job.error or 'Download failed'}")
+        elif job.state == QUEUED:
+            st.info(f"⏳ {label}: waiting")
+        else:
+            event = ProgressEvent(job.id, BYTES, job.bytes_done, job.total_bytes, job.speed, job.eta, job.stage)
+            stage = job.stage or "starting"
+            st.progress(event.fraction or 0.0, text=f"{label}: {stage}, {format_transfer(event)}")
+    return any(not job.finished for job in jobs)
 
 # Header
 st.markdown('<div class="download-header"><h1>📥 YouTube Downloader</h1></div>', unsafe_allow_html=True)
 
-# Initialize session state for download history
-if 'download_history' not in st.session_state:
-    st.session_state.download_history = []
-
 # Main form
 with st.form("download_form"):
     url = st.text_input("YouTube URL", placeholder="https://www.youtube.com/watch?v=...")
@@ -77,6 +143,14 @@ with st.form("download_form"):
             index=1
         )
     
+    col3, col4 = st.columns(2)
+    
+    with col3:
+        clip_start = st.text_input("Clip start (optional)", placeholder="e.g. 1:30")
+    
+    with col4:
+        clip_end = st.text_input("Clip end (optional)", placeholder="e.g. 2:00")
+    
     submit_button = st.form_submit_button("Download")
 
 if submit_button:
@@ -86,37 +160,24 @@ if submit_button:
         st.error("Please enter a valid YouTube URL")
     else:
         try:
-            with st.spinner("Downloading..."):
-                downloader = YouTubeDownloader(
-                    url=url,
-                    format_type=format_type.lower(),
-                    output_dir=DOWNLOAD_DIR,
-                    quality=quality.lower()
-                )
-                
-                success = downloader.download()
-                
-                if success:
-                    # Add to download history
-                    st.session_state.download_history.insert(0, {
-                        'url': url,
-                        'format': format_type,
-                        'quality': quality
-                    })
-                    st.markdown('<div class="success-message">✅ Download completed successfully!</div>', unsafe_allow_html=True)
-                else:
-                    st.markdown('<div class="error-message">❌ Download failed!</div>', unsafe_allow_html=True)
+            start = parse_timestamp(clip_start.strip())
+            end = parse_timestamp(clip_end.strip())
+            if start is not None and end is not None and end <= start:
+                raise ValueError("Clip end must be after its start")
+            get_job_manager().submit(url, format_type.lower(), quality.lower(), start, end)
+            st.markdown('<div class="success-message">✅ Download queued! Progress is shown below.</div>', unsafe_allow_html=True)
         
+        except JobQueueFull as e:
+            st.markdown(f'<div class="error-message">❌ Server busy: {str(e)}</div>', unsafe_allow_html=True)
         except Exception as e:
             st.markdown(f'<div class="error-message">❌ Error: {str(e)}</div>', unsafe_allow_html=True)
 
-# Download History
-if st.session_state.download_history:
-    st.markdown("### 📋 Download History")
-    for item in st.session_state.download_history:
-        with st.expander(f"📥 {item['url'][:50]}..."):
-            st.write(f"Format: {item['format']}")
-            st.write(f"Quality: {item['quality']}")
+# Download History, shared by all sessions and refreshed while jobs run
+if fragment:
+    fragment(run_every=REFRESH_SECONDS)(render_jobs)()
+    jobs_active = False
+else:
+    jobs_active = render_jobs()
 
 # Instructions
 with st.expander("ℹ️ How to use"):
@@ -125,11 +186,16 @@ with st.expander("ℹ️ How to use"):
     2. Select your preferred format (MP4 for video, MP3 for audio)
     3. Choose the quality level
     4. Click the Download button
-    5. Wait for the download to complete
+    5. Follow the download's progress in the list; you can queue more meanwhile
     
     **Note:** Downloads are saved in the 'downloads' folder
     """)
 
 # Footer
 st.markdown("---")
-st.markdown("Made with ❤️ using Streamlit and Python")
\ No newline at end of file
+st.markdown("Made with ❤️ using Streamlit and Python")
+
+# Without fragments, poll by rerunning the page; any interaction interrupts the wait
+if jobs_active:
+    time.sleep(REFRESH_SECONDS)
+    st.rerun()
\ No newline at end of file
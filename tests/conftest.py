@@ -0,0 +1,33 @@
+"""
+Shared fixtures for the YouTube Downloader tests.
+Downloads run against the local fake YouTube of the benchmarks, never the network.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Keep the metadata cache and daemon socket of the tests out of the user's home
+os.environ.setdefault("YTDOWN_CACHE_DIR", tempfile.mkdtemp(prefix="ytdown-tests-"))
+
+import pytest
+import metadata
+from benchmarks.fake_youtube import FakeYouTube, FakeYouTubeClient
+
+@pytest.fixture
+def youtube(tmp_path, monkeypatch):
+    """A fake YouTube with two 5 second videos that metadata resolution is pointed at."""
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    with FakeYouTube(str(media_dir), videos=2, length=5) as server:
+        monkeypatch.setattr(FakeYouTubeClient, "base_url", server.url("").rstrip("/"))
+        monkeypatch.setattr(metadata, "YouTube", FakeYouTubeClient)
+        yield server
+
+@pytest.fixture
+def output_dir(tmp_path):
+    path = tmp_path / "out"
+    path.mkdir()
+    return str(path)
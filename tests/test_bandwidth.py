@@ -0,0 +1,100 @@
+"""Tests of the bandwidth governor, on a clock the tests move by hand."""
+
+import types
+import pytest
+import bandwidth
+from bandwidth import BATCH, BURST_SECONDS, INTERACTIVE, BandwidthGovernor, _fair_shares
+
+class Clock:
+    """Stands in for time.monotonic; waiting on the governor moves it instead of sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class Condition:
+    def __init__(self, lock, clock):
+        self._lock = lock
+        self._clock = clock
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+    def wait(self, timeout):
+        # A real wait always takes a little time, even for a rounding error's worth of tokens
+        self._clock.now += max(timeout, 1e-6)
+
+    def notify_all(self):
+        pass
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(bandwidth, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+def make_governor(clock, rate=None):
+    governor = BandwidthGovernor(rate)
+    governor._changed = Condition(governor._lock, clock)
+    return governor
+
+def read(share, total, chunk=100):
+    for _ in range(total // chunk):
+        share.consume(chunk)
+
+def test_reading_takes_as_long_as_the_rate_allows(clock):
+    share = make_governor(clock, rate=1000).register("job")
+    started = clock.now
+    read(share, 5000)
+    assert clock.now - started == pytest.approx(5.0)
+    assert share.throttled_seconds == pytest.approx(5.0)
+
+def test_burst_after_a_pause_is_bounded(clock):
+    share = make_governor(clock, rate=1000).register("job")
+    read(share, 1000)
+    clock.now += 10
+    started = clock.now
+    # A pause earns at most BURST_SECONDS of the rate, however long it was
+    read(share, int(1000 * BURST_SECONDS), chunk=50)
+    assert clock.now == started
+    read(share, 500)
+    assert clock.now - started == pytest.approx(0.5)
+
+def test_per_download_cap_without_a_global_rate(clock):
+    share = make_governor(clock).register("job", rate_limit=200)
+    started = clock.now
+    read(share, 1000)
+    assert clock.now - started == pytest.approx(5.0)
+
+def test_interactive_downloads_get_the_larger_part(clock):
+    governor = make_governor(clock, rate=5000)
+    interactive = governor.register("watch", INTERACTIVE)
+    batch = governor.register("batch", BATCH)
+    interactive.consume(1)
+    batch.consume(1)
+    assert interactive.rate == pytest.approx(4000)
+    assert batch.rate == pytest.approx(1000)
+
+    # A capped download leaves the rest of its part to the others
+    interactive.set_rate_limit(500)
+    assert interactive.rate == pytest.approx(500)
+    assert batch.rate == pytest.approx(4500)
+
+def test_closed_share_gives_its_rate_back(clock):
+    governor = make_governor(clock, rate=3000)
+    first, second = governor.register("a"), governor.register("b")
+    first.consume(1)
+    second.consume(1)
+    assert first.rate == pytest.approx(1500)
+    second.close()
+    assert first.rate == pytest.approx(3000)
+
+def test_fair_shares_are_max_min_fair():
+    assert _fair_shares(10, {"a": 2, "b": None, "c": None}) == {"a": 2, "b": 4, "c": 4}
+    assert _fair_shares(10, {"a": None, "b": None}, {"a": 4}) == {"a": 8, "b": 2}
+    assert _fair_shares(10, {"a": 3, "b": 3}) == {"a": 3, "b": 3}
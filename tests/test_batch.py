@@ -0,0 +1,56 @@
+"""Tests of the batch scheduler against the fake YouTube."""
+
+import threading
+import time
+from batch import print_batch_summary, run_batch
+from journal import BatchJournal
+
+def test_batch_counts_outcomes_without_keeping_them(youtube, output_dir, capsys):
+    urls = [youtube.watch_url(video_id) for video_id in youtube.video_ids]
+    urls.append(youtube.watch_url("missing0000"))
+    seen = []
+
+    summary, wall_time, stage_stats = run_batch(
+        urls, "mp4", output_dir, "medium", jobs=2, journal=None, on_result=seen.append,
+        cache=False, bandwidth=False
+    )
+    assert (summary.succeeded, summary.skipped, summary.total) == (2, 0, 3)
+    assert [result.url for result in summary.failed] == [urls[2]]
+    assert summary.bytes > 0
+    assert sorted(result.index for result in seen) == [0, 1, 2]
+
+    print_batch_summary(summary, wall_time, stage_stats)
+    output = capsys.readouterr().out
+    assert "Succeeded: 2" in output and "Failed: 1" in output
+
+def test_journaled_videos_are_skipped_on_a_rerun(youtube, output_dir):
+    urls = [youtube.watch_url(video_id) for video_id in youtube.video_ids]
+    options = dict(jobs=2, journal=BatchJournal(output_dir), cache=False, bandwidth=False)
+    run_batch(urls, "mp4", output_dir, "medium", **options)
+
+    summary, _, _ = run_batch(urls, "mp4", output_dir, "medium", **options)
+    assert (summary.succeeded, summary.skipped, summary.failed) == (0, 2, [])
+
+def test_no_more_than_jobs_downloads_run_at_once(output_dir, monkeypatch):
+    import batch
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def fake_job(index, total, url, *args):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        result = batch.BatchResult(index, url)
+        result.success = True
+        return result
+
+    monkeypatch.setattr(batch, "_run_job", fake_job)
+    urls = [f"https://www.youtube.com/watch?v=video{index:06d}" for index in range(12)]
+    summary, _, stage_stats = run_batch(urls, "mp4", output_dir, "medium", jobs=3, prefetch=0, journal=None,
+                                        cache=False, bandwidth=False)
+    assert summary.succeeded == 12
+    assert running[1] == 3
+    assert stage_stats[0]["workers"] == 3
@@ -0,0 +1,123 @@
+"""Tests of clip planning on synthetic fragmented MP4 and WebM streams."""
+
+import struct
+import pytest
+from benchmarks.server import FileServer
+from clip import ClipError, plan_clip
+
+FRAGMENT = 1000
+CLUSTER = 500
+
+def box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+def fragmented_mp4(durations):
+    """An ftyp and moov followed by a sidx indexing one fragment per duration, in milliseconds."""
+    header = box(b"ftyp", b"isom" + bytes(4)) + box(b"moov", bytes(24))
+    references = b"".join(struct.pack(">III", FRAGMENT, duration, 0x90000000) for duration in durations)
+    sidx = box(b"sidx", struct.pack(">BxxxIIIIHH", 0, 1, 1000, 0, 0, 0, len(durations)) + references)
+    fragments = b"".join(bytes([index]) * FRAGMENT for index in range(len(durations)))
+    return header, sidx, header + sidx + fragments
+
+def element(element_id, payload):
+    return element_id + b"\x01" + len(payload).to_bytes(7, "big") + payload
+
+def uint(element_id, value):
+    return element(element_id, value.to_bytes(4, "big"))
+
+def cues(positions, times):
+    return element(b"\x1c\x53\xbb\x6b", b"".join(
+        element(b"\xbb", uint(b"\xb3", time) + element(b"\xb7", uint(b"\xf7", 1) + uint(b"\xf1", position)))
+        for time, position in zip(times, positions)
+    ))
+
+def seek_head(cues_position):
+    seek = element(b"\x53\xab", b"\x1c\x53\xbb\x6b") + uint(b"\x53\xac", cues_position)
+    return element(b"\x11\x4d\x9b\x74", element(b"\x4d\xbb", seek))
+
+def webm(times, cues_first):
+    """
+    An EBML header and a Segment with Info, Cues and one cluster per time, in milliseconds.
+
+    Returns (offset of the Cues, offsets of the clusters, stream). Cues placed
+    after the clusters are found through a SeekHead.
+    """
+    info = element(b"\x15\x49\xa9\x66", uint(b"\x2a\xd7\xb1", 1000000))
+    clusters = [element(b"\x1f\x43\xb6\x75", bytes([index]) * CLUSTER) for index in range(len(times))]
+    cues_size = len(cues([0] * len(times), times))
+    # Offsets within the Segment's data, which is what Cues and SeekHead record
+    before = info if cues_first else seek_head(0) + info
+    first_cluster = len(before) + (cues_size if cues_first else 0)
+    positions = [first_cluster + sum(len(cluster) for cluster in clusters[:index]) for index in range(len(times))]
+    index = cues(positions, times)
+    if cues_first:
+        cues_position = len(before)
+        body = before + index + b"".join(clusters)
+    else:
+        cues_position = first_cluster + sum(len(cluster) for cluster in clusters)
+        body = seek_head(cues_position) + info + b"".join(clusters) + index
+    ebml = element(b"\x1a\x45\xdf\xa3", uint(b"\x42\x86", 1))
+    segment_start = len(ebml) + 12
+    data = ebml + element(b"\x18\x53\x80\x67", body)
+    return segment_start + cues_position, [segment_start + position for position in positions], data
+
+@pytest.fixture
+def serve(tmp_path):
+    """Serve bytes as a stream, returning its URL."""
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    with FileServer(str(media_dir)) as server:
+        def serve(data):
+            (media_dir / "stream").write_bytes(data)
+            return server.url("stream")
+        yield serve
+
+def test_sidx_window_inside_fragments(serve):
+    header, sidx, data = fragmented_mp4([2000, 2000, 2000, 2000])
+    first = len(header) + len(sidx)
+    plan = plan_clip(serve(data), 137, 3.0, 5.0, len(data))
+    assert plan.container == "fmp4"
+    assert plan.start_time == 2.0
+    assert plan.ranges == [(0, len(header)), (first + FRAGMENT, first + 3 * FRAGMENT)]
+
+def test_sidx_window_on_fragment_boundaries(serve):
+    header, sidx, data = fragmented_mp4([2000, 2000, 2000, 2000])
+    first = len(header) + len(sidx)
+    url = serve(data)
+    # The end is exclusive: a window ending where a fragment starts leaves it out
+    assert plan_clip(url, 137, 2.0, 4.0, len(data)).ranges[-1] == (first + FRAGMENT, first + 2 * FRAGMENT)
+    assert plan_clip(url, 137, 0.0, 0.5, len(data)).ranges[-1] == (first, first + FRAGMENT)
+    # No end runs to the last byte of the last fragment
+    plan = plan_clip(url, 137, 7.0, None, len(data))
+    assert plan.start_time == 6.0
+    assert plan.ranges[-1] == (first + 3 * FRAGMENT, len(data))
+
+def test_fetched_clip_is_the_header_and_the_fragments(serve, tmp_path):
+    header, sidx, data = fragmented_mp4([2000, 2000, 2000])
+    first = len(header) + len(sidx)
+    url = serve(data)
+    plan = plan_clip(url, 137, 2.5, 3.0, len(data))
+    path = plan.fetch(url, str(tmp_path / "clip.mp4"))
+    with open(path, "rb") as f:
+        assert f.read() == header + data[first + FRAGMENT:first + 2 * FRAGMENT]
+    assert plan.filesize == len(header) + FRAGMENT
+
+def test_webm_cues_before_the_clusters(serve):
+    cues_start, clusters, data = webm([0, 5000, 10000], cues_first=True)
+    plan = plan_clip(serve(data), 248, 6.0, 9.0, len(data))
+    assert plan.container == "webm"
+    assert plan.start_time == 5.0
+    # The Cues sit between the Info and the first cluster and are left out
+    assert plan.ranges == [(0, cues_start), (clusters[1], clusters[2])]
+
+def test_webm_cues_after_the_clusters(serve):
+    cues_start, clusters, data = webm([0, 5000, 10000], cues_first=False)
+    plan = plan_clip(serve(data), 248, 10.0, None, len(data))
+    assert plan.start_time == 10.0
+    # The last cluster ends where the Cues start, not at the end of the file
+    assert plan.ranges == [(0, clusters[0]), (clusters[2], cues_start)]
+
+def test_stream_without_an_index(serve):
+    data = box(b"ftyp", b"isom" + bytes(4)) + box(b"free", bytes(64))
+    with pytest.raises(ClipError):
+        plan_clip(serve(data), 137, 0.0, 1.0, len(data))
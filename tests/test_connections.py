@@ -0,0 +1,111 @@
+"""Tests of the keep-alive connection pool."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import connections
+from benchmarks.server import FileServer
+from connections import ConnectionPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class OneShotHandler(BaseHTTPRequestHandler):
+    """Answers as if keeping the connection alive, then closes it, like a server whose idle timeout just ran out."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._answer()
+
+    def _answer(self):
+        OneShotHandler.requests.append(self.command)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+        self.close_connection = True
+
+@pytest.fixture
+def one_shot_server(monkeypatch):
+    OneShotHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OneShotHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # Reuse the closed connection as if the close had not arrived yet
+    monkeypatch.setattr(connections, "_closed_by_peer", lambda conn: False)
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def file_server(tmp_path):
+    (tmp_path / "big.bin").write_bytes(b"x" * (1024 * 1024))
+    (tmp_path / "small.txt").write_bytes(b"hello")
+    with FileServer(str(tmp_path)) as server:
+        yield server
+
+def test_connection_is_reused(file_server):
+    pool = ConnectionPool()
+    for _ in range(3):
+        with pool.urlopen(file_server.url("small.txt")) as response:
+            assert response.read() == b"hello"
+    stats = pool.stats()
+    assert (stats["opened"], stats["reused"]) == (1, 2)
+
+def test_exhausted_pool_times_out(file_server):
+    pool = ConnectionPool(max_per_host=1)
+    held = pool.urlopen(file_server.url("big.bin"))
+    started = time.monotonic()
+    with pytest.raises(urllib.error.URLError, match="connection pool exhausted"):
+        pool.urlopen(file_server.url("small.txt"), timeout=0.3)
+    assert time.monotonic() - started < 5
+    held.close()
+    with pool.urlopen(file_server.url("small.txt"), timeout=5) as response:
+        assert response.read() == b"hello"
+
+def test_waiting_request_gets_freed_connection(file_server):
+    pool = ConnectionPool(max_per_host=1)
+    held = pool.urlopen(file_server.url("big.bin"))
+    threading.Timer(0.2, held.close).start()
+    with pool.urlopen(file_server.url("small.txt"), timeout=5) as response:
+        assert response.read() == b"hello"
+    assert pool.stats()["waits"] == 1
+
+def test_get_is_retried_on_stale_connection(one_shot_server):
+    pool = ConnectionPool()
+    assert pool.urlopen(one_shot_server).read() == b"ok"
+    assert pool.urlopen(one_shot_server).read() == b"ok"
+    assert pool.stats()["retries"] == 1
+    assert OneShotHandler.requests == ["GET", "GET"]
+
+def test_post_is_not_sent_twice(one_shot_server):
+    pool = ConnectionPool()
+    assert pool.urlopen(one_shot_server, data=b"a=1").read() == b"ok"
+    with pytest.raises(urllib.error.URLError):
+        pool.urlopen(one_shot_server, data=b"a=2")
+    assert pool.stats()["retries"] == 0
+    assert OneShotHandler.requests == ["POST"]
+
+def test_importing_metadata_leaves_pytube_alone():
+    # In a fresh process, as an earlier test may have installed the pool
+    check = (
+        "import pytube.request, metadata, downloader, connections; "
+        "assert pytube.request.urlopen is not connections.urlopen; "
+        "connections.install_pytube(); "
+        "assert pytube.request.urlopen is connections.urlopen"
+    )
+    subprocess.run([sys.executable, "-c", check], cwd=ROOT, check=True)
@@ -0,0 +1,88 @@
+"""Tests of running commands on the warm daemon over a Unix socket."""
+
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import pytest
+from daemon import DaemonUnavailable, serve, submit
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to about 100 bytes, too few for pytest's tmp_path
+    directory = tempfile.mkdtemp(prefix="ytd")
+    yield os.path.join(directory, "ytdl.sock")
+    shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture
+def daemon(socket_path):
+    """Start a daemon running the handler it is given, returning its socket path."""
+    def start(handler):
+        threading.Thread(target=serve, args=(socket_path, handler), daemon=True).start()
+        deadline = time.monotonic() + 5
+        while True:
+            # An empty request is read as no command and dropped
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                    return socket_path
+                except OSError:
+                    assert time.monotonic() < deadline, "daemon did not start"
+            time.sleep(0.01)
+    return start
+
+def test_output_and_exit_status_reach_the_client(daemon):
+    def handler(options):
+        print(f"Downloading {options['url']}")
+        raise SystemExit(3)
+    output = io.StringIO()
+    assert submit(daemon(handler), {"url": "abc"}, output=output) == 3
+    assert output.getvalue() == "Downloading abc\n"
+
+def test_commands_run_one_after_another_in_one_process(daemon):
+    calls = []
+    path = daemon(calls.append)
+    for number in range(3):
+        assert submit(path, {"n": number}, output=io.StringIO()) == 0
+    assert calls == [{"n": 0}, {"n": 1}, {"n": 2}]
+
+def test_failing_command_exits_one(daemon):
+    def handler(options):
+        raise RuntimeError("boom")
+    output = io.StringIO()
+    assert submit(daemon(handler), {}, output=output) == 1
+    assert "boom" in output.getvalue()
+
+def test_command_runs_in_the_client_directory(daemon, tmp_path):
+    seen = []
+    path = daemon(lambda options: seen.append(os.getcwd()))
+    cwd = os.getcwd()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(json.dumps({"cwd": str(tmp_path), "options": {}}).encode() + b"\n")
+        assert json.loads(conn.makefile("rb").readline()) == {"exit": 0}
+    assert seen == [str(tmp_path)]
+    # The daemon goes back to its own directory between commands
+    assert os.getcwd() == cwd
+
+def test_no_daemon_is_unavailable(socket_path):
+    with pytest.raises(DaemonUnavailable):
+        submit(socket_path, {})
+
+def test_stale_socket_is_replaced(daemon, socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    path = daemon(lambda options: print("fresh"))
+    output = io.StringIO()
+    assert submit(path, {}, output=output) == 0
+    assert output.getvalue() == "fresh\n"
+
+def test_second_daemon_on_a_live_socket_refuses(daemon):
+    path = daemon(lambda options: None)
+    with pytest.raises(OSError, match="already listening"):
+        serve(path, lambda options: None)
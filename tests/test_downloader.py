@@ -0,0 +1,96 @@
+"""Tests of YouTubeDownloader against the fake YouTube."""
+
+import os
+import threading
+import downloader
+from downloader import YouTubeDownloader
+from progress import ProgressBus
+from store import ArtifactStore
+
+def make_downloader(youtube, output_dir, video=0, **options):
+    options.setdefault("cache", False)
+    options.setdefault("bandwidth", False)
+    options.setdefault("progress", ProgressBus())
+    return YouTubeDownloader(youtube.watch_url(youtube.video_ids[video]), "mp4", output_dir, "medium", **options)
+
+def transferred(counter):
+    return sum(item["value"] for item in counter.to_dict())
+
+def test_failed_commit_releases_waiters(youtube, output_dir, tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "store"))
+
+    def failing_digest(path, algorithm=None):
+        raise OSError("disk went away")
+
+    # Drop the digest hashed during the download so commit has to hash the file
+    stream_done = YouTubeDownloader._stream_done
+
+    def forget_digest(self, stream, file_path, digest, announce):
+        result = stream_done(self, stream, file_path, digest, announce)
+        self.digests.pop(file_path, None)
+        return result
+
+    monkeypatch.setattr(downloader, "file_digest", failing_digest)
+    monkeypatch.setattr(YouTubeDownloader, "_stream_done", forget_digest)
+    first = make_downloader(youtube, output_dir, store=store)
+    assert not first.download()
+    assert "disk went away" in first.error
+
+    path, in_flight = store.claim(first.artifact_key)
+    assert path is None
+    assert in_flight is None, "the failed producer left its claim unresolved"
+    store.abort(first.artifact_key, RuntimeError("test done"))
+
+def test_identical_download_after_failed_commit_completes(youtube, output_dir, tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "store"))
+
+    def full_disk(*args, **kwargs):
+        raise OSError("no space left")
+
+    store.commit = full_disk
+    assert not make_downloader(youtube, output_dir, store=store).download()
+    del store.commit
+
+    second = make_downloader(youtube, output_dir, store=store)
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (second.download(), done.set()), daemon=True)
+    thread.start()
+    assert done.wait(30), "an identical download hung on the failed claim"
+    assert second.output_file
+
+def test_resumed_download_counts_only_fetched_bytes(youtube, output_dir):
+    from metrics import TRANSFERRED_BYTES
+    from transfer import PartialDownload
+    first = make_downloader(youtube, output_dir)
+    assert first.download()
+    size = os.path.getsize(first.output_file)
+    stream = first.plan.streams[0]
+
+    # Turn the finished file back into a partial with its first half saved
+    os.rename(first.output_file, first.output_file + ".part")
+    partial = PartialDownload(first.output_file, stream.itag, size)
+    partial.ranges = [[0, size - 1, size // 2]]
+    partial.save(force=True)
+
+    before = transferred(TRANSFERRED_BYTES)
+    second = make_downloader(youtube, output_dir)
+    assert second.download()
+    assert transferred(TRANSFERRED_BYTES) - before == size - size // 2
+
+def test_failed_fallback_keeps_the_partial_download(youtube, output_dir, monkeypatch):
+    from transfer import TransferError
+
+    def no_ranges(url, file_path, total_size, itag, *args, **kwargs):
+        with open(file_path + ".part", "wb") as f:
+            f.write(b"x" * 1024)
+        raise TransferError("server ignored the range")
+
+    def dropped(*args, **kwargs):
+        raise OSError("connection reset")
+
+    monkeypatch.setattr(downloader, "download_resumable", no_ranges)
+    monkeypatch.setattr(downloader, "download_single", dropped)
+    first = make_downloader(youtube, output_dir)
+    assert not first.download()
+    part_files = [name for name in os.listdir(output_dir) if name.endswith(".part")]
+    assert part_files, "the fallback deleted the partial download"
@@ -0,0 +1,67 @@
+"""Tests of batch file ingestion."""
+
+import random
+import string
+from ingest import BatchFile, pack_video_id
+
+ID_CHARACTERS = string.ascii_letters + string.digits + "-_"
+
+def test_packing_is_one_to_one():
+    rng = random.Random(25)
+    ids = {"".join(rng.choice(ID_CHARACTERS) for _ in range(10)) + rng.choice("AEIMQUYcgkosw048")
+           for _ in range(10000)}
+    packed = {pack_video_id(video_id) for video_id in ids}
+    assert len(packed) == len(ids)
+    assert all(isinstance(value, int) and 0 <= value < 2 ** 64 for value in packed)
+
+def test_lowest_and_highest_ids():
+    assert pack_video_id("AAAAAAAAAAA") == 0
+    assert pack_video_id("___________") == "___________"
+    assert pack_video_id("__________8") == 2 ** 64 - 1
+
+def test_strings_that_are_not_ids_pass_through():
+    for value in ("AAAAAAAAAAB", "short", "aaaaaaaaaaé", "aaaaaaaaa.A"):
+        assert pack_video_id(value) == value
+
+def batch(tmp_path, lines, **options):
+    path = tmp_path / "urls.txt"
+    path.write_text("\n".join(lines) + "\n")
+    return BatchFile(str(path), **options)
+
+def test_variants_of_a_video_become_one_canonical_job(tmp_path):
+    urls = batch(tmp_path, [
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10",
+        "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+        "www.youtube.com/embed/dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=abcdefghijk&list=PL1",
+    ])
+    assert list(urls) == [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=abcdefghijk",
+    ]
+    assert (urls.lines, urls.jobs, urls.duplicates, urls.invalid) == (5, 2, 3, 0)
+
+def test_collections_pass_through_once(tmp_path):
+    urls = batch(tmp_path, [
+        "https://www.youtube.com/playlist?list=PL123",
+        "https://www.youtube.com/channel/UC123",
+        "https://www.youtube.com/playlist?list=PL123",
+    ])
+    assert list(urls) == ["https://www.youtube.com/playlist?list=PL123", "https://www.youtube.com/channel/UC123"]
+    assert urls.duplicates == 1
+
+def test_comments_blank_and_invalid_lines(tmp_path, capsys):
+    urls = batch(tmp_path, ["# my videos", "", "https://example.com/video", "not a url", "https://youtu.be/dQw4w9WgXcQ"],
+                 max_reported=1)
+    assert list(urls) == ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"]
+    assert (urls.lines, urls.jobs, urls.invalid) == (5, 1, 2)
+    output = capsys.readouterr().out
+    assert "Line 3:" in output and "Line 4:" not in output
+    assert "only counted" in output
+
+def test_iterating_again_starts_over(tmp_path):
+    urls = batch(tmp_path, ["https://youtu.be/dQw4w9WgXcQ", "https://youtu.be/dQw4w9WgXcQ"])
+    assert len(list(urls)) == 1
+    assert len(list(urls)) == 1
+    assert (urls.jobs, urls.duplicates) == (1, 1)
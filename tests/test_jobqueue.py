@@ -0,0 +1,67 @@
+"""Tests of the shared job queue."""
+
+import time
+from jobqueue import SQLiteJobQueue
+from jobs import DONE, FAILED, QUEUED, RUNNING, Job
+
+def make_queue(tmp_path, **options):
+    return SQLiteJobQueue(str(tmp_path / "queue.db"), **options)
+
+def test_jobs_are_claimed_oldest_first_and_once(tmp_path):
+    queue = make_queue(tmp_path)
+    first, second = Job("https://youtu.be/aaaaaaaaaaa", "mp4", None), Job("https://youtu.be/bbbbbbbbbbb", "mp4", None)
+    second.created_at = first.created_at + 1
+    queue.put(second)
+    queue.put(first)
+
+    assert queue.claim("worker-1", lease=60).id == first.id
+    assert queue.claim("worker-2", lease=60).id == second.id
+    assert queue.claim("worker-3", lease=60) is None
+
+def test_expired_lease_is_requeued_for_another_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    job = Job("https://youtu.be/aaaaaaaaaaa", "mp4", None)
+    queue.put(job)
+    assert queue.claim("worker-1", lease=0.05).state == RUNNING
+    time.sleep(0.1)
+
+    claimed = queue.claim("worker-2", lease=60)
+    assert claimed.id == job.id
+    # The first worker lost the job and can no longer touch it
+    assert queue.heartbeat(job.id, "worker-1", 60) is None
+    assert not queue.update(job.id, "worker-1", state=DONE)
+    assert queue.update(job.id, "worker-2", state=DONE)
+    assert queue.get(job.id).state == DONE
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = make_queue(tmp_path)
+    job = Job("https://youtu.be/aaaaaaaaaaa", "mp4", None)
+    queue.put(job)
+    queue.claim("worker-1", lease=0.05)
+    assert queue.heartbeat(job.id, "worker-1", 60)
+    time.sleep(0.1)
+    assert queue.claim("worker-2", lease=60) is None
+
+def test_job_whose_workers_keep_disappearing_fails(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    job = Job("https://youtu.be/aaaaaaaaaaa", "mp4", None)
+    queue.put(job)
+    for worker in ("worker-1", "worker-2"):
+        assert queue.claim(worker, lease=0.01).id == job.id
+        time.sleep(0.05)
+
+    assert queue.claim("worker-3", lease=60) is None
+    assert queue.get(job.id).state == FAILED
+
+def test_released_job_does_not_count_as_an_attempt(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    job = Job("https://youtu.be/aaaaaaaaaaa", "mp4", None)
+    queue.put(job)
+    queue.claim("worker-1", lease=60)
+    queue.release(job.id, "worker-1")
+    assert queue.get(job.id).state == QUEUED
+
+    queue.claim("worker-2", lease=0.01)
+    time.sleep(0.05)
+    assert queue.claim("worker-3", lease=60) is None
+    assert queue.get(job.id).state == FAILED
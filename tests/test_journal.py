@@ -0,0 +1,57 @@
+"""Tests of the batch journal."""
+
+import json
+from integrity import file_digest
+from journal import DONE, FAILED, BatchJournal
+
+def finished(tmp_path, journal, name="video.mp4", content=b"video data"):
+    output = tmp_path / name
+    output.write_bytes(content)
+    journal.completed("request", "https://www.youtube.com/watch?v=aaaaaaaaaaa", str(output))
+    return output
+
+def test_finished_item_is_skipped(tmp_path):
+    journal = BatchJournal(str(tmp_path / "journal.jsonl"))
+    finished(tmp_path, journal)
+    assert journal.check("request") == "already downloaded"
+
+def test_missing_output_is_reported_and_runs_again(tmp_path):
+    journal = BatchJournal(str(tmp_path / "journal.jsonl"))
+    output = finished(tmp_path, journal)
+    output.unlink()
+
+    assert journal.check("request") is None
+    entry = journal.get("request")
+    assert entry["status"] == FAILED
+    assert str(output) in entry["error"]
+    # The record survives a reload
+    assert BatchJournal(journal.path).get("request")["status"] == FAILED
+
+def test_verify_checks_the_recorded_digest(tmp_path):
+    journal = BatchJournal(str(tmp_path / "journal.jsonl"))
+    output = finished(tmp_path, journal)
+    assert journal.get("request")["digest"] == file_digest(str(output))
+    assert [problem for _, _, problem in journal.verify()] == [None]
+
+    output.write_bytes(b"video dat4")
+    assert [problem for _, _, problem in journal.verify()] == ["content does not match its digest"]
+    assert journal.get("request")["status"] == FAILED
+
+def test_failures_back_off_and_give_up(tmp_path):
+    journal = BatchJournal(str(tmp_path / "journal.jsonl"), max_attempts=2, backoff=60)
+    url = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+    journal.failed("request", url, "boom")
+    retry_at = journal.get("request")["retry_at"]
+    assert journal.check("request", now=retry_at - 1).startswith("failed 1 times")
+    assert journal.check("request", now=retry_at + 1) is None
+
+    journal.failed("request", url, "boom")
+    assert journal.check("request", now=journal.get("request")["retry_at"] + 1).startswith("gave up")
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    entry = {"request": "request", "status": DONE, "output": "x", "size": 1, "url": "u", "time": 0}
+    path.write_text(json.dumps(entry) + "\n" + '{"request": "other", "sta')
+    journal = BatchJournal(str(path))
+    assert journal.get("request")["status"] == DONE
+    assert journal.get("other") is None
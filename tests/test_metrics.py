@@ -0,0 +1,104 @@
+"""Tests of the metrics registry and its Prometheus and JSON exports."""
+
+import json
+import pytest
+import metrics
+from metrics import MetricsRegistry
+
+def total(counter):
+    return sum(item["value"] for item in counter.to_dict())
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(prefix="test")
+
+def test_counter_keeps_one_value_per_label_set(registry):
+    downloads = registry.counter("downloads_total", "Downloads by result", ("result",))
+    downloads.inc(result="ok")
+    downloads.inc(2, result="ok")
+    downloads.inc(result="failed")
+    assert downloads.to_dict() == [{"result": "failed", "value": 1}, {"result": "ok", "value": 3}]
+
+def test_gauge_goes_up_and_down(registry):
+    active = registry.gauge("active", "Running")
+    active.inc()
+    active.inc()
+    active.dec()
+    assert active.to_dict() == [{"value": 1}]
+    active.set(7)
+    assert active.to_dict() == [{"value": 7}]
+
+def test_registering_a_name_twice_returns_the_same_metric(registry):
+    first = registry.counter("bytes_total", "Bytes")
+    assert registry.counter("bytes_total", "Bytes") is first
+
+def test_histogram_buckets_and_quantiles(registry):
+    durations = registry.histogram("seconds", "Durations", ("stage",), buckets=(1, 2, 5))
+    for value in (0.5, 0.5, 1.5, 4, 10):
+        durations.observe(value, stage="transfer")
+    [summary] = durations.to_dict()
+    assert summary["stage"] == "transfer"
+    assert summary["count"] == 5
+    assert summary["sum"] == 16.5
+    assert summary["mean"] == 3.3
+    assert summary["p50"] == 2
+    assert summary["p90"] is None  # Above the highest bucket bound
+    # A value on a bound falls in that bucket, as Prometheus's "le" says
+    durations.observe(1, stage="select")
+    assert durations.to_dict()[0]["p99"] == 1
+
+def test_histogram_time_observes_when_the_block_raises(registry):
+    durations = registry.histogram("seconds", "Durations", ("stage",))
+    with pytest.raises(ValueError):
+        with durations.time(stage="resolve"):
+            raise ValueError
+    assert durations.to_dict()[0]["count"] == 1
+
+def test_prometheus_text_format(registry):
+    downloads = registry.counter("downloads_total", "Downloads by result", ("result",))
+    downloads.inc(result='say "hi"\n')
+    durations = registry.histogram("seconds", "Durations", buckets=(1, 2))
+    durations.observe(0.5)
+    durations.observe(1.5)
+    assert registry.render().splitlines() == [
+        "# HELP test_downloads_total Downloads by result",
+        "# TYPE test_downloads_total counter",
+        'test_downloads_total{result="say \\"hi\\"\\n"} 1',
+        "# HELP test_seconds Durations",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="1"} 1',
+        'test_seconds_bucket{le="2"} 2',
+        'test_seconds_bucket{le="+Inf"} 2',
+        "test_seconds_sum 2",
+        "test_seconds_count 2",
+    ]
+
+def test_cache_stats_are_reported_as_gauges(registry):
+    registry.add_cache("metadata", lambda: {"hits": 3, "misses": 1, "path": "/tmp/cache"})
+    def broken():
+        raise OSError
+    registry.add_cache("broken", broken)
+    summary = registry.to_dict()
+    assert summary["test_cache"] == [
+        {"cache": "metadata", "field": "hits", "value": 3},
+        {"cache": "metadata", "field": "misses", "value": 1},
+    ]
+    json.dumps(summary)
+
+def test_record_transfer_updates_bytes_time_and_throughput():
+    size, seconds = total(metrics.TRANSFERRED_BYTES), total(metrics.TRANSFER_SECONDS)
+    count = sum(item["count"] for item in metrics.THROUGHPUT.to_dict())
+    metrics.record_transfer(1024 * 1024, 2.0)
+    # A transfer that took no measurable time counts its bytes but has no rate
+    metrics.record_transfer(100, 0)
+    assert total(metrics.TRANSFERRED_BYTES) - size == 1024 * 1024 + 100
+    assert total(metrics.TRANSFER_SECONDS) - seconds == 2.0
+    assert sum(item["count"] for item in metrics.THROUGHPUT.to_dict()) - count == 1
+
+def test_stage_timer_records_under_the_stage_label():
+    def count(stage):
+        return sum(item["count"] for item in metrics.STAGE_SECONDS.to_dict() if item["stage"] == stage)
+    before = count("test-stage")
+    with metrics.stage_timer("test-stage"):
+        pass
+    assert count("test-stage") == before + 1
@@ -0,0 +1,43 @@
+"""Tests of playlist and channel expansion."""
+
+import playlist
+from playlist import expand_urls
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PL123"
+
+def test_expanded_videos_are_yielded_once(monkeypatch):
+    monkeypatch.setattr(playlist, "iter_collection", lambda url: iter([
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa",
+        "https://www.youtube.com/watch?v=bbbbbbbbbbb",
+    ]))
+    urls = ["https://youtu.be/aaaaaaaaaaa", PLAYLIST]
+    assert list(expand_urls(urls)) == [
+        "https://youtu.be/aaaaaaaaaaa",
+        "https://www.youtube.com/watch?v=bbbbbbbbbbb",
+    ]
+
+def test_expanded_urls_without_an_id_are_all_kept(monkeypatch):
+    monkeypatch.setattr(playlist, "iter_collection", lambda url: iter([
+        "https://www.youtube.com/watch?list=PL123",
+        "https://www.youtube.com/watch?list=PL456",
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa",
+    ]))
+    assert len(list(expand_urls([PLAYLIST]))) == 3
+
+def test_batch_file_shares_its_ids_with_expansion(tmp_path, monkeypatch):
+    from ingest import BatchFile
+    monkeypatch.setattr(playlist, "iter_collection", lambda url: iter([
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa",
+        "https://www.youtube.com/watch?v=bbbbbbbbbbb",
+    ]))
+    path = tmp_path / "urls.txt"
+    path.write_text("https://youtu.be/aaaaaaaaaaa\n" + PLAYLIST + "\nhttps://youtu.be/bbbbbbbbbbb\n")
+    urls = BatchFile(str(path))
+
+    assert list(expand_urls(urls, urls.videos)) == [
+        "https://www.youtube.com/watch?v=aaaaaaaaaaa",
+        "https://www.youtube.com/watch?v=bbbbbbbbbbb",
+    ]
+    # One set holds every id, and the last line was a duplicate of an expanded video
+    assert len(urls.videos) == 2
+    assert urls.duplicates == 1
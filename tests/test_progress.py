@@ -0,0 +1,97 @@
+"""Tests of the progress bus and reporter, on a clock the tests move by hand."""
+
+import types
+import pytest
+import progress
+from progress import BYTES, DONE, STAGE, ProgressBus, ProgressEvent, ProgressReporter
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress, "time", types.SimpleNamespace(monotonic=clock, time=clock))
+    return clock
+
+def received(bus, rate):
+    events = []
+    bus.subscribe(events.append, rate=rate)
+    return events
+
+def test_bytes_events_reach_a_sink_at_most_at_its_rate(clock):
+    bus = ProgressBus()
+    events = received(bus, rate=8)
+    for step in range(9):
+        bus.publish(ProgressEvent("a", BYTES, bytes_done=step))
+        clock.now += 0.0625
+    # Two events per 1/8 s interval, of which the first of each goes out
+    assert [event.bytes_done for event in events] == [0, 2, 4, 6, 8]
+
+def test_held_events_are_coalesced_per_job(clock):
+    bus = ProgressBus()
+    events = received(bus, rate=8)
+    bus.publish(ProgressEvent("a", BYTES, bytes_done=1))
+    clock.now += 0.0625
+    bus.publish(ProgressEvent("a", BYTES, bytes_done=2))
+    bus.publish(ProgressEvent("b", BYTES, bytes_done=10))
+    bus.publish(ProgressEvent("a", BYTES, bytes_done=3))
+    clock.now += 0.0625
+    bus.publish(ProgressEvent("b", BYTES, bytes_done=11))
+    assert [(event.job, event.bytes_done) for event in events] == [("a", 1), ("a", 3), ("b", 11)]
+
+def test_other_events_go_out_at_once_after_the_latest_progress(clock):
+    bus = ProgressBus()
+    events = received(bus, rate=8)
+    bus.publish(ProgressEvent("a", BYTES, bytes_done=1))
+    bus.publish(ProgressEvent("a", BYTES, bytes_done=2))
+    bus.publish(ProgressEvent("a", DONE, message="out.mp4"))
+    assert [(event.kind, event.bytes_done) for event in events] == [(BYTES, 1), (BYTES, 2), (DONE, 0)]
+
+def test_unthrottled_sink_gets_every_event(clock):
+    bus = ProgressBus()
+    throttled, every = received(bus, rate=8), received(bus, rate=None)
+    for step in range(5):
+        bus.publish(ProgressEvent("a", BYTES, bytes_done=step))
+    assert len(every) == 5 and len(throttled) == 1
+    assert bus.interval == 0.0
+
+def test_broken_sink_does_not_stop_the_others(clock):
+    bus = ProgressBus()
+
+    def broken(event):
+        raise RuntimeError("sink failed")
+
+    bus.subscribe(broken)
+    events = received(bus, rate=None)
+    bus.publish(ProgressEvent("a", STAGE, stage="muxing"))
+    assert len(events) == 1
+
+def test_reporter_publishes_only_when_a_sink_is_due(clock):
+    bus = ProgressBus()
+    reporter = ProgressReporter(bus, "a")
+    # Without sinks nothing is built at all
+    reporter.update(100, 1000)
+    events = received(bus, rate=4)
+    for step in range(1, 9):
+        clock.now += 0.125
+        reporter.update(step * 100, 1000)
+    assert [event.bytes_done for event in events] == [100, 300, 500, 700]
+
+def test_reporter_smooths_speed_and_estimates_the_time_left(clock):
+    bus = ProgressBus()
+    events = received(bus, rate=None)
+    reporter = ProgressReporter(bus, "a")
+    reporter.update(0, 4000)
+    clock.now += 1
+    reporter.update(1000)
+    assert events[-1].speed == pytest.approx(1000)
+    assert events[-1].eta == pytest.approx(3.0)
+    clock.now += 1
+    reporter.update(3000)
+    assert events[-1].speed == pytest.approx(0.3 * 2000 + 0.7 * 1000)
+    assert events[-1].fraction == pytest.approx(0.75)
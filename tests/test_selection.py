@@ -0,0 +1,78 @@
+"""Tests of stream selection over a realistic set of YouTube itags."""
+
+import pytest
+from metadata import StreamInfo, VideoInfo
+from selection import ADAPTIVE, PROGRESSIVE, SelectionTarget, StreamSelector
+
+LENGTH = 600
+
+def stream(itag, mime_type, codecs, resolution=None, abr=None, progressive=False, kbps=1000):
+    return StreamInfo(
+        itag=itag, url=f"https://example.invalid/{itag}", mime_type=mime_type, codecs=codecs,
+        filesize=kbps * 1000 * LENGTH // 8, resolution=resolution, abr=abr, fps=30 if resolution else None,
+        bitrate=kbps * 1000, is_progressive=progressive, includes_audio_track=progressive or resolution is None,
+        includes_video_track=resolution is not None
+    )
+
+STREAMS = [
+    stream(401, "video/mp4", ["av01.0.12M.08"], "2160p", kbps=18000),
+    stream(313, "video/webm", ["vp9"], "2160p", kbps=20000),
+    stream(271, "video/webm", ["vp9"], "1440p", kbps=9000),
+    stream(400, "video/mp4", ["av01.0.12M.08"], "1440p", kbps=8000),
+    stream(137, "video/mp4", ["avc1.640028"], "1080p", kbps=4500),
+    stream(136, "video/mp4", ["avc1.4d401f"], "720p", kbps=2200),
+    stream(22, "video/mp4", ["avc1.64001F", "mp4a.40.2"], "720p", "192kbps", progressive=True, kbps=2000),
+    stream(18, "video/mp4", ["avc1.42001E", "mp4a.40.2"], "360p", "96kbps", progressive=True, kbps=600),
+    stream(140, "audio/mp4", ["mp4a.40.2"], abr="128kbps", kbps=128),
+    stream(251, "audio/webm", ["opus"], abr="160kbps", kbps=160),
+]
+VIDEO = VideoInfo("dQw4w9WgXcQ", "Video", "Author", LENGTH, STREAMS)
+
+def select(quality=None, **constraints):
+    return StreamSelector().select(VIDEO, SelectionTarget.from_quality("mp4", quality, **constraints))
+
+def itags(plan):
+    return [stream.itag for stream in plan.streams]
+
+def test_default_stays_at_720p_progressive():
+    plan = select()
+    assert plan.kind == PROGRESSIVE
+    assert itags(plan) == [22]
+    assert plan.rejected is None
+
+@pytest.mark.parametrize("quality", ["high", "best"])
+def test_default_codec_filter_keeps_avc1_over_higher_av1(quality):
+    plan = select(quality)
+    assert plan.kind == ADAPTIVE
+    assert itags(plan) == [137, 140]
+    assert plan.rejected is None
+
+def test_explicit_codec_list_ranks_after_height():
+    assert itags(select("best", preferred_codecs=["av01", "avc1"])) == [401, 140]
+    assert itags(select("best", preferred_codecs=["avc1", "av01"])) == [401, 140]
+
+def test_explicit_codec_breaks_ties_between_equal_heights():
+    assert itags(select("medium", preferred_codecs=["avc1"])) == [22]
+
+def test_without_ffmpeg_best_falls_back_to_progressive():
+    plan = select("best", can_mux=False)
+    assert itags(plan) == [22]
+
+def test_low_picks_360p():
+    assert itags(select("low")) == [18]
+
+def test_other_codecs_are_a_fallback_when_no_avc1_exists():
+    info = VideoInfo("x", "Video", "Author", LENGTH, [STREAMS[0], STREAMS[8]])
+    plan = StreamSelector().select(info, SelectionTarget.from_quality("mp4", "best"))
+    assert itags(plan) == [401, 140]
+    assert "not avc1" in plan.rejected
+
+def test_max_bytes_excludes_large_plans():
+    plan = select("best", max_bytes=200 * 1000 * 1000)
+    assert plan.estimated_bytes <= 200 * 1000 * 1000
+    assert plan.video.height < 1080
+
+def test_mp3_picks_smallest_source_meeting_bitrate():
+    target = SelectionTarget.from_quality("mp3", "low")
+    plan = StreamSelector().select(VIDEO, target)
+    assert itags(plan) == [140]
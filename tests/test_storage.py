@@ -0,0 +1,68 @@
+"""Tests of the store's quota and eviction."""
+
+import itertools
+import os
+import pytest
+import storage
+from storage import InsufficientStorage, StorageManager
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every reading of the clock one second later than the last, so access order is exact."""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(storage.time, "time", lambda: float(next(ticks)))
+
+def add(tmp_path, manager, key, size=100):
+    path = tmp_path / f"{key}.mp4"
+    path.write_bytes(b"x" * size)
+    manager.register(key, str(path), size)
+    return path
+
+def test_lru_evicts_the_least_recently_used(tmp_path, clock):
+    manager = StorageManager(str(tmp_path))
+    paths = {key: add(tmp_path, manager, key) for key in ("a", "b", "c")}
+    manager.touch("a")
+
+    assert manager.evict(150) == 200
+    assert [key for key, path in paths.items() if path.exists()] == ["a"]
+    assert manager.used_bytes() == 100
+
+def test_lfu_evicts_the_least_used(tmp_path, clock):
+    manager = StorageManager(str(tmp_path), policy="lfu")
+    paths = {key: add(tmp_path, manager, key) for key in ("a", "b", "c")}
+    for key in ("a", "a", "b", "c", "c"):
+        manager.touch(key)
+
+    manager.evict(100)
+    assert [key for key, path in paths.items() if not path.exists()] == ["b"]
+
+def test_pinned_artifacts_are_not_evicted(tmp_path, clock):
+    manager = StorageManager(str(tmp_path))
+    paths = {key: add(tmp_path, manager, key) for key in ("a", "b")}
+    with manager.pinned("a"):
+        assert manager.evict(200) == 100
+    assert paths["a"].exists() and not paths["b"].exists()
+
+def test_eviction_removes_the_user_links(tmp_path, clock):
+    manager = StorageManager(str(tmp_path))
+    path = add(tmp_path, manager, "a")
+    link = tmp_path / "out.mp4"
+    os.link(path, link)
+    manager.add_link("a", str(link))
+
+    manager.evict(100)
+    assert not link.exists()
+
+def test_reserve_makes_room_within_the_quota(tmp_path, clock):
+    manager = StorageManager(str(tmp_path), quota_bytes=250)
+    paths = {key: add(tmp_path, manager, key) for key in ("a", "b")}
+    with manager.reserve(100):
+        assert not paths["a"].exists() and paths["b"].exists()
+
+def test_download_larger_than_the_quota_evicts_nothing(tmp_path, clock):
+    manager = StorageManager(str(tmp_path), quota_bytes=250)
+    path = add(tmp_path, manager, "a")
+    with pytest.raises(InsufficientStorage):
+        with manager.reserve(300):
+            pass
+    assert path.exists()
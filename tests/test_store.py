@@ -0,0 +1,53 @@
+"""Tests of the content-addressed artifact store."""
+
+import os
+import pytest
+from store import ArtifactStore
+
+KEY = "ab" + "0" * 62
+
+def stored(tmp_path, store, content=b"video data"):
+    """Produce and commit an artifact, returning its path in the store."""
+    path, in_flight = store.claim(KEY)
+    assert path is None and in_flight is None
+    staged = store.staging_path(KEY, "mp4")
+    with open(staged, "wb") as f:
+        f.write(content)
+    return store.commit(KEY, staged, "mp4")
+
+def test_truncated_artifact_is_dropped_but_user_links_are_kept(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    path = stored(tmp_path, store)
+    user_path = str(tmp_path / "out" / "video.mp4")
+    store.link(path, user_path, KEY)
+
+    # Cut the object short in place, so the hard link shares the damage
+    os.truncate(path, 5)
+
+    assert store.lookup(KEY) == (None, None)
+    assert not os.path.exists(path)
+    assert store.storage.is_empty()
+    assert os.path.exists(user_path)
+
+def test_identical_requests_wait_for_one_producer(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    assert store.claim(KEY) == (None, None)
+    path, in_flight = store.claim(KEY)
+    assert path is None and in_flight is not None and not in_flight.done()
+
+    staged = store.staging_path(KEY, "mp4")
+    with open(staged, "wb") as f:
+        f.write(b"video data")
+    path = store.commit(KEY, staged, "mp4")
+    assert in_flight.result(timeout=1) == path
+    assert store.claim(KEY) == (path, None)
+
+def test_aborted_production_fails_the_waiters_and_frees_the_key(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    store.claim(KEY)
+    _, in_flight = store.claim(KEY)
+    store.abort(KEY, OSError("download failed"))
+
+    with pytest.raises(OSError, match="download failed"):
+        in_flight.result(timeout=1)
+    assert store.claim(KEY) == (None, None)
@@ -0,0 +1,87 @@
+"""Tests of range requests and resumable downloads."""
+
+import os
+import pytest
+from benchmarks.server import FileServer
+from transfer import PartialDownload, ResourceChanged, TransferError, download_resumable, open_url
+
+SIZE = 256 * 1024
+ITAG = 18
+
+@pytest.fixture
+def data():
+    return bytes(range(256)) * (SIZE // 256)
+
+@pytest.fixture
+def media_dir(tmp_path, data):
+    path = tmp_path / "media"
+    path.mkdir()
+    (path / "video.bin").write_bytes(data)
+    return path
+
+@pytest.fixture
+def server(media_dir):
+    with FileServer(str(media_dir)) as server:
+        yield server
+
+def save_partial(file_path, data, committed, validator=None):
+    """Leave a partial download of ``data`` with its first ``committed`` bytes saved, as an interrupted run would."""
+    with open(file_path + ".part", "wb") as f:
+        f.write(data[:committed])
+        f.truncate(len(data))
+    partial = PartialDownload(file_path, ITAG, len(data))
+    partial.ranges = [[0, len(data) - 1, committed]]
+    partial.validator = validator
+    partial.save(force=True)
+
+def test_range_is_served_as_206(server, data):
+    with open_url(server.url("video.bin"), 100, 199) as response:
+        assert response.status == 206
+        assert response.read() == data[100:200]
+
+def test_ignored_range_at_start_zero_is_an_error(media_dir):
+    with FileServer(str(media_dir), ignore_ranges=True) as server:
+        with pytest.raises(TransferError):
+            open_url(server.url("video.bin"), 0, 99)
+
+def test_resume_fetches_only_the_missing_bytes(server, data, tmp_path):
+    file_path = str(tmp_path / "video.mp4")
+    save_partial(file_path, data, SIZE // 4)
+
+    fetched = download_resumable(server.url("video.bin"), file_path, SIZE, ITAG, segments=4)
+    assert fetched == SIZE - SIZE // 4
+    with open(file_path, "rb") as f:
+        assert f.read() == data
+    assert not os.path.exists(file_path + ".part")
+    assert not os.path.exists(file_path + ".part.json")
+
+def test_new_download_records_the_validator(server, data, tmp_path):
+    file_path = str(tmp_path / "video.mp4")
+    # Expect one byte more than served, so the download stops short of finishing
+    with pytest.raises(TransferError):
+        download_resumable(server.url("video.bin"), file_path, SIZE + 1, ITAG)
+
+    partial = PartialDownload(file_path, ITAG, SIZE + 1)
+    partial.load(1)
+    assert partial.validator
+
+def test_changed_resource_is_not_resumed(server, data, tmp_path):
+    file_path = str(tmp_path / "video.mp4")
+    save_partial(file_path, data, SIZE // 4, validator='"an-older-version"')
+
+    with pytest.raises(ResourceChanged):
+        download_resumable(server.url("video.bin"), file_path, SIZE, ITAG)
+    # Nothing of the new version was mixed into the saved part
+    assert PartialDownload(file_path, ITAG, SIZE).load(1)
+    with open(file_path + ".part", "rb") as f:
+        assert f.read(SIZE // 4) == data[:SIZE // 4]
+
+def test_server_ignoring_ranges_keeps_the_partial(media_dir, data, tmp_path):
+    file_path = str(tmp_path / "video.mp4")
+    save_partial(file_path, data, SIZE // 4)
+
+    with FileServer(str(media_dir), ignore_ranges=True) as server:
+        with pytest.raises(TransferError):
+            download_resumable(server.url("video.bin"), file_path, SIZE, ITAG)
+    assert os.path.exists(file_path + ".part")
+    assert os.path.exists(file_path + ".part.json")
@@ -0,0 +1,37 @@
+"""Tests of the command line."""
+
+import os
+import subprocess
+import sys
+import pytest
+from ytdl import parse_args
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_store_quota_needs_a_store(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["-b", "urls.txt", "--store-quota", "500"])
+    assert "--store-quota requires --store" in capsys.readouterr().err
+
+def test_store_quota_with_a_store():
+    args = parse_args(["-b", "urls.txt", "--store", "store", "--store-quota", "500"])
+    assert args.store_quota == 500
+
+@pytest.mark.parametrize("arguments", [
+    ["-u", "not-a-youtube-url"],
+    ["--status"],
+    ["--verify"],
+])
+def test_commands_that_reach_no_video_do_not_load_pytube(tmp_path, arguments):
+    from journal import BatchJournal
+    output = tmp_path / "video.mp4"
+    output.write_bytes(b"video data")
+    BatchJournal(str(tmp_path)).completed("request", "https://youtu.be/aaaaaaaaaaa", str(output))
+
+    # In a fresh process, as the other tests have imported everything
+    check = (
+        "import sys, ytdl\n"
+        f"try:\n    ytdl.main({arguments + ['-o', str(tmp_path)]!r})\nexcept SystemExit:\n    pass\n"
+        "assert 'pytube' not in sys.modules and 'urllib.request' not in sys.modules, 'pytube was loaded'\n"
+    )
+    subprocess.run([sys.executable, "-c", check], cwd=ROOT, check=True)
@@ -0,0 +1,170 @@
+"""
+FFmpeg transcoding helpers for the YouTube Downloader.
+Converts downloaded audio to MP3, either from a file or straight from the stream.
+"""
+
+import os
+import subprocess
+from stages import WorkerStage
+from transfer import TransferError, stream_into
+
+class TranscodeError(Exception):
+    """Raised when FFmpeg fails to produce the output file."""
+
+class TranscodePool(WorkerStage):
+    """
+    Transcode stage that runs FFmpeg jobs separately from the downloads.
+
+    Each worker drives one FFmpeg process, so the pool size is the number
+    of encoders running at once; it defaults to the CPU count.
+    """
+
+    def __init__(self, workers=None):
+        super().__init__("transcode", workers or os.cpu_count() or 1)
+
+def mp3_command(source, destination, bitrate):
+    """Build the FFmpeg command that encodes ``source`` to an MP3 file."""
+    return [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", source,
+        "-b:a", bitrate, "-vn",
+        "-f", "mp3", destination
+    ]
+
+def mux_streams(video_path, audio_path, destination):
+    """
+    Combine a video-only and an audio-only file into one MP4 without re-encoding.
+
+    Both streams are copied as-is (``-c copy``), so this costs about as much
+    as copying the files. The index is moved to the front for playback
+    while downloading in browsers.
+
+    Raises:
+        subprocess.CalledProcessError: If FFmpeg exits with an error
+        FileNotFoundError: If FFmpeg is not installed
+    """
+    part_path = destination + ".part"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", video_path, "-i", audio_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c", "copy", "-movflags", "+faststart",
+            "-f", "mp4", part_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    os.replace(part_path, destination)
+    return destination
+
+def cut_clip(sources, destination, start, end=None, bitrate=None):
+    """
+    Cut the window [start, end) out of one or more local sources into one file.
+
+    Video and audio are copied without re-encoding, so the clip starts at
+    the keyframe at or before ``start``. With ``bitrate`` the audio is
+    encoded to MP3 instead.
+
+    Args:
+        sources (list): (path, start_time) of each input, where start_time
+            is the timestamp its media begins at, e.g. for a fetched clip
+        destination (str): Output path
+        start (float): Window start in seconds of the original video
+        end (float): Window end in seconds, None for the end of the video
+        bitrate (str): MP3 bitrate such as '192k', None to keep the codecs
+
+    Raises:
+        subprocess.CalledProcessError: If FFmpeg exits with an error
+        FileNotFoundError: If FFmpeg is not installed
+    """
+    command = ["ffmpeg", "-y", "-loglevel", "error"]
+    for path, start_time in sources:
+        # Seeking is relative to where each input's media begins
+        command += ["-ss", f"{max(start - start_time, 0):.3f}"]
+        if end is not None:
+            command += ["-t", f"{end - start:.3f}"]
+        command += ["-i", path]
+    for index in range(len(sources)):
+        command += ["-map", f"{index}:a?" if bitrate else str(index)]
+    if bitrate:
+        command += ["-vn", "-b:a", bitrate, "-f", "mp3"]
+    else:
+        command += ["-c", "copy", "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", "-f", "mp4"]
+
+    part_path = destination + ".part"
+    subprocess.run(command + [part_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    os.replace(part_path, destination)
+    return destination
+
+def transcode_file(source, destination, bitrate):
+    """
+    Encode an audio file that is already on disk to MP3.
+
+    Raises:
+        subprocess.CalledProcessError: If FFmpeg exits with an error
+        FileNotFoundError: If FFmpeg is not installed
+    """
+    subprocess.run(
+        mp3_command(source, destination, bitrate),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    return destination
+
+def transcode_stream(url, destination, bitrate, total_size=None, on_progress=None, throttle=None):
+    """
+    Encode a remote audio stream to MP3 while it downloads.
+
+    Chunks are fed to FFmpeg's stdin as they arrive, so encoding overlaps the
+    transfer and no intermediate file is written. The MP3 is produced under a
+    ``.part`` name and only moved into place once FFmpeg finishes cleanly.
+
+    Args:
+        url (str): Audio stream URL
+        destination (str): Path of the MP3 file to create
+        bitrate (str): Target bitrate for FFmpeg, e.g. '192k'
+        total_size (int): Expected stream size in bytes, checked when given
+        on_progress (callable): Called as (chunk, bytes_done) after each chunk
+        throttle (callable): Called with the size of each chunk read, may block
+
+    Returns:
+        str: Path of the MP3 file
+
+    Raises:
+        TranscodeError: If FFmpeg fails or the stream is cut short
+        FileNotFoundError: If FFmpeg is not installed
+    """
+    part_path = destination + ".part"
+    process = subprocess.Popen(
+        mp3_command("pipe:0", part_path, bitrate),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    try:
+        try:
+            stream_into(url, process.stdin, total_size, on_progress, throttle)
+        finally:
+            process.stdin.close()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise TranscodeError(stderr.decode(errors="replace").strip() or f"FFmpeg exited with {process.returncode}")
+    except BrokenPipeError:
+        process.wait()
+        raise TranscodeError(process.stderr.read().decode(errors="replace").strip() or "FFmpeg stopped reading input")
+    except TransferError as e:
+        raise TranscodeError(str(e))
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stderr.close()
+        if process.returncode != 0 and os.path.exists(part_path):
+            os.remove(part_path)
+
+    os.replace(part_path, destination)
+    return destination
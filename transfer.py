@@ -0,0 +1,411 @@
+"""
+HTTP transfer helpers for the YouTube Downloader.
+Fetches stream URLs directly, optionally split into parallel byte ranges.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from connections import get_default_pool
+from integrity import BLOCK_SIZE
+
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 30
+USER_AGENT = "Mozilla/5.0"
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+# Whole-file fallback of a resumable download, kept apart so the resumable .part survives it
+SINGLE_SUFFIX = ".single.part"
+
+class TransferError(Exception):
+    """Raised when a transfer cannot be completed as requested."""
+
+class ResourceChanged(TransferError):
+    """Raised when the server's version of a partially downloaded resource is no longer the one it started with."""
+
+def open_url(url, start=None, end=None, timeout=TIMEOUT):
+    """
+    Open a URL through the shared connection pool, optionally asking for an inclusive byte range.
+
+    Raises:
+        TransferError: If a range was requested but the server ignored it
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    if start is not None:
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+        request.add_header("Range", byte_range)
+
+    response = get_default_pool().urlopen(request, timeout=timeout)
+    # Checked for start 0 too: a 200 there is the whole file, not the first range
+    if start is not None and response.status != 206:
+        response.close()
+        raise TransferError(f"Server does not support range requests (HTTP {response.status})")
+    return response
+
+def split_ranges(total_size, segments, align=1):
+    """
+    Split ``total_size`` bytes into at most ``segments`` inclusive (start, end) ranges.
+
+    Every range starts at a multiple of ``align``, e.g. integrity.BLOCK_SIZE
+    so each range can be hashed as it arrives; small sizes get fewer ranges.
+    """
+    blocks = max(1, -(-total_size // align))
+    segments = max(1, min(segments, blocks))
+    starts = [blocks * i // segments * align for i in range(segments)]
+    return [
+        (start, starts[i + 1] - 1 if i + 1 < len(starts) else total_size - 1)
+        for i, start in enumerate(starts)
+    ]
+
+class _Counter:
+    """Thread-safe byte counter that reports the running total and paces the readers."""
+
+    def __init__(self, on_progress=None, initial=0, throttle=None):
+        self.value = initial
+        self._lock = threading.Lock()
+        self._on_progress = on_progress
+        self._throttle = throttle
+
+    def add(self, amount, chunk):
+        with self._lock:
+            self.value += amount
+            if self._on_progress:
+                self._on_progress(chunk, self.value)
+        # Outside the lock, so one waiting range does not hold up the others' progress
+        if self._throttle:
+            self._throttle(amount)
+
+class PartialDownload:
+    """
+    On-disk state of a download in progress.
+
+    Data goes to ``<file>.part`` and a JSON sidecar ``<file>.part.json``
+    records the stream itag, the expected size and, for every byte range,
+    how many bytes have been written and flushed. The sidecar is only
+    advanced after the data it describes has been flushed, so a rerun can
+    trust it and continue each range where it stopped.
+
+    The sidecar also keeps the resource's validator (its ETag, else its
+    Last-Modified date), and a rerun that gets a different one from the
+    server raises ResourceChanged instead of mixing two versions.
+
+    With a BlockDigest, the sidecar also records the digests of the blocks
+    written so far. A rerun hashes the data it resumes from and downloads
+    again, from the first bad block on, any range whose data no longer
+    matches.
+    """
+
+    SAVE_INTERVAL = 0.5
+
+    def __init__(self, file_path, itag, total_size, digest=None):
+        self.file_path = file_path
+        self.part_path = file_path + PART_SUFFIX
+        self.state_path = file_path + STATE_SUFFIX
+        self.itag = itag
+        self.total_size = total_size
+        self.digest = digest
+        self.ranges = []
+        self.validator = None
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @property
+    def committed(self):
+        return sum(committed for _, _, committed in self.ranges)
+
+    def load(self, segments):
+        """
+        Pick up a matching partial download or start a new one.
+
+        A sidecar for a different itag or size, an unreadable sidecar, or a
+        ``.part`` file without one is discarded, and so is a partial whose
+        ranges do not start on block boundaries when it has to be hashed.
+
+        Returns:
+            bool: True if an earlier partial download is being resumed
+        """
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if (state.get("itag") == self.itag and state.get("filesize") == self.total_size
+                    and os.path.getsize(self.part_path) == self.total_size):
+                ranges = [[int(start), int(end), int(committed)] for start, end, committed in state["ranges"]]
+                self.validator = state.get("validator")
+                if not self.digest:
+                    self.ranges = ranges
+                    return True
+                if all(start % BLOCK_SIZE == 0 for start, _, _ in ranges):
+                    self.ranges = ranges
+                    self._check(state.get("blocks"))
+                    return True
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        self.discard()
+        self.ranges = [[start, end, 0] for start, end in split_ranges(self.total_size, segments, BLOCK_SIZE)]
+        with open(self.part_path, "wb") as f:
+            f.truncate(self.total_size)
+        self.save(force=True)
+        return False
+
+    def _check(self, blocks):
+        """Hash the data being resumed from, and roll back ranges whose blocks changed since they were written."""
+        for entry in self.ranges:
+            start, _, committed = entry
+            trusted = self.digest.prime(self.part_path, start, start + committed, blocks)
+            if trusted < start + committed:
+                print(f"\033[93mPartial data at {trusted / 1048576:.1f} MB is damaged, downloading it again\033[0m")
+                entry[2] = trusted - start
+
+    def check_validator(self, response):
+        """
+        Compare the validator of a range response with the one of the data already saved.
+
+        Raises:
+            ResourceChanged: If the server sends a different ETag or Last-Modified date
+        """
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if not validator:
+            return
+        with self._lock:
+            if self.validator is None:
+                self.validator = validator
+            elif validator != self.validator:
+                raise ResourceChanged(f"The resource changed on the server ({self.validator} -> {validator})")
+
+    def advance(self, index, amount):
+        """Record ``amount`` more flushed bytes for range ``index``."""
+        with self._lock:
+            self.ranges[index][2] += amount
+        self.save()
+
+    def save(self, force=False):
+        """Write the sidecar, at most every SAVE_INTERVAL seconds unless forced."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.SAVE_INTERVAL:
+                return
+            self._last_save = now
+            state = {"itag": self.itag, "filesize": self.total_size, "ranges": self.ranges}
+            if self.validator:
+                state["validator"] = self.validator
+            if self.digest:
+                state["blocks"] = self.digest.blocks()
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(temp_path, self.state_path)
+
+    def finalize(self):
+        """Move the completed ``.part`` file into place and drop the sidecar."""
+        os.replace(self.part_path, self.file_path)
+        self._remove(self.state_path)
+
+    def discard(self):
+        """Delete any partial data and sidecar."""
+        self._remove(self.part_path)
+        self._remove(self.state_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _fetch_range(url, file_path, ranges, index, counter, cancel, partial=None, digest=None):
+    """Fetch what is left of ``ranges[index]`` and write it at its offset in ``file_path``, hashing it into ``digest``."""
+    start, end, committed = ranges[index]
+    expected = end - start + 1 - committed
+    received = 0
+    if expected <= 0:
+        return
+    with open(file_path, "r+b") as f:
+        f.seek(start + committed)
+        with open_url(url, start + committed, end) as response:
+            if partial:
+                partial.check_validator(response)
+            while received < expected:
+                if cancel.is_set():
+                    return
+                chunk = response.read(min(CHUNK_SIZE, expected - received))
+                if not chunk:
+                    break
+                f.write(chunk)
+                if digest:
+                    digest.update(start + committed + received, chunk)
+                received += len(chunk)
+                if partial:
+                    f.flush()
+                    partial.advance(index, len(chunk))
+                counter.add(len(chunk), chunk)
+    if received != expected:
+        raise TransferError(f"Range {start}-{end} ended after {committed + received} of {end - start + 1} bytes")
+
+def _fetch_ranges(url, file_path, ranges, counter, partial=None, digest=None):
+    """Fetch all unfinished ranges, one connection per range."""
+    pending = [index for index, (start, end, committed) in enumerate(ranges) if committed < end - start + 1]
+    cancel = threading.Event()
+    if len(pending) <= 1:
+        for index in pending:
+            _fetch_range(url, file_path, ranges, index, counter, cancel, partial, digest)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="ytdown-segment") as executor:
+        futures = [
+            executor.submit(_fetch_range, url, file_path, ranges, index, counter, cancel, partial, digest)
+            for index in pending
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Stop the other ranges so an interrupt does not wait for them
+            cancel.set()
+            raise
+
+def download_single(url, file_path, total_size=None, on_progress=None, throttle=None, digest=None):
+    """
+    Download a URL over a single connection.
+
+    Args:
+        url (str): Stream URL
+        file_path (str): Destination file
+        total_size (int): Expected size in bytes, checked when given
+        on_progress (callable): Called as (chunk, bytes_done) after each chunk
+        throttle (callable): Called with the size of each chunk read and
+            may block to limit the rate, e.g. BandwidthShare.consume
+        digest (BlockDigest): Digest to hash the data into as it is written
+
+    Returns:
+        int: Number of bytes written
+    """
+    counter = _Counter(on_progress, throttle=throttle)
+    with open(file_path, "wb") as f, open_url(url) as response:
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            if digest:
+                digest.update(counter.value, chunk)
+            counter.add(len(chunk), chunk)
+
+    if total_size is not None and counter.value != total_size:
+        raise TransferError(f"Expected {total_size} bytes, received {counter.value}")
+    return counter.value
+
+def stream_into(url, writer, total_size=None, on_progress=None, throttle=None):
+    """
+    Copy a URL into a writable file object chunk by chunk as it arrives.
+
+    Args:
+        url (str): Stream URL
+        writer: Object with a ``write(bytes)`` method, e.g. a process stdin
+        total_size (int): Expected size in bytes, checked when given
+        on_progress (callable): Called as (chunk, bytes_done) after each chunk
+        throttle (callable): Called with the size of each chunk read, may block
+
+    Returns:
+        int: Number of bytes copied
+    """
+    counter = _Counter(on_progress, throttle=throttle)
+    with open_url(url) as response:
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            counter.add(len(chunk), chunk)
+
+    if total_size is not None and counter.value != total_size:
+        raise TransferError(f"Expected {total_size} bytes, received {counter.value}")
+    return counter.value
+
+def download_segmented(url, file_path, total_size, segments=4, on_progress=None, throttle=None, digest=None):
+    """
+    Download a URL as several byte ranges fetched concurrently.
+
+    The destination is preallocated to ``total_size`` and every range is
+    written at its own offset, so no reassembly step is needed.
+
+    Args:
+        url (str): Stream URL
+        file_path (str): Destination file
+        total_size (int): Size of the resource in bytes
+        segments (int): Number of parallel range requests
+        on_progress (callable): Called as (chunk, bytes_done) after each chunk
+        throttle (callable): Called with the size of each chunk read, may block
+        digest (BlockDigest): Digest to hash the data into as it is written
+
+    Returns:
+        int: Number of bytes written
+
+    Raises:
+        TransferError: If the server ignores ranges or the result is short
+    """
+    if not total_size:
+        raise TransferError("Segmented download needs a known file size")
+
+    with open(file_path, "wb") as f:
+        f.truncate(total_size)
+
+    counter = _Counter(on_progress, throttle=throttle)
+    ranges = [[start, end, 0] for start, end in split_ranges(total_size, segments, BLOCK_SIZE)]
+    _fetch_ranges(url, file_path, ranges, counter, digest=digest)
+
+    actual_size = os.path.getsize(file_path)
+    if counter.value != total_size or actual_size != total_size:
+        raise TransferError(f"Expected {total_size} bytes, received {counter.value} ({actual_size} on disk)")
+    return counter.value
+
+def download_resumable(url, file_path, total_size, itag, segments=1, on_progress=None, throttle=None, digest=None):
+    """
+    Download a URL through a ``.part`` file that survives interruptions.
+
+    If an earlier run left a matching partial download behind, only the
+    missing byte ranges are requested. A partial for a different itag or
+    size is discarded first. The ``.part`` file is renamed to
+    ``file_path`` once every range is complete.
+
+    Args:
+        url (str): Stream URL
+        file_path (str): Destination file
+        total_size (int): Size of the resource in bytes
+        itag (int): Stream itag, used to recognize a matching partial
+        segments (int): Number of parallel range requests for a new download
+        on_progress (callable): Called as (chunk, bytes_done) after each chunk
+        throttle (callable): Called with the size of each chunk read, may block
+        digest (BlockDigest): Digest to hash the data into, including what
+            an earlier run downloaded
+
+    Returns:
+        int: Number of bytes fetched by this call
+
+    Raises:
+        TransferError: If the server ignores ranges or the result is short;
+            the partial download is kept for the next attempt
+        ResourceChanged: If the server's resource is no longer the one the
+            partial download was started from
+    """
+    if not total_size:
+        raise TransferError("Resumable download needs a known file size")
+
+    partial = PartialDownload(file_path, itag, total_size, digest)
+    if partial.load(segments):
+        print(f"\033[94mResuming download at {partial.committed / 1048576:.1f} MB\033[0m")
+
+    already_committed = partial.committed
+    counter = _Counter(on_progress, initial=already_committed, throttle=throttle)
+    try:
+        _fetch_ranges(url, partial.part_path, partial.ranges, counter, partial, digest)
+    finally:
+        partial.save(force=True)
+
+    if partial.committed != total_size:
+        raise TransferError(f"Expected {total_size} bytes, have {partial.committed}")
+    partial.finalize()
+    return counter.value - already_committed
@@ -6,6 +6,8 @@ Contains functions to handle UI elements, display progress, and get user input.
 import os
 import sys
 import shutil
+import threading
+from progress import BYTES, DONE, ERROR, format_transfer
 
 def clear_screen():
     """Clear the terminal screen."""
@@ -42,7 +44,7 @@ def get_user_input(prompt):
     return input(f"\033[93m{prompt}\033[0m")
 
 def display_progress(stream, chunk, bytes_remaining):
-    """Display download progress."""
+    """Display download progress on every call; see ProgressBar for a throttled bar with speed and ETA."""
     total_size = stream.filesize
     bytes_downloaded = total_size - bytes_remaining
     percentage = (bytes_downloaded / total_size) * 100
@@ -55,9 +57,55 @@ def display_progress(stream, chunk, bytes_remaining):
     filled_width = int(percentage / 100 * bar_width)
     bar = '█' * filled_width + '░' * (bar_width - filled_width)
     
-    # Calculate download speed and ETA (simplified)
-    # This is a placeholder - actual implementation would track time
-    
     # Display progress
     sys.stdout.write(f"\r\033[97mDownloading: [{bar}] {percentage:.1f}% ({bytes_downloaded/1048576:.1f}/{total_size/1048576:.1f} MB)")
-    sys.stdout.flush()
\ No newline at end of file
+    sys.stdout.flush()
+
+class ProgressBar:
+    """Progress sink drawing one download as a bar with speed and ETA.
+
+    Subscribe it to a ProgressBus; the bus decides how often it redraws.
+    """
+
+    def __init__(self):
+        self._width = shutil.get_terminal_size().columns
+
+    def __call__(self, event):
+        if event.kind != BYTES:
+            return
+        fraction = event.fraction or 0.0
+        bar_width = max(10, min(50, self._width - 60))
+        filled_width = int(fraction * bar_width)
+        bar = '█' * filled_width + '░' * (bar_width - filled_width)
+        sys.stdout.write(f"\r\033[K\033[97mDownloading: [{bar}] {fraction * 100:.1f}% ({format_transfer(event)})\033[0m")
+        sys.stdout.flush()
+
+class ProgressBoard:
+    """Combined progress line for several downloads running in parallel.
+
+    A progress sink: subscribe it to the ProgressBus the downloads report
+    to. All jobs share a single carriage-return status line so concurrent
+    updates do not overwrite each other mid-line.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def __call__(self, event):
+        with self._lock:
+            if event.kind == BYTES:
+                self._jobs[event.job] = (event.fraction or 0.0) * 100
+            elif event.kind in (DONE, ERROR):
+                self._jobs.pop(event.job, None)
+            else:
+                return
+            self._render()
+
+    def _render(self):
+        terminal_width = shutil.get_terminal_size().columns
+        parts = [f"[{label}] {percentage:.0f}%" for label, percentage in self._jobs.items()]
+        line = "Downloading: " + " | ".join(parts) if parts else ""
+        line = line[:terminal_width - 1]
+        sys.stdout.write(f"\r\033[K\033[97m{line}\033[0m")
+        sys.stdout.flush()
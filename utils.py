@@ -2,15 +2,95 @@
 Utility functions for the YouTube Downloader.
 """
 
+import functools
 import os
 import re
 import string
 
+# Multipliers of the suffixes accepted by parse_rate
+RATE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# Compiled once, as they run for every line of a batch file
+YOUTUBE_URL = re.compile(r'^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube(-nocookie)?\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$')
+VIDEO_ID = re.compile(r'(?:v=|\/embed\/|\/v\/|\/shorts\/|\/live\/|youtu\.be\/)([\w\-]{11})(?![\w\-])')
+PLAYLIST_URL = re.compile(r'youtube\.com\/playlist\?(?:\S*&)?list=[\w\-]+')
+CHANNEL_URL = re.compile(r'youtube\.com\/(?:channel|c|user)\/[\w\-]+')
+
 def validate_url(url):
     """Validate a YouTube URL."""
-    # Basic URL validation for YouTube
-    youtube_regex = r'^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube(-nocookie)?\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$'
-    return bool(re.match(youtube_regex, url))
+    return bool(YOUTUBE_URL.match(url))
+
+def extract_video_id(url):
+    """Return the 11-character video id of a YouTube URL, or None."""
+    match = VIDEO_ID.search(url)
+    return match.group(1) if match else None
+
+def canonical_url(video_id):
+    """Return the watch URL of a video id, the one form every variant of a video URL is reduced to."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def is_playlist_url(url):
+    """Check if a YouTube URL points to a playlist rather than a single video."""
+    return bool(PLAYLIST_URL.search(url))
+
+def is_channel_url(url):
+    """Check if a YouTube URL points to a channel."""
+    return bool(CHANNEL_URL.search(url))
+
+def is_collection_url(url):
+    """Check if a YouTube URL expands to several videos (a playlist or a channel)."""
+    return is_playlist_url(url) or is_channel_url(url)
+
+def parse_timestamp(value):
+    """
+    Parse a time such as '90', '1:30' or '1:02:03.5' into seconds.
+    
+    Returns:
+        float: Seconds, or None for an empty value
+    
+    Raises:
+        ValueError: If the value is not a valid, non-negative time
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        parts = str(value).strip().split(":")
+        if len(parts) > 3:
+            raise ValueError(f"Invalid time: {value}")
+        try:
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError(f"Invalid time: {value}")
+    if not seconds >= 0:
+        raise ValueError(f"Invalid time: {value}")
+    return seconds
+
+def parse_rate(value):
+    """
+    Parse a transfer rate such as '500K', '2M' or '1.5MB' into bytes per second.
+    
+    Returns:
+        float: Bytes per second, or None for an empty value or '0' (no limit)
+    
+    Raises:
+        ValueError: If the value is not a valid, non-negative rate
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        rate = float(value)
+    else:
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?(?:/s)?\s*", str(value), re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Invalid rate: {value}")
+        rate = float(match.group(1)) * RATE_UNITS[match.group(2).lower()]
+    if not rate >= 0:
+        raise ValueError(f"Invalid rate: {value}")
+    return rate or None
 
 def create_output_dir(output_dir):
     """Create the output directory if it doesn't exist."""
@@ -62,8 +142,9 @@ def get_human_readable_size(size_bytes):
     else:
         return f"{size_bytes/(1024**3):.2f} GB"
 
+@functools.lru_cache(maxsize=None)
 def is_ffmpeg_available():
-    """Check if FFmpeg is installed on the system."""
+    """Check if FFmpeg is installed on the system; probed once per process."""
     try:
         import subprocess
         subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+YouTube Downloader worker
+Runs download jobs from a shared queue; start more workers, on this host or others, to add capacity.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from bandwidth import get_default_governor
+from connections import install_pytube
+from downloader import YouTubeDownloader
+from jobqueue import open_queue
+from jobs import DONE, FAILED, PROGRESS_RATE
+from progress import ProgressBus
+from store import ArtifactStore
+from utils import create_output_dir, parse_rate, sanitize_filename
+
+DEFAULT_DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
+
+class Worker:
+    """
+    Takes jobs from a JobQueue and downloads them into a shared store.
+
+    Each of ``concurrency`` slots claims a job for ``lease`` seconds and
+    renews the lease a few times per lease while the download runs, so a
+    worker that dies stops renewing and its jobs go to other workers. The
+    job's progress is written back to the queue, where the web app reads
+    it, and a rate limit changed there takes effect at the next renewal.
+    """
+
+    def __init__(self, queue, output_dir, store=None, concurrency=1, lease=60, worker_id=None,
+                 bandwidth=None, poll_interval=1.0):
+        """
+        Initialize the worker.
+
+        Args:
+            queue (JobQueue): Queue to take jobs from
+            output_dir (str): Directory to save the downloads
+            store (ArtifactStore): Store shared with the web app, which serves
+                the finished files from it
+            concurrency (int): Number of jobs run at the same time
+            lease (float): Seconds a claimed job stays with this worker
+                without a heartbeat
+            worker_id (str): Name of the worker in the queue, defaults to
+                host name and process id
+            bandwidth (BandwidthGovernor): Governor for this worker's
+                downloads, None for the process-wide default
+            poll_interval (float): Seconds between looks at an empty queue
+        """
+        self.queue = queue
+        self.output_dir = output_dir
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.bandwidth = bandwidth or get_default_governor()
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}
+        self.progress = ProgressBus()
+        self.progress.subscribe(self._on_progress, rate=PROGRESS_RATE)
+
+    def run(self):
+        """Run jobs until stop() is called or the process is interrupted; running jobs are then requeued."""
+        slots = [
+            threading.Thread(target=self._slot, name=f"ytdown-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for slot in slots:
+            slot.start()
+        try:
+            while any(slot.is_alive() for slot in slots):
+                for slot in slots:
+                    slot.join(timeout=1.0)
+        finally:
+            self.stop()
+            # Hand unfinished jobs to other workers right away instead of after their lease
+            with self._lock:
+                running = list(self._running)
+            for job_id in running:
+                self.queue.release(job_id, self.worker_id)
+                print(f"\033[93mReturned job {job_id} to the queue\033[0m")
+
+    def stop(self):
+        """Stop claiming jobs; jobs already running finish."""
+        self._stop.set()
+
+    def _slot(self):
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id, self.lease)
+            if not job:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        print(f"\033[94m[{self.worker_id}] Running job {job.id}: {job.url}\033[0m")
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_alive, args=(job, finished), daemon=True)
+        with self._lock:
+            self._running[job.id] = job
+        heartbeat.start()
+        try:
+            downloader = YouTubeDownloader(
+                url=job.url,
+                format_type=job.format_type,
+                output_dir=self.output_dir,
+                quality=job.quality,
+                progress=self.progress,
+                job_id=job.id,
+                store=self.store,
+                start=job.start,
+                end=job.end,
+                bandwidth=self.bandwidth,
+                rate_limit=job.rate_limit
+            )
+            if downloader.download():
+                fields = dict(
+                    state=DONE,
+                    output_file=downloader.output_file,
+                    artifact_id=downloader.artifact_key
+                )
+            else:
+                fields = dict(state=FAILED, error=downloader.error or "Download failed")
+        except Exception as e:
+            fields = dict(state=FAILED, error=str(e))
+        finally:
+            finished.set()
+            heartbeat.join()
+            with self._lock:
+                self._running.pop(job.id, None)
+
+        if self.queue.update(job.id, self.worker_id, finished_at=time.time(), **fields):
+            color = "92" if fields["state"] == DONE else "91"
+            print(f"\033[{color}m[{self.worker_id}] Job {job.id} {fields['state']}\033[0m")
+        else:
+            print(f"\033[93m[{self.worker_id}] Job {job.id} was taken over by another worker; result dropped\033[0m")
+
+    def _keep_alive(self, job, finished):
+        """Renew the job's lease until it finishes, and follow rate limit changes."""
+        while not finished.wait(self.lease / 3):
+            current = self.queue.heartbeat(job.id, self.worker_id, self.lease)
+            if current is None:
+                print(f"\033[93m[{self.worker_id}] Lost the lease on job {job.id}\033[0m")
+                return
+            if current.rate_limit != job.rate_limit:
+                job.rate_limit = current.rate_limit
+                self.bandwidth.set_job_rate(job.id, current.rate_limit)
+
+    def _on_progress(self, event):
+        self.queue.update(
+            event.job,
+            self.worker_id,
+            bytes_done=event.bytes_done,
+            total_bytes=event.total_bytes or 0,
+            speed=event.speed,
+            eta=event.eta,
+            stage=event.stage
+        )
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run download jobs from a shared queue")
+    parser.add_argument("--queue", default=os.environ.get("JOB_QUEUE"),
+                        help="Job queue, e.g. a SQLite file or sqlite:///path (default: $JOB_QUEUE, "
+                             "else .queue.db in the output directory)")
+    parser.add_argument("-o", "--output", default=os.environ.get("DOWNLOAD_DIR") or DEFAULT_DOWNLOAD_DIR,
+                        help="Download directory shared with the web app (default: $DOWNLOAD_DIR or downloads/)")
+    parser.add_argument("--store", help="Artifact store directory (default: .store in the output directory)")
+    parser.add_argument("--store-quota", type=int, default=os.environ.get("DOWNLOAD_QUOTA_MB"),
+                        help="Maximum size of the download store in MB (default: $DOWNLOAD_QUOTA_MB)")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Number of jobs to run at the same time")
+    parser.add_argument("--lease", type=float, default=60,
+                        help="Seconds after which a job of a silent worker is handed to another")
+    parser.add_argument("--worker-id", help="Name of this worker in the queue (default: host name and process id)")
+    parser.add_argument("--limit-rate", type=parse_rate, metavar="RATE",
+                        help="Cap the total download rate of this worker, e.g. 10M")
+    return parser.parse_args()
+
+def main():
+    """Main function to run the worker."""
+    args = parse_args()
+    output_dir = create_output_dir(args.output)
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    store = ArtifactStore(
+        args.store or os.path.join(output_dir, '.store'),
+        quota_bytes=int(args.store_quota) * 1024 * 1024 if args.store_quota else None,
+        policy=os.environ.get('DOWNLOAD_EVICTION_POLICY', 'lru'),
+        owner=sanitize_filename(worker_id)
+    )
+    queue = open_queue(args.queue or os.path.join(output_dir, '.queue.db'))
+    get_default_governor().set_rate(args.limit_rate)
+    install_pytube()
+
+    worker = Worker(queue, output_dir, store, args.concurrency, args.lease, worker_id)
+    print(f"\033[92mWorker {worker_id} running {worker.concurrency} job(s) at a time. Press Ctrl+C to stop.\033[0m")
+    worker.run()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\033[92mWorker stopped. Its unfinished jobs are back in the queue.\033[0m")
+        sys.exit(0)
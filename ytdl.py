@@ -7,23 +7,78 @@ A script to download YouTube videos as MP3 or MP4 files.
 import os
 import sys
 import argparse
-from downloader import YouTubeDownloader
-from ui import display_banner, display_progress, clear_screen, display_menu, get_user_input
-from utils import validate_url, create_output_dir, sanitize_filename
+import json
+import threading
+from utils import validate_url, create_output_dir, is_collection_url, parse_rate, parse_timestamp
 
-def parse_args():
-    """Parse command line arguments."""
+# The downloader and everything behind it (pytube, urllib, sqlite3) are
+# imported where they are first needed, so --help, argument errors and
+# commands handed to the daemon start without them.
+
+def parse_args(argv=None):
+    """Parse command line arguments, from sys.argv unless ``argv`` is given."""
     parser = argparse.ArgumentParser(description="Download YouTube videos as MP3 or MP4")
-    parser.add_argument("-u", "--url", help="YouTube video URL")
+    parser.add_argument("-u", "--url", help="YouTube video, playlist or channel URL")
     parser.add_argument("-f", "--format", choices=["mp3", "mp4"], help="Download format (mp3 or mp4)")
     parser.add_argument("-o", "--output", help="Output directory")
     parser.add_argument("-q", "--quality", help="Video quality (for MP4) or audio bitrate (for MP3)")
     parser.add_argument("-b", "--batch", help="File containing list of YouTube URLs")
-    args = parser.parse_args()
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of batch downloads to run in parallel")
+    parser.add_argument("-t", "--transcoders", type=int, help="Number of parallel MP3 conversions in batch mode (default: CPU count)")
+    parser.add_argument("-s", "--segments", type=int, default=1, help="Number of parallel connections per download")
+    parser.add_argument("--store", help="Artifact store directory used to reuse identical downloads")
+    parser.add_argument("--store-quota", type=int, help="Maximum size of the download store in MB")
+    parser.add_argument("--no-pipe", dest="stream_audio", action="store_false",
+                        help="For MP3, download the audio first instead of piping it into FFmpeg")
+    parser.add_argument("--journal", help="Batch journal file (default: .ytdl-journal.jsonl in the output directory)")
+    parser.add_argument("--no-journal", action="store_true", help="Do not record or skip batch items in a journal")
+    parser.add_argument("--status", action="store_true", help="Show the batch journal and exit")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check finished downloads in the store and batch journal against their digests and exit")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="After a batch, write stage timings and counters as JSON to PATH (- for stdout)")
+    parser.add_argument("--prefetch", type=int, default=4,
+                        help="Number of videos to look up ahead of the downloads in batch mode (0 to disable)")
+    parser.add_argument("--limit-rate", type=parse_rate, metavar="RATE",
+                        help="Cap the total download rate, e.g. 500K or 2M bytes per second")
+    parser.add_argument("--job-limit-rate", type=parse_rate, metavar="RATE",
+                        help="Cap the rate of each download, e.g. 1M")
+    parser.add_argument("--start", type=parse_timestamp, help="Start of a clip, in seconds or [hh:]mm:ss")
+    parser.add_argument("--end", type=parse_timestamp, help="End of a clip, in seconds or [hh:]mm:ss")
+    parser.add_argument("--max-size", type=int, help="Skip streams larger than this many MB")
+    parser.add_argument("--codec", help="Preferred codecs, comma-separated (e.g. avc1 or opus,mp4a)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon that keeps caches warm and runs commands sent with --use-daemon")
+    parser.add_argument("--use-daemon", action="store_true",
+                        help="Hand the command to a running daemon; runs it here if there is none")
+    parser.add_argument("--socket", help="Unix socket of the daemon (default: ytdl.sock in the cache directory)")
+    args = parser.parse_args(argv)
+    if args.store_quota is not None and not args.store:
+        parser.error("--store-quota requires --store")
     return args
 
+def write_metrics(path):
+    """Write the metrics of this run as JSON to ``path``, or to stdout for '-'."""
+    from connections import get_default_pool
+    from metadata import get_default_cache
+    from metrics import registry
+    registry.add_cache("metadata", get_default_cache().stats)
+    registry.add_cache("http_pool", get_default_pool().stats)
+    summary = json.dumps(registry.to_dict(), indent=2)
+    if path == "-":
+        print(summary)
+        return
+    with open(path, "w") as f:
+        f.write(summary + "\n")
+    print(f"\033[92mMetrics written to {path}\033[0m")
+
 def interactive_mode():
     """Run the downloader in interactive mode with a user-friendly menu."""
+    from batch import run_batch, print_batch_summary
+    from connections import install_pytube
+    from downloader import YouTubeDownloader
+    from ui import display_banner, clear_screen, display_menu, get_user_input
+    install_pytube()
     clear_screen()
     display_banner()
     
@@ -81,20 +136,20 @@ def interactive_mode():
                 if quality not in ["low", "medium", "high", "best"]:
                     quality = "high"
             
+            jobs = get_user_input("Number of parallel downloads (press Enter for 1): ")
+            jobs = int(jobs) if jobs.isdigit() and int(jobs) > 0 else 1
+            
             try:
-                with open(batch_file, 'r') as f:
-                    urls = [line.strip() for line in f if line.strip() and validate_url(line.strip())]
+                from ingest import BatchFile
+                urls = BatchFile(batch_file)
+                print(f"\033[92mReading URLs from {batch_file}. Starting download...\033[0m")
                 
-                if not urls:
+                summary, wall_time, stage_stats = run_batch(urls, format_choice, output_dir, quality, jobs)
+                urls.print_summary()
+                if not urls.jobs:
                     print("\033[91mNo valid URLs found in the file!\033[0m")
                     continue
-                
-                print(f"\033[92mFound {len(urls)} valid URLs. Starting download...\033[0m")
-                
-                for i, url in enumerate(urls):
-                    print(f"\n\033[94m[{i+1}/{len(urls)}] Processing: {url}\033[0m")
-                    downloader = YouTubeDownloader(url, format_choice, output_dir, quality)
-                    downloader.download()
+                print_batch_summary(summary, wall_time, stage_stats)
             
             except Exception as e:
                 print(f"\033[91mError processing batch file: {str(e)}\033[0m")
@@ -107,40 +162,153 @@ def interactive_mode():
         clear_screen()
         display_banner()
 
-def main():
+def main(argv=None):
     """Main function to run the script."""
-    args = parse_args()
+    args = parse_args(argv)
+    
+    if args.serve or args.use_daemon:
+        from daemon import DEFAULT_SOCKET, DaemonUnavailable, serve, submit
+        socket_path = args.socket or DEFAULT_SOCKET
+        if args.serve:
+            serve(socket_path, run_command)
+            return
+        # Interactive mode needs this terminal, so only commands go to the daemon
+        if args.url or args.batch or args.status or args.verify:
+            try:
+                sys.exit(submit(socket_path, vars(args)))
+            except DaemonUnavailable as e:
+                print(f"\033[93m{str(e)}; running the command here\033[0m")
+    
+    run(args)
+
+def verify_downloads(store=None, journal=None):
+    """
+    Check the artifacts of a store and the outputs of a batch journal, reporting the damaged ones.
+    
+    Damaged artifacts are deleted and damaged journal items marked failed,
+    so they are downloaded again.
+    
+    Returns:
+        bool: True if everything checked is intact
+    """
+    checked = problems = 0
+    sources = []
+    if store:
+        sources.append(("store", store.verify()))
+    if journal:
+        sources.append(("journal", journal.verify()))
+    for name, results in sources:
+        for _, path, problem in results:
+            checked += 1
+            if problem:
+                problems += 1
+                print(f"\033[91m[{name}] {path}: {problem}\033[0m")
+    
+    if problems:
+        print(f"\033[93m{problems} of {checked} files failed verification and will be downloaded again\033[0m")
+    else:
+        print(f"\033[92mAll {checked} files verified\033[0m")
+    return not problems
+
+# The daemon runs a command by changing into the client's directory and
+# swapping sys.stdout for the client's socket, both process-wide, so two
+# commands must never run at the same time
+_command_lock = threading.Lock()
+
+def run_command(options):
+    """Run a command received by the daemon; ``options`` are the parsed arguments as a dict."""
+    with _command_lock:
+        run(argparse.Namespace(**options))
+
+def run(args):
+    """Run the command described by parsed arguments."""
+    from bandwidth import get_default_governor
+    
+    selection = {
+        "max_bytes": args.max_size * 1024 * 1024 if args.max_size else None,
+        "preferred_codecs": args.codec.split(",") if args.codec else None,
+        "start": args.start,
+        "end": args.end
+    }
+    
+    # Every download of this run shares the total rate cap
+    get_default_governor().set_rate(args.limit_rate)
+    
+    store = None
+    if args.store:
+        from store import ArtifactStore
+        quota_bytes = args.store_quota * 1024 * 1024 if args.store_quota else None
+        store = ArtifactStore(args.store, quota_bytes)
+    
+    if args.verify:
+        from journal import JOURNAL_FILENAME, BatchJournal
+        journal_path = args.journal or (args.output or os.getcwd())
+        journal = None
+        if os.path.exists(journal_path) and not os.path.isdir(journal_path) or \
+                os.path.exists(os.path.join(journal_path, JOURNAL_FILENAME)):
+            journal = BatchJournal(journal_path)
+        if not store and not journal:
+            print(f"\033[91mNothing to verify: no --store given and no batch journal found at {journal_path}\033[0m")
+            sys.exit(1)
+        sys.exit(0 if verify_downloads(store, journal) else 1)
+    
+    if args.status:
+        from journal import JOURNAL_FILENAME, BatchJournal, print_journal_status
+        journal_path = args.journal or (args.output or os.getcwd())
+        if not os.path.exists(journal_path) and not os.path.exists(os.path.join(journal_path, JOURNAL_FILENAME)):
+            print(f"\033[91mNo batch journal found at {journal_path}\033[0m")
+            sys.exit(1)
+        print_journal_status(BatchJournal(journal_path))
+        return
     
     # If command line arguments are provided, use them
     if args.url or args.batch:
-        # Process batch file if provided
-        if args.batch:
-            if not os.path.exists(args.batch):
+        # Process batch file if provided, or a playlist or channel URL
+        if args.batch or is_collection_url(args.url):
+            if args.batch and not os.path.exists(args.batch):
                 print(f"\033[91mBatch file not found: {args.batch}\033[0m")
                 sys.exit(1)
             
             output_dir = args.output if args.output else os.getcwd()
             output_dir = create_output_dir(output_dir)
             
+            from batch import run_batch, print_batch_summary
+            from connections import install_pytube
+            from ingest import BatchFile
+            from journal import BatchJournal
+            install_pytube()
             try:
-                with open(args.batch, 'r') as f:
-                    urls = [line.strip() for line in f if line.strip() and validate_url(line.strip())]
-                
-                if not urls:
-                    print("\033[91mNo valid URLs found in the batch file!\033[0m")
-                    sys.exit(1)
-                
-                print(f"\033[92mFound {len(urls)} valid URLs. Starting download...\033[0m")
+                # A batch file is read as the downloads go, so its size does not matter
+                if args.batch:
+                    urls = BatchFile(args.batch)
+                    print(f"\033[92mReading URLs from {args.batch}. Starting download...\033[0m")
+                else:
+                    urls = [args.url]
                 
-                for i, url in enumerate(urls):
-                    print(f"\n\033[94m[{i+1}/{len(urls)}] Processing: {url}\033[0m")
-                    downloader = YouTubeDownloader(
-                        url, 
-                        args.format or "mp4", 
-                        output_dir, 
-                        args.quality
-                    )
-                    downloader.download()
+                journal = None if args.no_journal else BatchJournal(args.journal or output_dir)
+                summary, wall_time, stage_stats = run_batch(
+                    urls,
+                    args.format or "mp4",
+                    output_dir,
+                    args.quality,
+                    args.jobs,
+                    args.transcoders,
+                    args.prefetch,
+                    journal,
+                    segments=args.segments,
+                    stream_audio=args.stream_audio,
+                    store=store,
+                    rate_limit=args.job_limit_rate,
+                    **selection
+                )
+                if args.batch:
+                    urls.print_summary()
+                    if not urls.jobs:
+                        print("\033[91mNo valid URLs found in the batch file!\033[0m")
+                        sys.exit(1)
+                print_batch_summary(summary, wall_time, stage_stats)
+                if args.metrics_json:
+                    write_metrics(args.metrics_json)
             
             except Exception as e:
                 print(f"\033[91mError processing batch file: {str(e)}\033[0m")
@@ -155,11 +323,19 @@ def main():
             output_dir = args.output if args.output else os.getcwd()
             output_dir = create_output_dir(output_dir)
             
+            from connections import install_pytube
+            from downloader import YouTubeDownloader
+            install_pytube()
             downloader = YouTubeDownloader(
                 args.url, 
                 args.format or "mp4", 
                 output_dir, 
-                args.quality
+                args.quality,
+                segments=args.segments,
+                stream_audio=args.stream_audio,
+                store=store,
+                rate_limit=args.job_limit_rate,
+                **selection
             )
             downloader.download()
     
@@ -171,7 +347,7 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\n\033[92mDownload canceled. Exiting...\033[0m")
+        print("\n\033[92mDownload canceled. Partial downloads are kept and resume on the next run. Exiting...\033[0m")
         sys.exit(0)
     except Exception as e:
         print(f"\033[91mAn unexpected error occurred: {str(e)}\033[0m")